@@ -1,5 +1,10 @@
 import logging
+import threading
+
 from migration.connector.source.enum import Column
+from migration.connector.file_format import CSV
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS
+from migration.util.arrow_util import iter_batches
 
 from migration.base.status import Status
 
@@ -11,6 +16,8 @@ class Destination:
         self.name = name
         self.config = config
         self.connection = None
+        self.created_databases = set()
+        self.created_databases_lock = threading.Lock()
 
     def get_connection_params(self):
         raise NotImplementedError
@@ -24,15 +31,40 @@ class Destination:
     def execute_sql(self, sql, bind_params=None):
         raise NotImplementedError
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        """
+        Rows of a query as they are read from the server, batch_size rows per round trip, for results too
+        large to hold in memory. Connectors without a streaming cursor fetch the whole result.
+        """
+        yield from self.execute_sql(sql, bind_params)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        """
+        Result of a query as Arrow record batches of up to batch_size rows. By default the rows of iter_sql
+        are batched, with columns named by position.
+        """
+        yield from iter_batches(self.iter_sql(sql, batch_size, bind_params), batch_size)
+
     def close(self):
         pass
 
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         raise NotImplementedError
 
-    def load_external_data(self, file_path, schema_name, table_name):
+    def load_external_data(self, file_path, schema_name, table_name, file_format=None):
         raise NotImplementedError
 
+    def merge_external_data(self, file_path, schema_name, table_name, primary_keys, file_format=None):
+        """
+        Load data into a table, replacing the rows with the same primary key. By default the data is loaded
+        as is, for destinations whose tables replace rows on their key, such as Doris UNIQUE KEY tables.
+        """
+        self.load_external_data(file_path, schema_name, table_name, file_format)
+
+    def load_formats(self):
+        """Intermediate file formats load_external_data can read, mapped to their supported compression codecs."""
+        return {CSV: [None]}
+
     def gen_destination_ddl(self, db_name, table_name, columns, primary_keys, cluster_info, partition_columns):
         raise NotImplementedError
 
@@ -48,8 +80,30 @@ class Destination:
     def create_database(self, db_name):
         raise NotImplementedError
 
+    def ensure_database(self, db_name):
+        """Create a database once per run, however many tables are created in it."""
+        with self.created_databases_lock:
+            if db_name in self.created_databases:
+                return
+            self.create_database(db_name)
+            self.created_databases.add(db_name)
+
+    def supports_multi_statement(self):
+        return False
+
+    def execute_script(self, statements: list[str]):
+        """Run several statements, as one script when the destination supports it."""
+        for statement in statements:
+            self.execute_sql(statement)
+
     def create_table(self, table_name, ddl: str):
         raise NotImplementedError
 
+    def truncate_table(self, schema_name, table_name):
+        self.execute_sql(f"TRUNCATE TABLE {schema_name}.{table_name}")
+
+    def delete_rows(self, schema_name, table_name, predicate):
+        self.execute_sql(f"DELETE FROM {schema_name}.{table_name} WHERE {predicate}")
+
     def quote_character(self):
         return "`"
@@ -1,19 +1,35 @@
 import logging
 import os
 import subprocess
+import uuid
 from time import sleep
 from migration.connector.source.enum import Column
 
 from migration.util import object_storage_util
+from migration.connector.file_format import PARQUET, ORC, CSV, ANY_COMPRESSION
 
 from migration.connector.destination.base import Destination
 from clickzetta.dbapi.connection import Connection as ClickZettaConnection
 from clickzetta.client import Client
 from migration.base.exceptions import DestinationExecutionError, GrammarRestrictionsError
 import migration.util.script_util as script_utils
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
+DIRECT_LOAD_FORMATS = ('parquet', 'orc')
+PK_TABLE_DML_HINT = {'hints': {'cz.sql.allow.insert.table.with.pk': 'true'}}
+# errors of a COPY INTO the instance can not run at all, a format or volume it does not support, any other
+# error may come after rows were written and is raised instead of loading the file again
+COPY_UNSUPPORTED_ERRORS = ('not support', 'unsupported', 'syntax error', 'volume')
+
+
+def is_copy_unsupported(error):
+    """Whether a failed COPY INTO could not run at all, judged by the error of the driver, not the statement."""
+    message = str(error.__context__ or error).lower()
+    return any(marker in message for marker in COPY_UNSUPPORTED_ERRORS)
+
 
 class ClickZettaDestination(Destination):
     def __init__(self, config: dict, meta_conf_path=None, storage_conf_path=None):
@@ -82,10 +98,36 @@ class ClickZettaDestination(Destination):
             logger.error("migration Error running SQL: {}, error:{}", sql, e)
             raise DestinationExecutionError('migration Error running SQL: {}, error:{}'.format(sql, e))
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the driver does not stream, it decodes a whole result file of the server at a time, or the whole result
+        # when it is sent inline, and fetchmany slices those rows, so memory is about a result file, not a batch
+        self.connect()
+        cursor = self.connection.cursor()
+        cursor.execute(sql, bind_params)
+        yield from iter_rows(cursor, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the connector decodes its Arrow results into rows a result file at a time as in iter_sql, they are batched
+        # into Arrow again here
+        self.connect()
+        cursor = self.connection.cursor()
+        cursor.execute(sql, bind_params)
+        yield from iter_cursor_batches(cursor, batch_size)
+
     def close(self):
         self.connection.close()
 
-    def load_external_data(self, file_path, schema_name, table_name):
+    def load_external_data(self, file_path, schema_name, table_name, file_format=None):
+        if file_format in DIRECT_LOAD_FORMATS and self.config.get('volume'):
+            try:
+                self.copy_into(file_path, schema_name, table_name, file_format)
+                return
+            # DestinationExecutionError is no Exception, interrupts still get through
+            except (Exception, DestinationExecutionError) as e:
+                if not is_copy_unsupported(e):
+                    raise
+                logger.warning(f"Clickzetta direct load of {file_path} to {schema_name}.{table_name} is not "
+                               f"supported, fall back to loading through a temp table, error: {e}")
         meta_cmd_path = script_utils.get_meta_cmd_path()
         object_storage = object_storage_util.get_object_storage_config(self.storage_conf_path)
         object_file_path = file_path
@@ -98,7 +140,7 @@ class ClickZettaDestination(Destination):
             raise DestinationExecutionError(f"Unsupported object storage type {object_storage['type']}")
 
         column_info = self.execute_sql(f"DESCRIBE {schema_name}.{table_name}")
-        temp_table_name = f"temp_{table_name}"
+        temp_table_name = f"temp_{table_name}_{uuid.uuid4().hex[:8]}"
         create_temp_table_sql = f"CREATE TABLE IF NOT EXISTS {schema_name}.{temp_table_name} (\n"
         for index, column in enumerate(column_info):
             create_temp_table_sql += f"    {column[0]} {column[1]}"
@@ -106,8 +148,11 @@ class ClickZettaDestination(Destination):
                 create_temp_table_sql += ",\n"
             else:
                 create_temp_table_sql += "\n"
-        create_temp_table_sql += (") using text options('field.delim' = '\t', 'serialization.null.format'= '\\N', "
-                                  "'collection.delim'=':', 'mapkey.delim'='='); ")
+        if file_format in DIRECT_LOAD_FORMATS:
+            create_temp_table_sql += f") using {file_format}; "
+        else:
+            create_temp_table_sql += (") using text options('field.delim' = '\t', 'serialization.null.format'= '\\N', "
+                                      "'collection.delim'=':', 'mapkey.delim'='='); ")
         self.execute_sql(f"DROP TABLE IF EXISTS {schema_name}.{temp_table_name}")
         self.execute_sql(create_temp_table_sql)
 
@@ -136,6 +181,41 @@ class ClickZettaDestination(Destination):
                 'migration Error loading external data: {}, error:{}'.format(rewrite_table_sql, e))
         logger.info(f"Clickzetta Load external data {file_path} to {schema_name}.{table_name} successfully")
 
+    def merge_external_data(self, file_path, schema_name, table_name, primary_keys, file_format=None):
+        """Load the data into a staging copy of the table, then merge it into the table on the primary key."""
+        columns = [row[0] for row in self.execute_sql(f"DESCRIBE {schema_name}.{table_name}")]
+        staging_table_name = f"staging_{table_name}_{uuid.uuid4().hex[:8]}"
+        self.execute_sql(f"CREATE TABLE {schema_name}.{staging_table_name} AS "
+                         f"SELECT * FROM {schema_name}.{table_name} WHERE 1 = 0")
+        try:
+            self.load_external_data(file_path, schema_name, staging_table_name, file_format)
+            merge_sql = f"MERGE INTO {schema_name}.{table_name} AS t\n" \
+                        f"USING {schema_name}.{staging_table_name} AS s\n" \
+                        f"ON {' AND '.join(f't.{key} = s.{key}' for key in primary_keys)}\n"
+            update_columns = [column for column in columns if column not in primary_keys]
+            if update_columns:
+                merge_sql += f"WHEN MATCHED THEN UPDATE SET " \
+                             f"{', '.join(f'{column} = s.{column}' for column in update_columns)}\n"
+            merge_sql += f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) " \
+                         f"VALUES ({', '.join(f's.{column}' for column in columns)})"
+            logger.info(f"Clickzetta begin to merge {file_path} into {schema_name}.{table_name} with sql: {merge_sql}")
+            self.execute_sql(merge_sql, PK_TABLE_DML_HINT)
+        finally:
+            self.execute_sql(f"DROP TABLE IF EXISTS {schema_name}.{staging_table_name}")
+        logger.info(f"Clickzetta merge external data {file_path} into {schema_name}.{table_name} successfully")
+
+    def copy_into(self, file_path, schema_name, table_name, file_format):
+        """Load Parquet or ORC files straight into the target table from the volume mapped to the bucket."""
+        copy_sql = f"COPY INTO {schema_name}.{table_name} FROM VOLUME {self.config.get('volume')} " \
+                   f"USING {file_format.upper()} SUBDIRECTORY '{file_path}'"
+        logger.info(f"Clickzetta begin to load {file_path} to {schema_name}.{table_name} with sql: {copy_sql}")
+        self.execute_sql(copy_sql)
+        logger.info(f"Clickzetta Load external data {file_path} to {schema_name}.{table_name} successfully")
+
+    def load_formats(self):
+        # columnar files are loaded directly from a volume, or through a temp table using their format without one
+        return {PARQUET: ANY_COMPRESSION, ORC: ANY_COMPRESSION, CSV: [None]}
+
     def gen_destination_ddl(self, db_name, table_name, columns, primary_keys, cluster_info, partition_columns):
         if primary_keys and cluster_info:
             for primary_key, cluster_key in zip(primary_keys, cluster_info.cluster_keys):
@@ -170,5 +250,5 @@ class ClickZettaDestination(Destination):
 
         if partition_columns:
             destination_ddl += 'PARTITIONED BY ({partitioned_by})\n'.format(partitioned_by=','.join(partition_columns))
-        self.create_database(db_name)
+        self.ensure_database(db_name)
         return destination_ddl
@@ -1,10 +1,11 @@
 import logging
+from contextlib import contextmanager
 import os
 import random
 from datetime import datetime
-from time import sleep
 
 import pymysql
+from pymysql.constants import CLIENT
 import pymysqlpool as pymysql_pool
 
 from migration.connector.destination.base import Destination
@@ -13,11 +14,13 @@ from clickzetta.client import Client
 from migration.base.exceptions import DestinationExecutionError, GrammarRestrictionsError
 from migration.base.status import Status
 import migration.util.object_storage_util as object_storage_util
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
+from migration.connector.file_format import PARQUET, ORC, CSV, ANY_COMPRESSION
+from migration.util.job_tracker import JobTracker, DEFAULT_JOB_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
-MAX_GET_STATUS_TIMES = 100
-
 
 class DorisDestination(Destination):
     def __init__(self, config: dict, meta_conf_path=None, storage_conf_path=None):
@@ -29,6 +32,8 @@ class DorisDestination(Destination):
         pool_config = {'host': self.connection_params['host'], 'port': self.connection_params['port'],
                        'user': self.connection_params['user'], 'password': self.connection_params['password']}
         self.pool = pymysql_pool.ConnectionPool(size=10, maxsize=50, pre_create_num=5, name='doris_pool', **pool_config)
+        self.load_tracker = JobTracker('doris_load', "SHOW LOAD FROM {database}", self.execute_sql,
+                                       timeout=int(self.config.get('job_timeout') or DEFAULT_JOB_TIMEOUT))
 
     def get_connection_params(self):
         assert self.config['fe_servers']
@@ -69,19 +74,56 @@ class DorisDestination(Destination):
         finally:
             connection.close()
 
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Unbuffered cursor on a connection of its own, closing it drops the rest of the result unread."""
+        connection = pymysql.connect(cursorclass=pymysql.cursors.SSCursor, **self.connection_params)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
+    def supports_multi_statement(self):
+        return True
+
+    def execute_script(self, statements: list[str]):
+        script = ";\n".join(statement.strip().rstrip(';') for statement in statements)
+        connection = pymysql.connect(**self.connection_params, client_flag=CLIENT.MULTI_STATEMENTS)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(script)
+                # errors of later statements are only raised when their results are read
+                while cur.nextset():
+                    pass
+        except Exception as e:
+            logger.error(f"migration Error running script of {len(statements)} statements, error: {e}")
+            raise DestinationExecutionError(f"migration Error running script of {len(statements)} statements, error: {e}")
+        finally:
+            connection.close()
+
     def close(self):
         if self.connection is not None:
             self.connection.close()
         self.pool = None
 
-    def load_external_data(self, file_path, schema_name, table_name):
+    def load_external_data(self, file_path, schema_name, table_name, file_format=None):
         object_storage = object_storage_util.get_object_storage_config(self.storage_conf_path)
         label_name = f"{schema_name}_{table_name}_{datetime.now().day}_{random.randint(1, 100000000)}"
         load_sql = f"LOAD LABEL {schema_name}.{label_name}\n" \
                    f"(\n" \
                    f"DATA INFILE(\"s3://{object_storage['bucket']}/{file_path}*\")\n" \
                    f"INTO TABLE {table_name}\n" \
-                   f"FORMAT AS \"parquet\"\n" \
+                   f"FORMAT AS \"{file_format or 'parquet'}\"\n" \
                    f")\n" \
                    f"WITH S3\n" \
                    f"(\n" \
@@ -96,27 +138,18 @@ class DorisDestination(Destination):
 
         logger.info(f"Start to load data from {file_path} to {schema_name}.{table_name} with sql: {load_sql}")
         self.execute_sql(load_sql)
-        current_times = 0
-        while current_times < MAX_GET_STATUS_TIMES:
-            if current_times == MAX_GET_STATUS_TIMES - 1:
-                raise DestinationExecutionError(
-                    f"doris load data from {file_path} to {schema_name}.{table_name}"
-                    f" failed, get result more than 100 times.")
-            check_state_sql = f"show load from {schema_name} where Label = '{label_name}';"
-            state = self.execute_sql(check_state_sql)[0][2]
-            if state == 'FINISHED':
-                break
-            elif state == 'CANCELLED' or state == 'FAILED':
-                logger.error(f"doris load data from {file_path} to {schema_name}.{table_name} failed")
-                raise DestinationExecutionError(
-                    f"doris loading data from {file_path} to {schema_name}.{table_name} failed")
-            else:
-                logger.info(f"Waiting for doris S3 data loading, current state is {state}")
-            sleep(5)
-            current_times += 1
+        row = self.load_tracker.track(schema_name, label_name).result()
+        if row[2] != 'FINISHED':
+            logger.error(f"doris load data from {file_path} to {schema_name}.{table_name} failed, state: {row[2]}")
+            raise DestinationExecutionError(
+                f"doris loading data from {file_path} to {schema_name}.{table_name} failed, state: {row[2]}, "
+                f"error: {row[7]}")
 
         logger.info(f"Doirs Load data from {file_path} to {schema_name}.{table_name} successfully")
 
+    def load_formats(self):
+        return {PARQUET: ANY_COMPRESSION, ORC: ANY_COMPRESSION, CSV: [None]}
+
     def gen_destination_ddl(self, db_name, table_name, columns, primary_keys, cluster_info, partition_columns):
         destination_ddl = 'CREATE TABLE IF NOT EXISTS {db}.{table} (\n'.format(db=db_name, table=table_name)
         for index, column in enumerate(columns):
@@ -144,5 +177,5 @@ class DorisDestination(Destination):
                 destination_ddl += 'INTO {buckets} BUCKETS\n'.format(buckets=cluster_info.bucket_num)
             else:
                 destination_ddl += 'INTO 32 BUCKETS\n'
-        self.create_database(db_name)
+        self.ensure_database(db_name)
         return destination_ddl
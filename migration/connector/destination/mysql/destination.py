@@ -1,4 +1,5 @@
 import logging
+from contextlib import contextmanager
 import os
 import random
 from datetime import datetime
@@ -13,6 +14,8 @@ from clickzetta.client import Client
 from migration.base.exceptions import DestinationExecutionError, GrammarRestrictionsError
 from migration.base.status import Status
 import migration.util.object_storage_util as object_storage_util
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +73,25 @@ class MysqlDestination(Destination):
         finally:
             connection.close()
 
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Unbuffered cursor on a connection of its own, closing it drops the rest of the result unread."""
+        connection = pymysql.connect(cursorclass=pymysql.cursors.SSCursor, **self.connection_params)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
     def close(self):
         if self.connection is not None:
             self.connection.close()
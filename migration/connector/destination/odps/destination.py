@@ -5,6 +5,7 @@ import odps.errors
 
 from migration.connector.destination.base import Destination
 from migration.base.exceptions import DestinationExecutionError, GrammarRestrictionsError
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS
 
 logger = logging.getLogger(__name__)
 
@@ -66,5 +67,17 @@ class OdpsDestination(Destination):
             logger.error(f"PG connector execute sql {sql} failed, error: {e}")
             raise f"PG connector execute sql {sql} failed, error: {e}"
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the tunnel reader streams the whole result, the default reader stops at the instance result limit
+        with self.odps.execute_sql(sql).open_reader(tunnel=True, limit=False) as reader:
+            for record in reader:
+                yield record.values
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the Arrow tunnel reader hands over the record batches of the result as they are downloaded
+        with self.odps.execute_sql(sql).open_reader(tunnel=True, limit=False, arrow=True) as reader:
+            for batch in reader:
+                yield batch
+
     def close(self):
         logger.info(f"Odps connector close successfully")
\ No newline at end of file
@@ -1,9 +1,13 @@
 import logging
+import uuid
+from contextlib import contextmanager
 import psycopg2
 
 import psycopg2.pool as psycopg2_pool
 
 from migration.connector.destination.base import Destination
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 from migration.base.exceptions import DestinationExecutionError, GrammarRestrictionsError, SourceExecutionError
 
 logger = logging.getLogger(__name__)
@@ -57,6 +61,25 @@ class PGDestination(Destination):
         finally:
             self.pool.putconn(connection)
 
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Named cursor keeping the result on the server, on a connection of its own as it holds a transaction."""
+        connection = psycopg2.connect(**self.connection_params)
+        try:
+            with connection.cursor(name=f"migration_{uuid.uuid4().hex}") as cur:
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
     def close(self):
         if self.connection is not None:
             self.connection.close()
@@ -0,0 +1,35 @@
+import logging
+
+from migration.base.exceptions import ProfileConfigError
+
+logger = logging.getLogger(__name__)
+
+PARQUET = 'parquet'
+ORC = 'orc'
+CSV = 'csv'
+
+# cheapest first: columnar formats are smaller and faster to parse than delimited text
+FORMAT_PREFERENCE = [PARQUET, ORC, CSV]
+# None means uncompressed, or the default of the writer
+COMPRESSION_PREFERENCE = ['zstd', 'snappy', 'lz4', 'zlib', 'gzip', None]
+
+# readers of self-describing columnar files decode any of the codecs above
+ANY_COMPRESSION = list(COMPRESSION_PREFERENCE)
+
+
+def negotiate_file_format(unload_formats: dict, load_formats: dict):
+    """
+    Pick the intermediate file format and compression codec for moving data from a source to a destination.
+
+    Both arguments map a format name to the compression codecs the side can write or read, the
+    cheapest format and codec supported by both sides is returned as a (format, compression) tuple.
+    """
+    for file_format in FORMAT_PREFERENCE:
+        if file_format not in unload_formats or file_format not in load_formats:
+            continue
+        for compression in COMPRESSION_PREFERENCE:
+            if compression in unload_formats[file_format] and compression in load_formats[file_format]:
+                logger.info(f"Negotiated intermediate file format: {file_format}, compression: {compression}")
+                return file_format, compression
+    raise ProfileConfigError(
+        f"No intermediate file format supported by both source {unload_formats} and destination {load_formats}")
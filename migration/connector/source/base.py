@@ -2,6 +2,10 @@ import logging
 import os
 from datetime import datetime
 from migration.connector.source.enum import Column
+from migration.connector.file_format import CSV
+from migration.connector.source.metadata_cache import MetadataCache
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS
+from migration.util.arrow_util import iter_batches
 import json
 
 logger = logging.getLogger(__name__)
@@ -14,6 +18,7 @@ class Source:
         self.source_id = self._gen_source_id()
         self.connection = None
         self.connection_params = None
+        self.metadata_cache = MetadataCache()
 
     def get_connection_params(self):
         raise NotImplementedError
@@ -30,6 +35,24 @@ class Source:
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         raise NotImplementedError
 
+    def load_database_metadata(self, database_name):
+        """
+        Fill the metadata cache for every table of a database with a few bulk queries.
+        Sources without bulk support keep fetching metadata table by table.
+        """
+        pass
+
+    def get_table_stats(self, database_name):
+        """
+        Row count and last modification time of every table in a database, read in bulk, as
+        {table_name: (row_count, modified_time)}. Empty when the source cannot tell.
+        """
+        return {}
+
+    def invalidate_metadata(self, database_name=None, table_name=None):
+        """Drop cached metadata of a table, a database or, by default, everything."""
+        self.metadata_cache.invalidate(database_name, table_name)
+
     def get_ddl_sql(self, database_name, table_name):
         raise NotImplementedError
 
@@ -45,6 +68,20 @@ class Source:
     def execute_sql(self, sql, bind_params=None):
         raise NotImplementedError
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        """
+        Rows of a query as they are read from the server, batch_size rows per round trip, for results too
+        large to hold in memory. Connectors without a streaming cursor fetch the whole result.
+        """
+        yield from self.execute_sql(sql, bind_params)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        """
+        Result of a query as Arrow record batches of up to batch_size rows. By default the rows of iter_sql
+        are batched, with columns named by position.
+        """
+        yield from iter_batches(self.iter_sql(sql, batch_size, bind_params), batch_size)
+
     def type_mapping(self):
         raise NotImplementedError
 
@@ -78,3 +115,29 @@ class Source:
     def get_table_pk_columns(self, database_name, table_name):
         raise NotImplementedError
 
+    def unload_formats(self):
+        """Intermediate file formats unload_data can write, mapped to their supported compression codecs."""
+        return {CSV: [None]}
+
+    def get_partitions(self, database_name, table_name):
+        raise NotImplementedError
+
+    def get_partition_predicates(self, database_name, table_name):
+        """
+        Partitions of a table mapped to a predicate selecting their rows, in partition order. Empty when the
+        table is not partitioned, or its partitions can not be selected by a predicate.
+        """
+        return {}
+
+    def get_max_value(self, database_name, table_name, column):
+        """Current high-water mark of a column, None when the table is empty."""
+        return self.execute_sql(f"SELECT MAX({column}) FROM {database_name}.{table_name}")[0][0]
+
+    def sample_pk_values(self, database_name, table_name, pk_column, sample_rows):
+        """About sample_rows values of a primary key column sampled at random, to split the table on."""
+        raise NotImplementedError
+
+    def get_table_size(self, database_name, table_name):
+        """Estimated table size in bytes, used to order and admit data tasks. 0 when unknown."""
+        return 0
+
@@ -0,0 +1,226 @@
+import logging
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pyarrow
+import pyarrow.fs
+import pyarrow.parquet
+
+from migration.base.exceptions import SourceExecutionError
+from migration.connector.file_format import PARQUET
+from migration.connector.source.enum import Column
+from migration.util import object_storage_util
+from migration.util.size_util import parse_size
+from migration.util.arrow_util import iter_cursor_batches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_PARALLELISM = 4
+DEFAULT_EXPORT_CHUNK_SIZE = "256MB"
+# upper bound of the chunks of one table, however large it is
+MAX_EXPORT_CHUNKS = 4096
+# sampled primary key values per chunk boundary, more samples even out skewed keys better
+SAMPLES_PER_CHUNK = 100
+FETCH_BATCH_ROWS = 50000
+PARQUET_COMPRESSIONS = ['zstd', 'snappy', 'lz4', 'gzip', None]
+# codec of the chunks when no compression was negotiated
+DEFAULT_COMPRESSION = 'zstd'
+
+
+def unload_formats():
+    return {PARQUET: list(PARQUET_COMPRESSIONS)}
+
+
+def arrow_type(column_type: str):
+    """Arrow type of a MySQL or PostgreSQL column type, unknown types are kept as strings."""
+    column_type = column_type.upper()
+    base_type = re.split(r'[\s(]', column_type, 1)[0]
+    if base_type in ('TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'INTEGER', 'BIGINT', 'SERIAL', 'BIGSERIAL',
+                     'SMALLSERIAL', 'YEAR'):
+        return pyarrow.uint64() if 'UNSIGNED' in column_type and base_type == 'BIGINT' else pyarrow.int64()
+    if base_type in ('FLOAT', 'DOUBLE', 'REAL') or column_type == 'DOUBLE PRECISION':
+        return pyarrow.float64()
+    if base_type in ('DECIMAL', 'NUMERIC'):
+        match = re.search(r'\((\d+)\s*(?:,\s*(\d+))?\)', column_type)
+        if match and int(match.group(1)) <= 38:
+            return pyarrow.decimal128(int(match.group(1)), int(match.group(2) or 0))
+        return pyarrow.string()
+    if base_type in ('BOOL', 'BOOLEAN'):
+        return pyarrow.bool_()
+    if base_type == 'DATE':
+        return pyarrow.date32()
+    if base_type in ('DATETIME', 'TIMESTAMP'):
+        return pyarrow.timestamp('us')
+    if base_type in ('BINARY', 'VARBINARY', 'BLOB', 'TINYBLOB', 'MEDIUMBLOB', 'LONGBLOB', 'BYTEA'):
+        return pyarrow.binary()
+    return pyarrow.string()
+
+
+def arrow_schema(columns: list[Column]):
+    return pyarrow.schema([pyarrow.field(column.name, arrow_type(column.type)) for column in columns])
+
+
+def is_chunkable(column: Column):
+    """
+    Whether a table can be split on the column: numbers and dates order the same in Python and in SQL,
+    strings do not under case insensitive or locale collations, chunks of them could overlap or leave gaps.
+    """
+    column_type = arrow_type(column.type)
+    return pyarrow.types.is_integer(column_type) or pyarrow.types.is_floating(column_type) \
+        or pyarrow.types.is_decimal(column_type) or pyarrow.types.is_date(column_type) \
+        or pyarrow.types.is_timestamp(column_type)
+
+
+def pk_boundaries(samples, min_value, max_value, chunks):
+    """
+    Chunk boundaries at the quantiles of sampled primary key values, strictly between min and max. The values
+    are ordered in Python, they must be of a type that orders the same in SQL, see is_chunkable.
+    """
+    samples = sorted({value for value in samples if value is not None and min_value < value <= max_value})
+    boundaries = []
+    for i in range(1, chunks):
+        if not samples:
+            break
+        boundary = samples[min(len(samples) - 1, i * len(samples) // chunks)]
+        if not boundaries or boundary > boundaries[-1]:
+            boundaries.append(boundary)
+    return boundaries
+
+
+def chunk_ranges(boundaries):
+    """(lower, upper) bounds of every chunk, lower inclusive and upper exclusive, None for unbounded."""
+    bounds = [None] + list(boundaries) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def task_predicates(source, task):
+    """Predicates of the rows the task migrates: its partition and its incremental range."""
+    predicates = []
+    if getattr(task, 'partition_predicate', None):
+        predicates.append(task.partition_predicate)
+    incremental_range = getattr(task, 'incremental_range', None)
+    if incremental_range is not None:
+        if incremental_range.column is None:
+            raise SourceExecutionError(f"{source.name} table {task.name} can only be migrated incrementally "
+                                       f"on a watermark column")
+        predicates.append(incremental_range.predicate())
+    return predicates
+
+
+def chunk_query(source, database_name, table_name, columns, pk_column, lower, upper, predicates=()):
+    """Query of one chunk and its bind parameters, None when it has none."""
+    quote = source.quote_character()
+    select = ", ".join(f"{quote}{column.name}{quote}" for column in columns)
+    sql = f"SELECT {select} FROM {quote}{database_name}{quote}.{quote}{table_name}{quote}"
+    conditions, params = [], []
+    if lower is not None:
+        conditions.append(f"{quote}{pk_column}{quote} >= %s")
+        params.append(lower)
+    if upper is not None:
+        conditions.append(f"{quote}{pk_column}{quote} < %s")
+        params.append(upper)
+    # literals of the predicates must not be taken for placeholders once parameters are bound
+    conditions.extend(f"({predicate.replace('%', '%%') if params else predicate})" for predicate in predicates)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql, params or None
+
+
+class ExportLocation:
+    """Where chunks are written, a root directory on a filesystem, the object storage bucket in a migration."""
+
+    def __init__(self, filesystem, root):
+        self.filesystem = filesystem
+        self.root = root
+
+    def open_output(self, file_path):
+        full_path = f"{self.root}/{file_path}"
+        if isinstance(self.filesystem, pyarrow.fs.LocalFileSystem):
+            self.filesystem.create_dir(os.path.dirname(full_path), recursive=True)
+        return self.filesystem.open_output_stream(full_path)
+
+
+def storage_location(source):
+    """The object storage bucket the destination loaders read from, chunk paths are relative to it."""
+    storage = object_storage_util.get_object_storage_config(source.storage_config_path)
+    filesystem = pyarrow.fs.S3FileSystem(access_key=storage['id'], secret_key=storage['key'],
+                                         endpoint_override=storage['endpoint'], region=storage['region'],
+                                         force_virtual_addressing=True)
+    return ExportLocation(filesystem, storage['bucket'])
+
+
+def split_table(source, database_name, table_name, pk_column):
+    """Primary key ranges of about export_chunk_size bytes each, with boundaries placed by sampling the key."""
+    chunk_size = parse_size(source.config.get('export_chunk_size') or DEFAULT_EXPORT_CHUNK_SIZE)
+    table_size = source.get_table_size(database_name, table_name)
+    chunks = max(1, min(MAX_EXPORT_CHUNKS, math.ceil(table_size / chunk_size) if chunk_size else 1))
+    if pk_column is None or chunks == 1:
+        return chunk_ranges([])
+    quote = source.quote_character()
+    min_value, max_value = source.execute_sql(
+        f"SELECT MIN({quote}{pk_column}{quote}), MAX({quote}{pk_column}{quote}) "
+        f"FROM {quote}{database_name}{quote}.{quote}{table_name}{quote}")[0]
+    if min_value is None or min_value == max_value:
+        return chunk_ranges([])
+    samples = source.sample_pk_values(database_name, table_name, pk_column, chunks * SAMPLES_PER_CHUNK)
+    ranges = chunk_ranges(pk_boundaries(samples, min_value, max_value, chunks))
+    logger.info(f"Split {source.name} table {database_name}.{table_name} of {table_size} bytes into "
+                f"{len(ranges)} chunks on {pk_column}")
+    return ranges
+
+
+def export_chunk(source, location: ExportLocation, sql, params, schema, file_path, compression):
+    """Stream the rows of a chunk from a server-side cursor into a Parquet file, one row group per batch."""
+    rows_written = 0
+    with source.open_stream_cursor(sql, params) as cursor, location.open_output(file_path) as output:
+        with pyarrow.parquet.ParquetWriter(output, schema, compression=compression) as writer:
+            for batch in iter_cursor_batches(cursor, FETCH_BATCH_ROWS, schema):
+                writer.write_batch(batch)
+                rows_written += batch.num_rows
+    return rows_written
+
+
+def unload_chunks(source, task, location: ExportLocation = None):
+    """
+    Export a table as Parquet chunks split on the first primary key column, up to export_parallelism chunks
+    at a time, and yield the directory of every chunk, relative to the location, as soon as it is written.
+    Chunks are written to the object storage bucket unless another location is given.
+    """
+    predicates = task_predicates(source, task)
+    database_name, table_name = task.name.split('.')
+    columns = source.get_table_columns(database_name, table_name)
+    schema = arrow_schema(columns)
+    pk_columns = source.get_table_pk_columns(database_name, table_name)
+    pk_column = pk_columns[0] if pk_columns else None
+    if pk_column is not None and not is_chunkable(next(column for column in columns if column.name == pk_column)):
+        logger.info(f"{source.name} table {task.name} is exported in one chunk, its primary key {pk_column} is "
+                    f"not a number or a date")
+        pk_column = None
+    ranges = split_table(source, database_name, table_name, pk_column)
+    location = location or storage_location(source)
+    compression = getattr(task, 'compression', None) or DEFAULT_COMPRESSION
+    parallelism = min(len(ranges), int(source.config.get('export_parallelism') or DEFAULT_EXPORT_PARALLELISM))
+    table_path = f"{task.project_id}/{task.id}/{table_name}/"
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        running_chunks = {}
+        try:
+            for index, (lower, upper) in enumerate(ranges):
+                sql, params = chunk_query(source, database_name, table_name, columns, pk_column, lower, upper,
+                                          predicates)
+                chunk_path = f"{table_path}chunk_{index:05d}/"
+                future = executor.submit(export_chunk, source, location, sql, params, schema,
+                                         f"{chunk_path}part-00000.parquet", compression)
+                running_chunks[future] = chunk_path
+            while running_chunks:
+                done, _ = wait(running_chunks, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_path = running_chunks.pop(future)
+                    rows = future.result()
+                    logger.info(f"Exported {rows} rows of {source.name} table {task.name} to {chunk_path}")
+                    yield chunk_path
+        finally:
+            for future in running_chunks:
+                future.cancel()
+    logger.info(f"Unload data from {source.name} table {task.name} in {len(ranges)} chunks successfully")
@@ -1,14 +1,20 @@
 import logging
 import re
+import uuid
 
 from clickzetta.dbapi.connection import Connection as ClickZettaConnection
 from clickzetta.client import Client
 import sqlparse
 
 from migration.connector.source.base import Source
+from migration.connector.source.metadata_cache import cached_metadata
 from migration.base.exceptions import SourceExecutionError
 from migration.connector.source.enum import Column, ClusterInfo
 import migration.util.script_util as script_utils
+from migration.connector.file_format import PARQUET
+from migration.util.sql_util import sql_literal
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
@@ -58,17 +64,23 @@ class ClickzettaSource(Source):
         result = self.execute_sql("show schemas")
         return [row[0] for row in result]
 
+    @cached_metadata
     def get_table_names(self, database_name):
         result = self.execute_sql(f"show tables in {database_name}")
         return [row[1] for row in result]
 
+    @cached_metadata
     def get_ddl_sql(self, database_name, table_name):
         return self.execute_sql(f"show create table {database_name}.{table_name}")[0][0]
 
+    @cached_metadata
+    def get_formatted_ddl_sql(self, database_name, table_name):
+        return sqlparse.format(self.get_ddl_sql(database_name, table_name), reindent=True, keyword_case='upper')
+
+    @cached_metadata
     def get_table_cluster_info(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         cluster_columns = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*)CLUSTERED(.*)BY(.*?)\((.*?)\)(.*)(\d+)(.*)BUCKETS.*', ddl_format_sql, re.S)
         if match_result:
             for cluster_column in match_result.group(4).strip().split(','):
@@ -77,10 +89,10 @@ class ClickzettaSource(Source):
 
         return None
 
+    @cached_metadata
     def get_table_partition_columns(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         partition_columns = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*?)PARTITIONED(.*?)BY(.*?)\((.*?)\).*', ddl_format_sql, re.S)
         if match_result:
             for partition_column in match_result.group(4).strip().split(','):
@@ -88,10 +100,10 @@ class ClickzettaSource(Source):
             return partition_columns
         return None
 
+    @cached_metadata
     def get_primary_key(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         primary_keys = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*?)PRIMARY(.*?)KEY(.*?)\((.*?)\).*', ddl_format_sql, re.S)
         if match_result:
             for primary_key in match_result.group(4).strip().split(','):
@@ -99,6 +111,7 @@ class ClickzettaSource(Source):
             return primary_keys
         return None
 
+    @cached_metadata
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         result = self.execute_sql(f"desc {database_name}.{table_name}")
         table_columns = []
@@ -120,6 +133,22 @@ class ClickzettaSource(Source):
             logger.error(f"Clickzetta connector execute sql {sql} failed, error: {e}")
             raise f"Clickzetta connector execute sql {sql} failed, error: {e}"
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the driver does not stream, it decodes a whole result file of the server at a time, or the whole result
+        # when it is sent inline, and fetchmany slices those rows, so memory is about a result file, not a batch
+        self.connect()
+        cursor = self.connection.cursor()
+        cursor.execute(sql, bind_params)
+        yield from iter_rows(cursor, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the connector decodes its Arrow results into rows a result file at a time as in iter_sql, they are batched
+        # into Arrow again here
+        self.connect()
+        cursor = self.connection.cursor()
+        cursor.execute(sql, bind_params)
+        yield from iter_cursor_batches(cursor, batch_size)
+
     def type_mapping(self):
         return {
             'TIMESTAMP': 'DATETIME',
@@ -131,10 +160,28 @@ class ClickzettaSource(Source):
             self.connection = None
             logger.info(f"Close Clickzetta connection successfully")
 
+    @cached_metadata
+    def get_partition_predicates(self, database_name, table_name):
+        if not self.get_table_partition_columns(database_name, table_name):
+            return {}
+        predicates = {}
+        # a partition is listed as its spec, e.g. dt=2024-01-01/hour=01
+        for row in self.execute_sql(f"SHOW PARTITIONS {database_name}.{table_name}"):
+            conditions = []
+            for partition_value in row[0].split('/'):
+                column, _, value = partition_value.partition('=')
+                conditions.append(f"{column} = {sql_literal(value)}")
+            predicates[row[0]] = " AND ".join(conditions)
+        return predicates
+
+    def unload_formats(self):
+        # unload_data hands out the data files of a materialized view
+        return {PARQUET: [None]}
+
     def unload_data(self, task):
         logger.info(f"Start unload data from Clickzetta")
-        temp_view_name = task.name + "_temp_view"
-        self.execute_sql(f"drop materialized view if exists {temp_view_name}")
+        # partition tasks of a table unload at the same time, each into its own view
+        temp_view_name = f"{task.name}_temp_view_{uuid.uuid4().hex[:8]}"
         unload_sql = f"create materialized view {temp_view_name} as select * from {task.name.split('.')[0]}.{task.name.split('.')[1]}"
         if hasattr(task, 'transform_partitions') and task.transform_partitions:
             partition_sql = " where "
@@ -143,23 +190,39 @@ class ClickzettaSource(Source):
             for i in range(len(columns)):
                 partition_sql += f"{columns[i]} = '{values[i]}' and "
             unload_sql += partition_sql[:-4]
+        if getattr(task, 'partition_predicate', None):
+            unload_sql += f" and ({task.partition_predicate})" if " where " in unload_sql \
+                else f" where {task.partition_predicate}"
+        incremental_range = getattr(task, 'incremental_range', None)
+        if incremental_range is not None:
+            if incremental_range.column is None:
+                raise SourceExecutionError(f"Clickzetta table {task.name} can only be migrated incrementally "
+                                           f"on a watermark column")
+            unload_sql += f" and ({incremental_range.predicate()})" if " where " in unload_sql \
+                else f" where {incremental_range.predicate()}"
         try:
-            self.execute_sql(unload_sql)
-        except BaseException as e:
-            logger.error(f"Create temp view {temp_view_name} failed, error: {e}")
+            try:
+                self.execute_sql(unload_sql)
+            except Exception as e:
+                logger.error(f"Create temp view {temp_view_name} failed, error: {e}")
+                raise SourceExecutionError(f"Create temp view {temp_view_name} failed, error: {e}")
+            try:
+                file_paths = script_utils.get_files_path(self.instance_id, self.workspace,
+                                                         temp_view_name.split('.')[0], temp_view_name.split('.')[1],
+                                                         meta_conf_path=self.meta_conf_path)
+            except Exception as e:
+                logger.error(f"Get object storage files path failed, error: {e}")
+                raise SourceExecutionError(f"Get object storage files path failed, error: {e}")
+        finally:
             self.execute_sql(f"drop materialized view if exists {temp_view_name}")
-            raise f"Create temp view {temp_view_name} failed, error: {e}"
-        file_paths = set()
-        try:
-            file_paths = script_utils.get_files_path(self.instance_id, self.workspace, temp_view_name.split('.')[0],
-                                                 temp_view_name.split('.')[1], meta_conf_path=self.meta_conf_path)
-        except BaseException as e:
-            logger.error(f"Get object storage files path failed, error: {e}")
-            self.execute_sql(f"drop materialized view if exists {temp_view_name}")
-            raise f"Get object storage files path failed, error: {e}"
         logger.info(f"Unload data from Clickzetta successfully")
-        self.execute_sql(f"drop materialized view if exists {temp_view_name}")
         return file_paths
 
     def int_type_string(self):
         return 'INT'
+
+    @cached_metadata
+    def get_table_size(self, database_name, table_name):
+        result = self.execute_sql(f"select bytes from information_schema.tables "
+                                  f"where table_schema = '{database_name}' and table_name = '{table_name}'")
+        return int(result[0][0] or 0) if result else 0
@@ -1,6 +1,7 @@
 import logging
+from contextlib import contextmanager
 import re
-import time
+from concurrent.futures import wait, FIRST_COMPLETED
 from datetime import datetime
 
 import pymysql
@@ -8,12 +9,47 @@ import sqlparse
 import pymysqlpool as pymysql_pool
 
 from migration.connector.source.base import Source
+from migration.connector.source.metadata_cache import cached_metadata
 from migration.base.exceptions import SourceExecutionError
 from migration.connector.source.enum import Column, ClusterInfo
 import migration.util.object_storage_util as object_storage_util
+from migration.util.size_util import parse_size
+from migration.util.job_tracker import JobTracker, DEFAULT_JOB_TIMEOUT
+from migration.connector.file_format import PARQUET, ORC, CSV
+from migration.util.sql_util import sql_literal
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_EXPORT_PARALLELISM = 4
+PARTITION_KEY_PATTERN = re.compile(r'types: \[([^\]]*)\]; keys: \[([^\]]*)\];')
+NUMERIC_PARTITION_TYPES = ('TINYINT', 'SMALLINT', 'INT', 'BIGINT', 'LARGEINT')
+
+
+def partition_predicate(columns, partition_values):
+    """
+    Predicate selecting the rows of a partition from the Range column of SHOW PARTITIONS, e.g.
+    "[types: [DATEV2]; keys: [2024-01-01]; ..types: [DATEV2]; keys: [2024-02-01]; )" for a range partition or
+    "[types: [VARCHAR]; keys: [beijing]; , types: [VARCHAR]; keys: [shanghai]; ]" for a list partition.
+    None for multi-column range partitions.
+    """
+    keys = []
+    for key_types, key_values in PARTITION_KEY_PATTERN.findall(partition_values or ''):
+        keys.append([value.strip() if key_type.strip().upper() in NUMERIC_PARTITION_TYPES
+                     else sql_literal(value.strip())
+                     for key_type, value in zip(key_types.split(','), key_values.split(','))])
+    if not keys or any(len(key) != len(columns) for key in keys):
+        return None
+    if '..' in partition_values:
+        if len(columns) != 1 or len(keys) != 2:
+            return None
+        return f"{columns[0]} >= {keys[0][0]} AND {columns[0]} < {keys[1][0]}"
+    if len(columns) == 1:
+        return f"{columns[0]} IN ({', '.join(key[0] for key in keys)})"
+    return " OR ".join("(" + " AND ".join(f"{column} = {value}" for column, value in zip(columns, key)) + ")"
+                       for key in keys)
+
 
 class DorisSource(Source):
     def __init__(self, config: dict, meta_conf_path=None, storage_conf_path=None):
@@ -24,6 +60,8 @@ class DorisSource(Source):
         pool_config = {'host': self.connection_params['host'], 'port': self.connection_params['port'],
                        'user': self.connection_params['user'], 'password': self.connection_params['password']}
         self.pool = pymysql_pool.ConnectionPool(size=10, maxsize=50, pre_create_num=5, name='doris_pool', **pool_config)
+        self.export_tracker = JobTracker('doris_export', "SHOW EXPORT FROM {database}", self.execute_sql,
+                                         timeout=int(self.config.get('job_timeout') or DEFAULT_JOB_TIMEOUT))
 
     """
     Doris connection parameters is a dict including following keys:
@@ -55,17 +93,23 @@ class DorisSource(Source):
         result = self.execute_sql("show databases")
         return [row[0] for row in result]
 
+    @cached_metadata
     def get_table_names(self, database_name):
         result = self.execute_sql(f"show tables from {database_name}")
         return [row[0] for row in result]
 
+    @cached_metadata
     def get_ddl_sql(self, database_name, table_name):
         return self.execute_sql(f"show create table {database_name}.{table_name}")[0][1]
 
+    @cached_metadata
+    def get_formatted_ddl_sql(self, database_name, table_name):
+        return sqlparse.format(self.get_ddl_sql(database_name, table_name), reindent=True, keyword_case='upper')
+
+    @cached_metadata
     def get_table_cluster_info(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         cluster_columns = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*)DISTRIBUTED(.*)BY(.*?)\((.*?)\)(.*)BUCKETS(.*?)(\d+).*', ddl_format_sql, re.S)
         if match_result:
             for cluster_column in match_result.group(4).strip().split(','):
@@ -74,10 +118,10 @@ class DorisSource(Source):
 
         return None
 
+    @cached_metadata
     def get_table_partition_columns(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         partition_columns = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*?)PARTITION(.*?)BY(.*?)\((.*?)\).*', ddl_format_sql, re.S)
         if match_result:
             for partition_column in match_result.group(4).strip().split(','):
@@ -85,10 +129,10 @@ class DorisSource(Source):
             return partition_columns
         return None
 
+    @cached_metadata
     def get_primary_key(self, database_name, table_name):
-        ddl_sql = self.get_ddl_sql(database_name, table_name)
         primary_keys = []
-        ddl_format_sql = sqlparse.format(ddl_sql, reindent=True, keyword_case='upper')
+        ddl_format_sql = self.get_formatted_ddl_sql(database_name, table_name)
         match_result = re.match(r'(.*?)UNIQUE(.*?)KEY(.*?)\((.*?)\).*', ddl_format_sql, re.S)
         if match_result:
             for primary_key in match_result.group(4).strip().split(','):
@@ -96,6 +140,7 @@ class DorisSource(Source):
             return primary_keys
         return None
 
+    @cached_metadata
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         result = self.execute_sql(f"desc {database_name}.{table_name}")
         table_columns = []
@@ -105,6 +150,26 @@ class DorisSource(Source):
                                         default_value=row[4]))
         return table_columns
 
+    def get_table_stats(self, database_name):
+        result = self.execute_sql("select table_name, table_rows, update_time from information_schema.tables "
+                                  "where table_schema = %s", (database_name,))
+        return {row[0]: (row[1], str(row[2]) if row[2] else None) for row in result}
+
+    def load_database_metadata(self, database_name):
+        # keys, partitions and buckets are only available in SHOW CREATE TABLE, columns are loaded in bulk
+        table_columns = {}
+        result = self.execute_sql("select table_name, column_name, column_type, is_nullable, column_default "
+                                  "from information_schema.columns where table_schema = %s "
+                                  "order by table_name, ordinal_position", (database_name,))
+        for row in result:
+            column_type = re.sub(r'^(TINYINT|SMALLINT|INT|BIGINT|LARGEINT)\(\d+\)', r'\1', row[2].upper())
+            table_columns.setdefault(row[0], []).append(Column(name=row[1], type=column_type,
+                                                               is_null=True if row[3] == 'YES' else False,
+                                                               default_value=row[4]))
+        for table_name, columns in table_columns.items():
+            self.metadata_cache.put(('get_table_columns', database_name, table_name), columns)
+        logger.info(f"Loaded columns of {len(table_columns)} tables in Doris database {database_name}")
+
     def execute_sql(self, sql, bind_params=None):
         connection = self.pool.get_connection()
         try:
@@ -119,6 +184,25 @@ class DorisSource(Source):
         finally:
             connection.close()
 
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Unbuffered cursor on a connection of its own, closing it drops the rest of the result unread."""
+        connection = pymysql.connect(cursorclass=pymysql.cursors.SSCursor, **self.connection_params)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
     def type_mapping(self):
         return {
             'DATETIME': 'TIMESTAMP',
@@ -132,25 +216,112 @@ class DorisSource(Source):
             self.pool = None
         logger.info(f"Close connection to Doris {self.connection_params['host']} successfully")
 
+    def unload_formats(self):
+        formats = {
+            PARQUET: ['zstd', 'snappy', 'lz4', 'gzip', None],
+            ORC: ['zstd', 'snappy', 'zlib', None],
+            CSV: [None],
+        }
+        export_format = self.config.get('export_format')
+        if export_format:
+            return {export_format: formats[export_format]}
+        return formats
+
+    def get_partitions(self, database_name, table_name):
+        result = self.execute_sql(f"SHOW PARTITIONS FROM {database_name}.{table_name}")
+        return [row[1] for row in result]
+
+    @cached_metadata
+    def get_partition_predicates(self, database_name, table_name):
+        predicates = {}
+        for row in self.execute_sql(f"SHOW PARTITIONS FROM {database_name}.{table_name}"):
+            columns = [column.replace('`', '').strip() for column in (row[5] or '').split(',') if column.strip()]
+            if not columns:
+                return {}
+            predicate = partition_predicate(columns, row[6])
+            if predicate is None:
+                logger.info(f"Partition {row[1]} of Doris table {database_name}.{table_name} "
+                            f"can not be selected by a predicate")
+                return {}
+            predicates[row[1]] = predicate
+        return predicates
+
     def unload_data(self, task):
+        """
+        Export the table partition by partition, up to export_parallelism exports at a time, and yield
+        the object storage path of each partition as soon as its export finishes. Partitions the task
+        already loaded in the run being resumed are left out, an incremental task only exports the rows
+        or partitions of its incremental range.
+        """
         logger.info(f"Begin to unload data from Doris table {task.name} to object storage")
-        file_path = f"{task.project_id}/{task.id}/{task.name.split('.')[1]}/"
+        db_name, table_name = task.name.split('.')
+        incremental_range = getattr(task, 'incremental_range', None)
+        where = None
+        if getattr(task, 'partition', None) is not None:
+            partitions = [task.partition]
+        elif incremental_range is not None and incremental_range.column is None:
+            partitions = incremental_range.partitions(self.get_partitions(db_name, table_name))
+        elif hasattr(task, 'transform_partitions') and task.transform_partitions:
+            partitions = list(task.transform_partitions[0])
+        else:
+            partitions = self.get_partitions(db_name, table_name)
+            if len(partitions) <= 1:
+                partitions = []
+        if incremental_range is not None and incremental_range.column is not None:
+            where = incremental_range.predicate()
+        completed_partitions = getattr(task, 'completed_partitions', None)
+        if partitions and completed_partitions:
+            partitions = [partition for partition in partitions if partition not in completed_partitions]
+            if not partitions:
+                logger.info(f"All partitions of Doris table {task.name} are already loaded")
+                return
+        table_path = f"{task.project_id}/{task.id}/{table_name}/"
+        if len(partitions) <= 1:
+            exports = [(partitions, table_path)]
+        else:
+            exports = [([partition], f"{table_path}{partition}/") for partition in partitions]
+        partition_paths = getattr(task, 'partition_paths', None)
+        if partition_paths is not None:
+            partition_paths.update({file_path: export_partitions[0]
+                                    for export_partitions, file_path in exports if len(export_partitions) == 1})
+        parallelism = min(len(exports), int(self.config.get('export_parallelism') or DEFAULT_EXPORT_PARALLELISM))
+        logger.info(f"Unload Doris table {task.name} with {len(exports)} exports, parallelism: {parallelism}")
+        pending_exports = list(reversed(exports))
+        running_exports = {}
+        while pending_exports or running_exports:
+            while pending_exports and len(running_exports) < parallelism:
+                export_partitions, file_path = pending_exports.pop()
+                future = self.export_partitions(task.name, export_partitions, file_path,
+                                                getattr(task, 'file_format', None), getattr(task, 'compression', None),
+                                                where)
+                running_exports[future] = file_path
+            done, _ = wait(running_exports, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = running_exports.pop(future)
+                row = future.result()
+                if row[2] != 'FINISHED':
+                    raise SourceExecutionError(
+                        f"Export job {row[1]} of Doris table {task.name} is {row[2]}, error: {row[10]}")
+                logger.info(f"Unload data from Doris {self.connection_params['host']} to path {file_path} successfully")
+                yield file_path
+        logger.info(f"Unload data from Doris table {task.name} successfully")
+
+    def export_partitions(self, table_full_name, partitions, file_path, file_format=None, compression=None,
+                          where=None):
+        """Submit an EXPORT job and return the future tracking it."""
         object_storage_conf = object_storage_util.get_object_storage_config(self.storage_config_path)
-        partitions = ''
-        if hasattr(task, 'transform_partitions') and task.transform_partitions:
-            partitions = ' PARTITION ( '
-            values = task.transform_partitions[0]
-            for index, value in enumerate(values):
-                if index == 0:
-                    partitions += value
-                else:
-                    partitions += f",{value}"
-            partitions += ' ) '
-        job_label = f"{task.name.split('.')[0]}_{task.name.split('.')[1]}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-        unload_sql = f"EXPORT TABLE {task.name}\n" \
-                     f"{partitions}\n " \
+        partition_clause = f" PARTITION ({', '.join(partitions)}) " if partitions else ''
+        if where:
+            partition_clause += f" WHERE {where} "
+        job_label = f"{table_full_name.replace('.', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+        format_property = f"\"format\" = \"{file_format}\",\n" if file_format else ''
+        if compression:
+            format_property += f"\"compress_type\" = \"{compression}\",\n"
+        unload_sql = f"EXPORT TABLE {table_full_name}\n" \
+                     f"{partition_clause}\n " \
                      f"TO \"s3://{object_storage_conf['bucket']}/{file_path}\" \n" \
                      f"PROPERTIES(\n" \
+                     f"{format_property}" \
                      f"\"label\" = \"{job_label}\" \n" \
                      f")\n" \
                      f"WITH S3\n" \
@@ -165,15 +336,18 @@ class DorisSource(Source):
             self.execute_sql(unload_sql)
         except BaseException as e:
             logger.error(f"Unload data from Doris {self.connection_params['host']} failed, error: {e}")
-            raise BaseException(f"Unload data from Doris {self.connection_params['host']} failed, error: {e}")
-        check_unload_status_sql = f"SHOW EXPORT FROM {task.name.split('.')[0]} WHERE LABEL = '{job_label}';"
-        while True:
-            result = self.execute_sql(check_unload_status_sql)
-            if len(result) > 0 and result[0][2] == 'FINISHED':
-                break
-            time.sleep(5)
-        logger.info(f"Unload data from Doris {self.connection_params['host']} to path {file_path} successfully")
-        return [file_path]
+            raise SourceExecutionError(f"Unload data from Doris {self.connection_params['host']} failed, error: {e}")
+        return self.export_tracker.track(table_full_name.split('.')[0], job_label)
 
     def int_type_string(self):
         return 'INT'
+
+    @cached_metadata
+    def get_table_size(self, database_name, table_name):
+        result = self.execute_sql(f"SHOW DATA FROM {database_name}.{table_name}")
+        index_sizes = []
+        for row in result:
+            if row[1] == 'Total':
+                return parse_size(row[2])
+            index_sizes.append(parse_size(row[2]))
+        return sum(index_sizes)
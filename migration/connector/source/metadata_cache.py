@@ -0,0 +1,59 @@
+import copy
+import functools
+import threading
+from concurrent.futures import Future
+
+
+class MetadataCache:
+    """
+    Per-run cache of table metadata keyed by (kind, database, table). Concurrent lookups of the same
+    key wait for the first one instead of querying the source again. Entries live until invalidated.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get_or_load(self, key, loader):
+        with self.lock:
+            future = self.entries.get(key)
+            owner = future is None
+            if owner:
+                future = self.entries[key] = Future()
+        if owner:
+            try:
+                future.set_result(loader())
+            except BaseException as e:
+                with self.lock:
+                    self.entries.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def put(self, key, value):
+        future = Future()
+        future.set_result(value)
+        with self.lock:
+            self.entries[key] = future
+
+    def invalidate(self, database_name=None, table_name=None):
+        with self.lock:
+            for key in list(self.entries):
+                if database_name is not None and key[1] != database_name:
+                    continue
+                if table_name is not None and (len(key) < 3 or key[2] != table_name):
+                    continue
+                del self.entries[key]
+
+
+def cached_metadata(method):
+    """
+    Cache the result of a source method taking (database_name[, table_name]) in the source's metadata cache.
+    Callers get a copy, so changing returned columns does not change the cache.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        value = self.metadata_cache.get_or_load((method.__name__,) + args, lambda: method(self, *args))
+        return copy.deepcopy(value)
+
+    return wrapper
@@ -1,6 +1,7 @@
 import logging
 import re
 import time
+from contextlib import contextmanager
 from datetime import datetime
 
 import pymysql
@@ -8,12 +9,24 @@ import sqlparse
 import pymysqlpool as pymysql_pool
 
 from migration.connector.source.base import Source
+from migration.connector.source.metadata_cache import cached_metadata
 from migration.base.exceptions import SourceExecutionError
 from migration.connector.source.enum import Column, ClusterInfo
+from migration.connector.source import chunked_export
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
 
+def parse_partition_columns(partition_expression):
+    """Partition columns of a partition expression made of plain columns, None for other expressions."""
+    columns = [column.strip().strip('`') for column in partition_expression.split(',')]
+    if all(re.fullmatch(r'\w+', column) for column in columns):
+        return columns
+    return None
+
+
 class MysqlSource(Source):
     def __init__(self, config: dict, meta_conf_path=None, storage_conf_path=None):
         super().__init__('Mysql', config)
@@ -55,13 +68,16 @@ class MysqlSource(Source):
         result = self.execute_sql("show databases")
         return [row[0] for row in result]
 
+    @cached_metadata
     def get_table_names(self, database_name):
         result = self.execute_sql(f"show tables from {database_name}")
         return [row[0] for row in result]
 
+    @cached_metadata
     def get_ddl_sql(self, database_name, table_name):
         return self.execute_sql(f"show create table {database_name}.{table_name}")[0][1]
 
+    @cached_metadata
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         result = self.execute_sql(f"desc {database_name}.{table_name}")
         table_columns = []
@@ -85,6 +101,14 @@ class MysqlSource(Source):
         finally:
             connection.close()
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
     def type_mapping(self):
         return {
             'DATETIME': 'TIMESTAMP',
@@ -101,7 +125,87 @@ class MysqlSource(Source):
     def int_type_string(self):
         return 'INT'
 
+    @cached_metadata
+    def get_table_size(self, database_name, table_name):
+        result = self.execute_sql("select data_length from information_schema.tables "
+                                  "where table_schema = %s and table_name = %s", (database_name, table_name))
+        return int(result[0][0] or 0) if result else 0
+
+    @cached_metadata
     def get_table_pk_columns(self, database_name, table_name):
         result = self.execute_sql(f"show index from {database_name}.{table_name}")
         pk_columns = [row[4] for row in result if row[2] == 'PRIMARY']
         return tuple(pk_columns)
+
+    def get_primary_key(self, database_name, table_name):
+        pk_columns = self.get_table_pk_columns(database_name, table_name)
+        return list(pk_columns) if pk_columns else None
+
+    def get_table_cluster_info(self, database_name, table_name):
+        return None
+
+    @cached_metadata
+    def get_table_partition_columns(self, database_name, table_name):
+        result = self.execute_sql("select partition_expression from information_schema.partitions "
+                                  "where table_schema = %s and table_name = %s and partition_expression is not null "
+                                  "limit 1", (database_name, table_name))
+        return parse_partition_columns(result[0][0]) if result else None
+
+    def get_table_stats(self, database_name):
+        result = self.execute_sql("select table_name, table_rows, update_time from information_schema.tables "
+                                  "where table_schema = %s", (database_name,))
+        return {row[0]: (row[1], str(row[2]) if row[2] else None) for row in result}
+
+    def load_database_metadata(self, database_name):
+        table_columns = {}
+        result = self.execute_sql("select table_name, column_name, column_type, is_nullable, column_default "
+                                  "from information_schema.columns where table_schema = %s "
+                                  "order by table_name, ordinal_position", (database_name,))
+        for row in result:
+            table_columns.setdefault(row[0], []).append(Column(name=row[1], type=row[2].upper(),
+                                                               is_null=True if row[3] == 'YES' else False,
+                                                               default_value=row[4]))
+        pk_columns = {}
+        result = self.execute_sql("select table_name, column_name from information_schema.statistics "
+                                  "where table_schema = %s and index_name = 'PRIMARY' "
+                                  "order by table_name, seq_in_index", (database_name,))
+        for row in result:
+            pk_columns.setdefault(row[0], []).append(row[1])
+        partition_columns = {}
+        result = self.execute_sql("select distinct table_name, partition_expression from information_schema.partitions "
+                                  "where table_schema = %s and partition_expression is not null", (database_name,))
+        for row in result:
+            partition_columns[row[0]] = parse_partition_columns(row[1])
+        for table_name, columns in table_columns.items():
+            self.metadata_cache.put(('get_table_columns', database_name, table_name), columns)
+            self.metadata_cache.put(('get_table_pk_columns', database_name, table_name),
+                                    tuple(pk_columns.get(table_name, ())))
+            self.metadata_cache.put(('get_table_partition_columns', database_name, table_name),
+                                    partition_columns.get(table_name))
+        logger.info(f"Loaded metadata of {len(table_columns)} tables in Mysql database {database_name}")
+
+    def sample_pk_values(self, database_name, table_name, pk_column, sample_rows):
+        result = self.execute_sql("select table_rows from information_schema.tables "
+                                  "where table_schema = %s and table_name = %s", (database_name, table_name))
+        table_rows = int(result[0][0] or 0) if result else 0
+        fraction = min(1.0, sample_rows / table_rows) if table_rows else 1.0
+        result = self.execute_sql(f"select `{pk_column}` from `{database_name}`.`{table_name}` "
+                                  f"where rand() < %s limit %s", (fraction, sample_rows * 2))
+        return [row[0] for row in result]
+
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Cursor streaming the rows of a query from the server, on a connection of its own."""
+        connection = pymysql.connect(cursorclass=pymysql.cursors.SSCursor, **self.connection_params)
+        try:
+            with connection.cursor() as cur:
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def unload_formats(self):
+        return chunked_export.unload_formats()
+
+    def unload_data(self, task):
+        return chunked_export.unload_chunks(self, task)
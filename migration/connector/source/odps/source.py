@@ -5,7 +5,10 @@ from odps import ODPS
 from migration.connector.source.enum import Column
 
 from migration.connector.source.base import Source
+from migration.connector.source.metadata_cache import cached_metadata
 from migration.base.exceptions import SourceExecutionError
+from migration.util.sql_util import sql_literal
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +44,7 @@ class OdpsSource(Source):
             logger.error(f"Connect to Odps {self.connection_params['endpoint']} failed, error: {e}")
             raise f"Connect to Odps {self.connection_params['endpoint']} failed, error: {e}"
 
+    @cached_metadata
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         result = self.odps.get_table(table_name)
         table_columns = []
@@ -67,6 +71,18 @@ class OdpsSource(Source):
             logger.error(f"PG connector execute sql {sql} failed, error: {e}")
             raise f"PG connector execute sql {sql} failed, error: {e}"
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the tunnel reader streams the whole result, the default reader stops at the instance result limit
+        with self.odps.execute_sql(sql).open_reader(tunnel=True, limit=False) as reader:
+            for record in reader:
+                yield record.values
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        # the Arrow tunnel reader hands over the record batches of the result as they are downloaded
+        with self.odps.execute_sql(sql).open_reader(tunnel=True, limit=False, arrow=True) as reader:
+            for batch in reader:
+                yield batch
+
     def type_mapping(self):
         return {}
 
@@ -78,3 +94,18 @@ class OdpsSource(Source):
 
     def quote_character(self):
         return "`"
+
+    @cached_metadata
+    def get_table_size(self, database_name, table_name):
+        return self.odps.get_table(table_name).size or 0
+
+    @cached_metadata
+    def get_partition_predicates(self, database_name, table_name):
+        table = self.odps.get_table(table_name)
+        if not table.table_schema.partitions:
+            return {}
+        predicates = {}
+        for partition in table.iterate_partitions():
+            spec = partition.partition_spec
+            predicates[str(spec)] = " AND ".join(f"{column} = {sql_literal(value)}" for column, value in spec.kv.items())
+        return predicates
@@ -1,6 +1,8 @@
 import logging
 import re
 import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 import psycopg2
 from psycopg2 import pool as psycopg2_pool
@@ -8,10 +10,42 @@ from psycopg2 import pool as psycopg2_pool
 from migration.connector.source.enum import Column
 
 from migration.connector.source.base import Source
+from migration.connector.source.metadata_cache import cached_metadata
 from migration.base.exceptions import SourceExecutionError
+from migration.connector.source import chunked_export
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS, iter_rows
+from migration.util.arrow_util import iter_cursor_batches
 
 logger = logging.getLogger(__name__)
 
+PARTITION_KEY_PATTERN = re.compile(r'(RANGE|LIST) \(([^,()]+)\)$')
+RANGE_BOUND_PATTERN = re.compile(r'FOR VALUES FROM \((.*)\) TO \((.*)\)$')
+LIST_BOUND_PATTERN = re.compile(r'FOR VALUES IN \((.*)\)$')
+
+
+def partition_predicate(partition_key, partition_bound):
+    """
+    Predicate selecting the rows of a child table from the partition key of its parent, e.g. RANGE (created_at),
+    and its bound, e.g. FOR VALUES FROM ('2024-01-01') TO ('2024-02-01'). None for hash and default
+    partitions, and for partition keys of several columns or expressions.
+    """
+    key_match = PARTITION_KEY_PATTERN.match(partition_key or '')
+    if not key_match:
+        return None
+    column = key_match.group(2).strip()
+    range_match = RANGE_BOUND_PATTERN.match(partition_bound or '')
+    if key_match.group(1) == 'RANGE' and range_match:
+        conditions = []
+        if range_match.group(1) != 'MINVALUE':
+            conditions.append(f"{column} >= {range_match.group(1)}")
+        if range_match.group(2) != 'MAXVALUE':
+            conditions.append(f"{column} < {range_match.group(2)}")
+        return " AND ".join(conditions) or f"{column} IS NOT NULL"
+    list_match = LIST_BOUND_PATTERN.match(partition_bound or '')
+    if key_match.group(1) == 'LIST' and list_match and 'NULL' not in list_match.group(1):
+        return f"{column} IN ({list_match.group(1)})"
+    return None
+
 
 class PGSource(Source):
     def __init__(self, config: dict, meta_conf_path=None, storage_conf_path=None):
@@ -53,6 +87,7 @@ class PGSource(Source):
             self.connection = psycopg2.connect(**self.connection_params)
             logger.info(f"Connect to PG {self.connection_params['host']} successfully")
 
+    @cached_metadata
     def get_table_columns(self, database_name, table_name) -> list[Column]:
         result = self.execute_sql(f"select column_name, data_type, is_nullable,column_default "
                                   f"from INFORMATION_SCHEMA.COLUMNS where table_name =  '{table_name}' and table_schema = '{database_name}'")
@@ -89,6 +124,14 @@ class PGSource(Source):
         finally:
             self.pool.putconn(connection)
 
+    def iter_sql(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_rows(cur, batch_size)
+
+    def iter_arrow(self, sql, batch_size=DEFAULT_FETCH_ROWS, bind_params=None):
+        with self.open_stream_cursor(sql, bind_params) as cur:
+            yield from iter_cursor_batches(cur, batch_size)
+
     def type_mapping(self):
         return {
             'TIME': 'DATE',
@@ -114,7 +157,127 @@ class PGSource(Source):
     def quote_character(self):
         return "\""
 
+    @cached_metadata
+    def get_table_size(self, database_name, table_name):
+        result = self.execute_sql(f"select pg_table_size('\"{database_name}\".\"{table_name}\"')")
+        return int(result[0][0] or 0) if result else 0
+
+    @cached_metadata
     def get_table_pk_columns(self, database_name, table_name):
-        result = self.execute_sql(f"select column_name from INFORMATION_SCHEMA.COLUMNS where table_name =  '{table_name}' and table_schema = '{database_name}' and column_key = 'PRI'")
+        result = self.execute_sql(f"select kcu.column_name from information_schema.table_constraints tc "
+                                  f"join information_schema.key_column_usage kcu "
+                                  f"on tc.constraint_name = kcu.constraint_name and tc.table_schema = kcu.table_schema "
+                                  f"and tc.table_name = kcu.table_name "
+                                  f"where tc.constraint_type = 'PRIMARY KEY' and tc.table_schema = '{database_name}' "
+                                  f"and tc.table_name = '{table_name}' order by kcu.ordinal_position")
         pk_columns = [row[0] for row in result]
-        return tuple(pk_columns)
\ No newline at end of file
+        return tuple(pk_columns)
+
+    @cached_metadata
+    def get_table_names(self, database_name):
+        result = self.execute_sql(f"select table_name from information_schema.tables "
+                                  f"where table_schema = '{database_name}' and table_type = 'BASE TABLE'")
+        return [row[0] for row in result]
+
+    @cached_metadata
+    def get_partition_predicates(self, database_name, table_name):
+        result = self.execute_sql(f"select pg_get_partkeydef(p.oid), c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                                  f"from pg_inherits i join pg_class c on c.oid = i.inhrelid "
+                                  f"join pg_class p on p.oid = i.inhparent "
+                                  f"join pg_namespace n on n.oid = p.relnamespace "
+                                  f"where n.nspname = '{database_name}' and p.relname = '{table_name}' "
+                                  f"order by c.relname")
+        predicates = {}
+        for partition_key, child_table_name, partition_bound in result:
+            predicate = partition_predicate(partition_key, partition_bound)
+            if predicate is None:
+                logger.info(f"Child table {child_table_name} of PG table {database_name}.{table_name} "
+                            f"can not be selected by a predicate")
+                return {}
+            predicates[child_table_name] = predicate
+        return predicates
+
+    def get_primary_key(self, database_name, table_name):
+        pk_columns = self.get_table_pk_columns(database_name, table_name)
+        return list(pk_columns) if pk_columns else None
+
+    def get_table_cluster_info(self, database_name, table_name):
+        return None
+
+    @cached_metadata
+    def get_table_partition_columns(self, database_name, table_name):
+        partition_columns = self.query_partition_columns(database_name, f"and c.relname = '{table_name}'")
+        return partition_columns.get(table_name)
+
+    def query_partition_columns(self, database_name, table_filter=''):
+        result = self.execute_sql(f"select c.relname, a.attname from pg_partitioned_table p "
+                                  f"join pg_class c on c.oid = p.partrelid "
+                                  f"join pg_namespace n on n.oid = c.relnamespace "
+                                  f"join pg_attribute a on a.attrelid = p.partrelid and a.attnum = any(p.partattrs) "
+                                  f"where n.nspname = '{database_name}' {table_filter} "
+                                  f"order by c.relname, array_position(p.partattrs::int2[], a.attnum)")
+        partition_columns = {}
+        for row in result:
+            partition_columns.setdefault(row[0], []).append(row[1])
+        return partition_columns
+
+    def get_table_stats(self, database_name):
+        # PG keeps no modification time of tables
+        result = self.execute_sql(f"select relname, n_live_tup from pg_stat_user_tables "
+                                  f"where schemaname = '{database_name}'")
+        return {row[0]: (row[1], None) for row in result}
+
+    def load_database_metadata(self, database_name):
+        table_columns = {}
+        result = self.execute_sql(f"select table_name, column_name, data_type, is_nullable, column_default "
+                                  f"from information_schema.columns where table_schema = '{database_name}' "
+                                  f"order by table_name, ordinal_position")
+        for row in result:
+            table_columns.setdefault(row[0], []).append(Column(name=row[1], type=row[2].upper(),
+                                                               is_null=True if row[3].strip() == 'YES' else False,
+                                                               default_value=row[4]))
+        pk_columns = {}
+        result = self.execute_sql(f"select tc.table_name, kcu.column_name from information_schema.table_constraints tc "
+                                  f"join information_schema.key_column_usage kcu "
+                                  f"on tc.constraint_name = kcu.constraint_name and tc.table_schema = kcu.table_schema "
+                                  f"and tc.table_name = kcu.table_name "
+                                  f"where tc.constraint_type = 'PRIMARY KEY' and tc.table_schema = '{database_name}' "
+                                  f"order by tc.table_name, kcu.ordinal_position")
+        for row in result:
+            pk_columns.setdefault(row[0], []).append(row[1])
+        partition_columns = self.query_partition_columns(database_name)
+        for table_name, columns in table_columns.items():
+            self.metadata_cache.put(('get_table_columns', database_name, table_name), columns)
+            self.metadata_cache.put(('get_table_pk_columns', database_name, table_name),
+                                    tuple(pk_columns.get(table_name, ())))
+            self.metadata_cache.put(('get_table_partition_columns', database_name, table_name),
+                                    partition_columns.get(table_name))
+        logger.info(f"Loaded metadata of {len(table_columns)} tables in PG schema {database_name}")
+
+    def sample_pk_values(self, database_name, table_name, pk_column, sample_rows):
+        result = self.execute_sql(f"select c.reltuples from pg_class c join pg_namespace n on n.oid = c.relnamespace "
+                                  f"where n.nspname = '{database_name}' and c.relname = '{table_name}'")
+        table_rows = float(result[0][0] or 0) if result else 0
+        # reltuples is -1 for tables never analyzed, sample every block then
+        percentage = min(100.0, 100.0 * sample_rows / table_rows) if table_rows > 0 else 100.0
+        result = self.execute_sql(f"select \"{pk_column}\" from \"{database_name}\".\"{table_name}\" "
+                                  f"tablesample system ({percentage})")
+        return [row[0] for row in result]
+
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        """Named cursor streaming the rows of a query from the server, on a connection of its own."""
+        connection = psycopg2.connect(**self.connection_params)
+        try:
+            with connection.cursor(name=f"migration_{uuid.uuid4().hex}") as cur:
+                cur.itersize = chunked_export.FETCH_BATCH_ROWS
+                cur.execute(sql, bind_params)
+                yield cur
+        finally:
+            connection.close()
+
+    def unload_formats(self):
+        return chunked_export.unload_formats()
+
+    def unload_data(self, task):
+        return chunked_export.unload_chunks(self, task)
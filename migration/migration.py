@@ -2,13 +2,13 @@
 migration migration tool
 usage:
     cz-migration test -p <profile_path> [test connection for source and destination]
-    cz-migration meta -p <profile_path>  --out_path <meta_out_file_path>[generate meta from source]
-    cz-migration schema -p <profile_path> [--table_list_file <external_table_list_file>][migrate schema from source to destination]
-    cz-migration data -p <profile_path> --meta_conf <meta_conf> --storage_conf <storage_conf> [--table_list_file <external_table_list_file>][migrate data from source to destination]
-    cz-migration validate -p <profile_path> [--table_list_file <external_table_list_file>][validate data from source and destination]
-    cz-migration run -p <profile_path> --meta_conf <meta_conf> --storage_conf <storage_conf> [--table_list_file <external_table_list_file>][migrate schema and data from source to destination, including validation]
+    cz-migration meta -p <profile_path>  --out_path <meta_out_file_path> [--snapshot][generate meta from source, or a metadata snapshot with --snapshot]
+    cz-migration schema -p <profile_path> [--table_list_file <external_table_list_file>] [--meta_snapshot=<meta_snapshot_file>][migrate schema from source to destination]
+    cz-migration data -p <profile_path> --meta_conf <meta_conf> --storage_conf <storage_conf> [--table_list_file <external_table_list_file>] [--meta_snapshot=<meta_snapshot_file>][migrate data from source to destination]
+    cz-migration validate -p <profile_path> [--table_list_file <external_table_list_file>] [--meta_snapshot=<meta_snapshot_file>][validate data from source and destination]
+    cz-migration run -p <profile_path> --meta_conf <meta_conf> --storage_conf <storage_conf> [--table_list_file <external_table_list_file>] [--meta_snapshot=<meta_snapshot_file>][migrate schema and data from source to destination, including validation]
     cz-migration status -p <profile_path> [check migration status]
-    cz-migration resume -p <profile_path> [resume migration]
+    cz-migration resume -p <profile_path> --meta_conf <meta_conf> --storage_conf <storage_conf> [--table_list_file <external_table_list_file>] [--meta_snapshot=<meta_snapshot_file>][resume the latest migration, restarting its unfinished tasks]
     cz-migration report -p <profile_path> [generate migration report]
 """
 import logging
@@ -23,10 +23,14 @@ from migration.connector.destination.doris.destination import DorisDestination
 from migration.connector.source import Source
 from migration.connector.source.clickzetta.source import ClickzettaSource
 from migration.connector.source.doris.source import DorisSource
+from migration.connector.source.mysql.source import MysqlSource
+from migration.connector.source.pg.source import PGSource
 from migration.scheduler.data_transformer.transformer import DataTransformer
 from migration.scheduler.data_validation.validation import Validation
 from migration.scheduler.schema_transformer.transformer import SchemaTransformer
 from migration.scheduler.unify_transformer.transformer import UnifyTransformer
+import migration.util.checkpoint as checkpoint
+import migration.util.metadata_snapshot as metadata_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -38,21 +42,26 @@ def test(source: Source, destination: Destination):
         print("Test connection failed!")
 
 
-def meta(source: Source, out_path: str):
+def meta(source: Source, out_path: str, snapshot: bool = False):
     logger.info(f"Generating meta from source {source} to {out_path}")
     print(f"Generating meta from source {source} to {out_path}")
     start_time = time.time()
     dbs = source.get_database_names()
     out_path_dir = os.path.dirname(out_path)
-    if not os.path.exists(out_path_dir):
+    if out_path_dir and not os.path.exists(out_path_dir):
         os.makedirs(out_path_dir)
-    with open(out_path, 'w') as f:
-        for db in dbs:
-            if db.startswith("__") or db.startswith("information_schema"):
-                continue
-            tables = source.get_table_names(db)
+    tables = []
+    for db in dbs:
+        if db.startswith("__") or db.startswith("information_schema"):
+            continue
+        for table in source.get_table_names(db):
+            tables.append(f"{db}.{table}")
+    if snapshot:
+        metadata_snapshot.write_snapshot(source, tables, out_path)
+    else:
+        with open(out_path, 'w') as f:
             for table in tables:
-                f.write(f"{db}.{table}\n")
+                f.write(f"{table}\n")
 
     logger.info(f"Generating meta from source {source} to {out_path} finished, time cost: {time.time() - start_time}")
 
@@ -71,13 +80,14 @@ def schema(source: Source, destination: Destination, db_list: list, config_table
 
 def data(source: Source, destination: Destination, db_list: list, config_table_list: list, external_table_list: list,
          project_name: str, scheduler_concurrency: int, quit_if_fail: bool, thread_concurrency: int,
-         transform_partitions: dict, dest_table_list: list):
+         transform_partitions: dict, dest_table_list: list, incremental_tables: dict):
     logger.info(f"Transforming data from source {source} to destination {destination}")
     print(f"Transforming data from source {source} to destination {destination}")
     start_time = time.time()
     DataTransformer(source, destination, project_name, db_list, config_table_list, external_table_list,
                     scheduler_concurrency,
-                    quit_if_fail, thread_concurrency, transform_partitions, dest_table_list).transform()
+                    quit_if_fail, thread_concurrency, transform_partitions, dest_table_list,
+                    incremental_tables=incremental_tables).transform()
     logger.info(
         f"Transforming data from source {source} to destination {destination} finished, time cost: {time.time() - start_time}")
 
@@ -97,13 +107,14 @@ def validate(source: Source, destination: Destination, db_list: list, config_tab
 
 def run(source: Source, destination: Destination, db_list: list, config_table_list: list, external_table_list: list,
         project_name: str, scheduler_concurrency: int, quit_if_fail: bool, thread_concurrency: int,
-        transform_partitions: dict):
+        transform_partitions: dict, incremental_tables: dict):
     logger.info(f"Running migration from source {source} to destination {destination}")
     print(f"Running migration from source {source} to destination {destination}")
     start_time = time.time()
     UnifyTransformer(source, destination, project_name, db_list, config_table_list, external_table_list,
                      scheduler_concurrency,
-                     quit_if_fail, thread_concurrency, transform_partitions).transform()
+                     quit_if_fail, thread_concurrency, transform_partitions,
+                     incremental_tables=incremental_tables).transform()
     logger.info(
         f"Running migration from source {source} to destination {destination} finished, time cost: {time.time() - start_time}")
 
@@ -113,8 +124,21 @@ def status(destination: Destination, project_name: str):
     mts.get_last_migration_status(destination, project_name)
 
 
-def resume(source: Source, destination: Destination):
-    pass
+def resume(source: Source, destination: Destination, db_list: list, config_table_list: list,
+           external_table_list: list, project_name: str, scheduler_concurrency: int, quit_if_fail: bool,
+           thread_concurrency: int, transform_partitions: dict, incremental_tables: dict):
+    import migration.util.migration_tasks_status as mts
+    logger.info(f"Resuming migration from source {source} to destination {destination}")
+    print(f"Resuming migration from source {source} to destination {destination}")
+    start_time = time.time()
+    resume_state = mts.get_resume_state(destination, project_name)
+    print(f"Resuming {resume_state.project_id}")
+    UnifyTransformer(source, destination, project_name, db_list, config_table_list, external_table_list,
+                     scheduler_concurrency,
+                     quit_if_fail, thread_concurrency, transform_partitions, resume_state,
+                     incremental_tables).transform()
+    logger.info(
+        f"Resuming migration from source {source} to destination {destination} finished, time cost: {time.time() - start_time}")
 
 
 def report(destination: Destination, project_name: str):
@@ -146,6 +170,10 @@ def main():
     print(f"Using project version  {project_version}")
     project_desc = profile['description']
     print(f"Using project description  {project_desc}")
+    # relative to the profile, so a run is resumed from any working directory
+    checkpoint_dir = os.path.join(os.path.dirname(os.path.abspath(profile_path)), profile.get('checkpoint_dir', '.'))
+    print(f"Using checkpoint dir  {checkpoint_dir}")
+    checkpoint.set_checkpoint_dir(checkpoint_dir)
     source_config = profile['source']
     if args['--meta_conf']:
         meta_conf_path = args['<meta_conf>']
@@ -160,7 +188,12 @@ def main():
     transform_partitions = {}
     if source_config['type'].strip() == 'doris':
         config = {'fe_servers': source_config['fe_servers'], 'user': source_config['username'],
-                  'password': source_config['password']}
+                  'password': source_config['password'],
+                  'max_bytes_in_flight': source_config.get('max_bytes_in_flight'),
+                  'export_parallelism': source_config.get('export_parallelism'),
+                  'export_format': source_config.get('export_format'),
+                  'job_timeout': source_config.get('job_timeout'),
+                  'partition_diff': source_config.get('partition_diff')}
         logger.info(f"migration source {config}")
         if 'transform_partitions' in source_config and source_config['transform_partitions']:
             tables = source_config['transform_partitions']['tables']
@@ -192,7 +225,9 @@ def main():
         config = {'service': source_config['service'], 'username': source_config['username'],
                   'workspace': source_config['workspace'], 'password': source_config['password'],
                   'instance': source_config['instance'], 'vcluster': source_config['vcluster'],
-                  'instanceId': source_config['instanceId']}
+                  'instanceId': source_config['instanceId'],
+                  'max_bytes_in_flight': source_config.get('max_bytes_in_flight'),
+                  'partition_diff': source_config.get('partition_diff')}
         logger.info(f"migration source {config}")
         if 'transform_partitions' in source_config and source_config['transform_partitions']:
             tables = source_config['transform_partitions']['tables']
@@ -221,25 +256,71 @@ def main():
                             raise Exception("migration_tables and dest_tables should have same length")
             else:
                 db_list = source_config['migration_dbs']
+    elif source_config['type'].strip() in ('mysql', 'postgresql'):
+        config = {'host': source_config['host'], 'port': source_config['port'], 'user': source_config['username'],
+                  'password': source_config['password'], 'database': source_config.get('database'),
+                  'max_bytes_in_flight': source_config.get('max_bytes_in_flight'),
+                  'export_parallelism': source_config.get('export_parallelism'),
+                  'export_chunk_size': source_config.get('export_chunk_size'),
+                  'partition_diff': source_config.get('partition_diff')}
+        logger.info(f"migration source {config}")
+        print(f"migration source {config}")
+        if source_config['type'].strip() == 'mysql':
+            source = MysqlSource(config, meta_conf_path, storage_conf_path)
+        else:
+            source = PGSource(config, meta_conf_path, storage_conf_path)
+        if args['--table_list_file']:
+            with open(args['<external_table_list_file>'], 'r') as f:
+                lines = f.readlines()
+                for line in lines:
+                    external_table_list.append(line.strip())
+        else:
+            if 'migration_dbs' not in source_config:
+                if 'migration_tables' not in source_config:
+                    raise Exception("migration_dbs and migration_tables are both not provided in profile.yml")
+                else:
+                    config_table_list = source_config['migration_tables']
+                    if 'dest_tables' in source_config:
+                        dest_table_list = source_config['dest_tables']
+                        if len(config_table_list) != len(dest_table_list):
+                            raise Exception("migration_tables and dest_tables should have same length")
+            else:
+                db_list = source_config['migration_dbs']
     else:
         raise Exception(f"Unsupported source type: {source_config['type']}")
+    incremental_tables = {}
+    if 'incremental' in source_config and source_config['incremental']:
+        tables = source_config['incremental']['tables']
+        columns = source_config['incremental'].get('columns') or [None] * len(tables)
+        if not len(columns) == len(tables):
+            raise Exception("incremental columns and tables should have same length")
+        incremental_tables = dict(zip(tables, columns))
     destination_config = profile['destination']
     if destination_config['type'].strip() == 'clickzetta':
         config = {'service': destination_config['service'], 'username': destination_config['username'],
                   'workspace': destination_config['workspace'], 'password': destination_config['password'],
                   'instance': destination_config['instance'], 'vcluster': destination_config['vcluster'],
-                  'instanceId': destination_config['instanceId']}
+                  'instanceId': destination_config['instanceId'],
+                  'max_bytes_in_flight': destination_config.get('max_bytes_in_flight'),
+                  'load_concurrency': destination_config.get('load_concurrency'),
+                  'volume': destination_config.get('volume')}
         logger.info(f"migration destination {config}")
         print(f"migration destination {config}")
         destination = ClickZettaDestination(config, meta_conf_path, storage_conf_path)
     elif destination_config['type'].strip() == 'doris':
         config = {'fe_servers': destination_config['fe_servers'], 'user': destination_config['username'],
-                  'password': destination_config['password']}
+                  'password': destination_config['password'],
+                  'max_bytes_in_flight': destination_config.get('max_bytes_in_flight'),
+                  'load_concurrency': destination_config.get('load_concurrency'),
+                  'job_timeout': destination_config.get('job_timeout')}
         logger.info(f"migration destination {config}")
         print(f"migration destination {config}")
         destination = DorisDestination(config, meta_conf_path, storage_conf_path)
     else:
         raise Exception(f"Unsupported destination type: {destination_config['type']}")
+    if args['--meta_snapshot']:
+        print(f"Using metadata snapshot {args['--meta_snapshot']}")
+        metadata_snapshot.apply_snapshot(source, metadata_snapshot.load_snapshot(args['--meta_snapshot']))
     if 'concurrency' in profile:
         concurrency = profile['scheduler_concurrency']
     if 'quit_if_fail' in profile:
@@ -249,23 +330,24 @@ def main():
     if args['test']:
         test(source, destination)
     elif args['meta']:
-        meta(source, args['<meta_out_file_path>'])
+        meta(source, args['<meta_out_file_path>'], bool(args['--snapshot']))
     elif args['schema']:
         schema(source, destination, db_list, config_table_list, external_table_list, project_name, concurrency,
                quit_if_fail, thread_concurrency)
     elif args['data']:
         data(source, destination, db_list, config_table_list, external_table_list, project_name, concurrency,
-             quit_if_fail, thread_concurrency, transform_partitions, dest_table_list)
+             quit_if_fail, thread_concurrency, transform_partitions, dest_table_list, incremental_tables)
     elif args['validate']:
         validate(source, destination, db_list, config_table_list, external_table_list, project_name, concurrency,
                  quit_if_fail, thread_concurrency)
     elif args['run']:
         run(source, destination, db_list, config_table_list, external_table_list, project_name, concurrency,
-            quit_if_fail, thread_concurrency, transform_partitions)
+            quit_if_fail, thread_concurrency, transform_partitions, incremental_tables)
     elif args['status']:
         status(destination, project_name)
     elif args['resume']:
-        resume(source, destination)
+        resume(source, destination, db_list, config_table_list, external_table_list, project_name, concurrency,
+               quit_if_fail, thread_concurrency, transform_partitions, incremental_tables)
     elif args['report']:
         report(destination, project_name)
     else:
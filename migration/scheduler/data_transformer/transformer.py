@@ -6,9 +6,11 @@ from migration.base.exceptions import SchedulerRuntimeError
 from migration.base.status import TaskType
 from migration.connector.destination.base import Destination
 from migration.connector.source import Source
-from migration.scheduler.scheduler import SchedulerConfig, Scheduler
 from migration.scheduler.transformer import Transformer
 from migration.scheduler.task.data_task import DataMigrationTask
+from migration.connector.file_format import negotiate_file_format
+from migration.util.watermark import IncrementalRange, WatermarkStore
+from migration.util.partition_util import diff_partitions
 
 DOT_SPLITTER = '.'
 LEFT_BRACKET = '('
@@ -17,13 +19,20 @@ logger = logging.getLogger(__name__)
 
 
 class DataTransformer(Transformer):
+    task_types = [TaskType.DATA_MIGRATION]
+
     def __init__(self, source: Source, destination: Destination, project_name: str, db_list=None,
                  config_table_list=None,
                  external_table_list=None,
-                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, transform_partitions=None, dest_table_list=None):
+                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, transform_partitions=None, dest_table_list=None,
+                 project_id=None, resume_state=None, incremental_tables=None):
         super().__init__(source, destination, project_name, db_list, config_table_list, external_table_list,
-                         scheduler_concurrency, quit_if_fail, thread_concurrency, dest_table_list)
+                         scheduler_concurrency, quit_if_fail, thread_concurrency, dest_table_list, project_id,
+                         resume_state)
         self.transform_partitions = transform_partitions
+        # table -> watermark column, None to migrate the table incrementally by partition
+        self.incremental_tables = incremental_tables or {}
+        self.watermark_store = WatermarkStore(destination, project_name) if self.incremental_tables else None
 
     def get_migration_tasks(self):
         transform_table_list = self.get_transform_table_list()
@@ -50,28 +59,110 @@ class DataTransformer(Transformer):
                         data_migration_tables.append(f"{db}.{result[0]}")
                 else:
                     data_migration_tables.append(table)
+        dest_tables = dest_table_list if dest_table_list else [None] * len(data_migration_tables)
+        pending_tables = set(self.pending_tables(data_migration_tables, TaskType.DATA_MIGRATION))
+        dest_tables = [dest for table, dest in zip(data_migration_tables, dest_tables) if table in pending_tables]
+        data_migration_tables = [table for table in data_migration_tables if table in pending_tables]
         logger.debug(f"data migration tasks: {data_migration_tables}")
         logger.info(f"data migration tasks count: {len(data_migration_tables)}")
-        data_migration_tasks = []
-        for index, table in enumerate(data_migration_tables):
-            task = DataMigrationTask(name=table, task_type=TaskType.DATA_MIGRATION, destination=self.destination,
-                                     project_id=self.project_id, source=self.source, dest_table=dest_table_list[index] if dest_table_list else None,
-                                     transform_partitions=self.transform_partitions[
-                                         table] if self.transform_partitions else None)
-            migration_tasks_status.init_task_status(self.destination, task)
-            data_migration_tasks.append(task)
+        file_format, compression = negotiate_file_format(self.source.unload_formats(), self.destination.load_formats())
+        data_migration_tasks = [task for tasks in self.pool.map(self.construct_data_tasks, data_migration_tables,
+                                                                dest_tables) for task in tasks]
+        for task in data_migration_tasks:
+            task.file_format, task.compression = file_format, compression
+        migration_tasks_status.init_tasks_status(self.destination, data_migration_tasks)
 
         return data_migration_tasks
 
+    def construct_data_tasks(self, table, dest_table):
+        """
+        With partition_diff on, a partitioned table gets a task for each partition missing from the destination
+        or holding a different number of rows there, other tables get one task for the whole table.
+        """
+        if not self.source.config.get('partition_diff') or table in self.incremental_tables or \
+                (self.transform_partitions and table in self.transform_partitions):
+            return [self.construct_data_task(table, dest_table)]
+        try:
+            partitions = diff_partitions(self.source, self.destination, table, dest_table or table)
+        except Exception as e:
+            logger.warning(f"Failed to diff partitions of table {table}, transfer the whole table, error: {e}")
+            partitions = None
+        if partitions is None:
+            return [self.construct_data_task(table, dest_table)]
+        # a partition is estimated at its share of the table, all of its partitions count
+        partition_count = max(len(self.source.get_partition_predicates(*table.split(DOT_SPLITTER))), 1)
+        tasks = []
+        for partition, predicate in partitions.items():
+            task = self.construct_data_task(table, dest_table, partition, predicate)
+            task.estimated_size //= partition_count
+            tasks.append(task)
+        return tasks
+
+    def construct_data_task(self, table, dest_table, partition=None, partition_predicate=None):
+        task = DataMigrationTask(name=table, task_type=TaskType.DATA_MIGRATION, destination=self.destination,
+                                 project_id=self.project_id, source=self.source, dest_table=dest_table,
+                                 transform_partitions=self.transform_partitions[
+                                     table] if self.transform_partitions else None)
+        task.partition = partition
+        task.partition_predicate = partition_predicate
+        task.estimated_size = self.estimate_table_size(table)
+        if table in self.incremental_tables:
+            try:
+                self.init_incremental_task(task)
+            except ProfileConfigError as e:
+                # the other tables still migrate, this one is copied again as a whole
+                logger.warning(f"Failed to migrate table {table} incrementally, migrate the whole table, error: {e}")
+                task.truncate_before_load = True
+        if self.resume_state is not None and partition is None:
+            self.resume_task(task)
+        return task
+
+    def resume_task(self, task: DataMigrationTask):
+        """
+        Skip the partitions the run being resumed already loaded. A table it may have loaded partly, but
+        without any partition recorded, is truncated first so that its rows are not loaded twice.
+        """
+        task.completed_partitions = self.resume_state.completed_partitions(task.name)
+        if task.completed_partitions:
+            logger.info(f"Resume data migration of {task.name}, skipping {len(task.completed_partitions)} "
+                        f"loaded partitions")
+        elif self.resume_state.has_run(task.name, TaskType.DATA_MIGRATION):
+            if task.incremental_range is not None:
+                logger.info(f"Data migration of {task.name} is restarted, its rows are merged again")
+            elif task.transform_partitions:
+                logger.warning(f"Data migration of {task.name} is restarted without loaded partitions recorded, "
+                               f"rows loaded by the previous run may be loaded again")
+            else:
+                task.truncate_before_load = True
+
+    def init_incremental_task(self, task: DataMigrationTask):
+        """
+        Migrate only the rows or partitions changed since the watermark of the previous run, merging them into
+        the destination on the primary key. The new watermark is read before the export starts, rows
+        changed during the export are migrated by the next run.
+        """
+        db, table = task.name.split(DOT_SPLITTER)
+        column = self.incremental_tables[task.name]
+        primary_keys = self.source.get_primary_key(db, table)
+        if not primary_keys:
+            raise ProfileConfigError(f"Table {task.name} has no primary key to merge incremental data on")
+        task.primary_keys = primary_keys
+        if column:
+            high = self.source.get_max_value(db, table, column)
+        else:
+            partitions = self.source.get_partitions(db, table)
+            high = partitions[-1] if partitions else None
+        task.incremental_range = IncrementalRange(column, self.watermark_store.get(task.name, column), high)
+        task.watermark_store = self.watermark_store
+        logger.info(f"Data migration of {task.name} is incremental, range: {task.incremental_range}")
+
+    def estimate_table_size(self, table):
+        try:
+            return self.source.get_table_size(*table.split(DOT_SPLITTER))
+        except Exception as e:
+            logger.warning(f"Failed to estimate size of table {table}, error: {e}")
+            return 0
+
     def schedule_migration_tasks(self):
         migration_tasks = self.get_migration_tasks()
-        if migration_tasks:
-            if len(migration_tasks) < self.transform_concurrency:
-                schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                scheduler = Scheduler(schedule_config)
-                self.schedules_tasks_map[scheduler] = migration_tasks
-            else:
-                for i in range(self.transform_concurrency):
-                    schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                    scheduler = Scheduler(schedule_config)
-                    self.schedules_tasks_map[scheduler] = migration_tasks[i::self.transform_concurrency]
+        self.schedule_tasks(migration_tasks)
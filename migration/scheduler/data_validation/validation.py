@@ -4,7 +4,6 @@ from migration.base import ProfileConfigError
 from migration.base.status import TaskType
 from migration.connector.destination.base import Destination
 from migration.connector.source import Source
-from migration.scheduler.scheduler import SchedulerConfig, Scheduler
 from migration.scheduler.transformer import Transformer
 from migration.scheduler.task.validation_task import ValidationTask
 from migration.util import migration_tasks_status
@@ -16,6 +15,7 @@ LEFT_BRACKET = '('
 
 
 class Validation(Transformer):
+    task_types = [TaskType.DATA_VALIDATION]
 
     def get_migration_tasks(self):
         transform_table_list = self.get_transform_table_list()
@@ -38,26 +38,19 @@ class Validation(Transformer):
                         validation_tables.append(f"{db}.{result[0]}")
                 else:
                     validation_tables.append(table)
+        validation_tables = self.pending_tables(validation_tables, TaskType.DATA_VALIDATION)
         logger.debug(f"validation tasks: {validation_tables}")
         logger.info(f"validation tasks count: {len(validation_tables)}")
+        self.load_metadata(validation_tables)
         validation_tasks = []
         for table in validation_tables:
             task = ValidationTask(name=table, task_type=TaskType.DATA_VALIDATION, destination=self.destination,
                                   project_id=self.project_id, source=self.source)
-            migration_tasks_status.init_task_status(self.destination, task)
             validation_tasks.append(task)
+        migration_tasks_status.init_tasks_status(self.destination, validation_tasks)
 
         return validation_tasks
 
     def schedule_migration_tasks(self):
         migration_tasks = self.get_migration_tasks()
-        if migration_tasks:
-            if len(migration_tasks) < self.transform_concurrency:
-                schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                scheduler = Scheduler(schedule_config)
-                self.schedules_tasks_map[scheduler] = migration_tasks
-            else:
-                for i in range(self.transform_concurrency):
-                    schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                    scheduler = Scheduler(schedule_config)
-                    self.schedules_tasks_map[scheduler] = migration_tasks[i::self.transform_concurrency]
+        self.schedule_tasks(migration_tasks)
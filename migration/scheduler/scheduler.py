@@ -1,13 +1,11 @@
 import logging
-import time
-from concurrent.futures import ThreadPoolExecutor, CancelledError
 import threading
-from queue import Queue, Empty
-import schedule
-from migration.base.exceptions import TaskRuntimeError
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+PROGRESS_LOG_INTERVAL = 30
+
 
 class SchedulerConfig:
     def __init__(self, max_workers=10, queue_size=10, task_timeout=60, task_retry=3, quit_if_failed=False):
@@ -19,108 +17,108 @@ class SchedulerConfig:
 
 
 class Scheduler:
+    """
+    Runs tasks on a thread pool and reacts to their completion through future callbacks,
+    so results are handled and failed tasks are retried as soon as they finish.
+    """
+
     def __init__(self, config: SchedulerConfig):
         self.config = config
         self.executor = ThreadPoolExecutor(max_workers=config.max_workers)
-        self.future_results = Queue(maxsize=config.queue_size)
-        self.deamon_thread = threading.Thread(daemon=True, target=self.run_scheduler_jobs)
+        self.condition = threading.Condition()
         self.succeed_tasks = []
         self.failed_tasks = []
-        self.running_tasks = []
+        self.running_tasks = {}
         self.finish_called = False
         self.tasks_num = 0
+        self.task_queue = None
+        self.slots = threading.BoundedSemaphore(config.max_workers)
         logger.info(f"Scheduler is initialized with config: {config.__dict__}")
 
     def add_task(self, task):
-        self.future_results.put(self.executor.submit(task.run))
-        logger.info(f"Task:{task.__str__} is added to scheduler")
+        self.submit_task(task)
+        logger.info(f"Task:{task} is added to scheduler")
+
+    def submit_task(self, task):
+        future = self.executor.submit(task.run)
+        with self.condition:
+            self.running_tasks[future] = task
+        future.add_done_callback(self.process_done_task_future)
 
     def run(self):
-        try:
-            schedule.every(1).seconds.do(self.check_task_result)
-            schedule.every(1).seconds.do(self.check_running_task_status)
-            self.deamon_thread.start()
-        except Exception as e:
-            logger.error(f"Scheduler failed to process all tasks, error: {e}")
-
-    def run_scheduler_jobs(self):
-        try:
-            while True:
-                if self.finish_called:
-                    break
-                schedule.run_pending()
-                time.sleep(1)
-        except Exception as e:
-            logger.error(f"Scheduler failed to process all tasks, error: {e}")
-
-    def check_task_result(self):
-        if self.future_results.empty():
+        logger.info(f"Scheduler is running with {self.config.max_workers} workers")
+
+    def consume(self, task_queue):
+        """Pull tasks from the shared queue whenever a worker is free, until the queue is drained."""
+        self.task_queue = task_queue
+        while True:
+            self.slots.acquire()
+            task = task_queue.get()
+            if task is None:
+                self.slots.release()
+                break
+            with self.condition:
+                self.tasks_num += 1
+            self.submit_task(task)
+        self.finish()
+
+    def process_done_task_future(self, future):
+        with self.condition:
+            task = self.running_tasks.pop(future)
+        if future.cancelled():
+            logger.error(f"Task:{task} is cancelled with unknown reason")
+            self.complete_task(task, succeed=False)
             return
-        try:
-            feature = self.future_results.get_nowait()
-            if feature is not None:
-                if feature.cancelled():
-                    logger.error("Task is cancelled with unknown reason")
-                    raise CancelledError("Task is cancelled with unknown reason")
-
-                elif feature.done():
-                    self.process_done_task_feature(feature)
-                elif feature.running():
-                    print("add running task")
-                    self.running_tasks.append(feature)
-                elif feature._state == "PENDING":
-                    print("add pending task")
-                    self.running_tasks.append(feature)
-
-        except CancelledError as e:
-            raise e
-        except Exception as e:
-            raise e
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Task:{task} raised an unexpected error: {error}")
+            result = task
+        else:
+            result = future.result()
+        if error is None and result.is_success():
+            self.complete_task(result, succeed=True)
+        elif result.retry_times < self.config.task_retry and not self.finish_called:
+            logger.info(
+                f"Task:{result} is failed, begin to retry the {result.retry_times + 1} time, "
+                f"max_retry is {self.config.task_retry}")
+            result.retry_times += 1
+            self.submit_task(result)
+        else:
+            logger.error(f"Task:{result} is failed, max_retry is {self.config.task_retry}")
+            self.complete_task(result, succeed=False)
+
+    def complete_task(self, task, succeed: bool):
+        with self.condition:
+            if succeed:
+                self.succeed_tasks.append(task)
+            else:
+                self.failed_tasks.append(task)
+            self.condition.notify_all()
+        if self.task_queue is not None:
+            self.task_queue.task_done(task)
+            self.slots.release()
+
+    def finished_tasks_num(self):
+        return len(self.succeed_tasks) + len(self.failed_tasks)
 
     def shutdown(self):
         self.executor.shutdown(wait=True, cancel_futures=True)
-        schedule.clear()
-        self.deamon_thread.join()
         for succeed_task in self.succeed_tasks:
-            logger.info(f"Task:{succeed_task.__str__} is succeed")
+            logger.info(f"Task:{succeed_task} is succeed")
         for failed_task in self.failed_tasks:
-            logger.error(f"Task:{failed_task.__str__} is failed")
-
-    def process_done_task_feature(self, feature):
-        try:
-            result = feature.result()
-            if result.is_success():
-                self.succeed_tasks.append(result)
-            elif result.is_failed():
-                if result.retry_times < self.config.task_retry:
-                    logger.info(
-                        f"Task:{result.__str__} is failed, begin to retry the {result.retry_times + 1} time, "
-                        f"max_retry is {self.config.task_retry}")
-                    result.retry_times += 1
-                    self.future_results.put(self.executor.submit(result.run))
-                else:
-                    logger.error(f"Task:{result.__str__} is failed, max_retry is {self.config.task_retry}")
-                    self.failed_tasks.append(result)
-        except TaskRuntimeError as e:
-            raise e
-
-    def check_running_task_status(self):
-        for task in self.running_tasks:
-            if task.done():
-                self.process_done_task_feature(task)
-                self.running_tasks.remove(task)
-                print(f"remove running task {task} from running_tasks")
+            logger.error(f"Task:{failed_task} is failed")
 
     def finish(self):
-        while True:
-            logger.info(
-                f"succeed_task_count:{self.succeed_tasks.__len__()}, "
-                f"failed_task_count:{self.failed_tasks.__len__()}, total_task_count:{self.tasks_num}")
-            if self.succeed_tasks.__len__() + self.failed_tasks.__len__() == self.tasks_num:
-                self.finish_called = True
-                self.shutdown()
-                break
-            else:
-                logger.info(
-                    f"Waiting for {len(self.running_tasks)} tasks to finish")
-                time.sleep(5)
+        with self.condition:
+            while self.finished_tasks_num() < self.tasks_num:
+                if not self.condition.wait_for(lambda: self.finished_tasks_num() >= self.tasks_num,
+                                               timeout=PROGRESS_LOG_INTERVAL):
+                    logger.info(
+                        f"succeed_task_count:{len(self.succeed_tasks)}, "
+                        f"failed_task_count:{len(self.failed_tasks)}, total_task_count:{self.tasks_num}, "
+                        f"waiting for {len(self.running_tasks)} tasks to finish")
+            self.finish_called = True
+        logger.info(
+            f"succeed_task_count:{len(self.succeed_tasks)}, "
+            f"failed_task_count:{len(self.failed_tasks)}, total_task_count:{self.tasks_num}")
+        self.shutdown()
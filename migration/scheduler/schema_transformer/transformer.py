@@ -1,18 +1,22 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from migration.base.exceptions import ProfileConfigError, GrammarRestrictionsError, SchedulerRuntimeError
-from migration.scheduler.task.schema_task import SchemaMigrationTask
+from migration.scheduler.task.schema_task import SchemaMigrationTask, SchemaMigrationBatchTask
 from migration.scheduler.task.base_task import TaskType
 from migration.scheduler.transformer import Transformer
-from migration.scheduler.scheduler import SchedulerConfig, Scheduler
 import migration.util.migration_tasks_status as migration_tasks_status
 
 logger = logging.getLogger(__name__)
 
 DOT_SPLITTER = '.'
 LEFT_BRACKET = '('
+SCHEMA_BATCH_SIZE = 50
 
 
 class SchemaTransformer(Transformer):
+    task_types = [TaskType.SCHEMA_MIGRATION]
+
     def get_migration_tasks(self):
         logger.info("Start to get schema migration tasks")
         transform_table_list = self.get_transform_table_list()
@@ -35,11 +39,13 @@ class SchemaTransformer(Transformer):
                         schema_migration_tables.append(f"{db}.{result[0]}")
                 else:
                     schema_migration_tables.append(table)
+        schema_migration_tables = self.pending_tables(schema_migration_tables, TaskType.SCHEMA_MIGRATION)
         logger.debug(f"schema migration tasks: {schema_migration_tables}")
         logger.info(f"schema migration tasks count: {len(schema_migration_tables)}")
-        schema_migration_tasks = []
-        for table in schema_migration_tables:
-            schema_migration_tasks.append(self.construct_schema_task(table))
+        self.load_metadata(schema_migration_tables)
+        with ThreadPoolExecutor(max_workers=self.thread_concurrency) as executor:
+            schema_migration_tasks = list(executor.map(self.construct_schema_task, schema_migration_tables))
+        migration_tasks_status.init_tasks_status(self.destination, schema_migration_tasks)
 
         return schema_migration_tasks
 
@@ -65,19 +71,21 @@ class SchemaTransformer(Transformer):
                                                                partition_columns)
         task = SchemaMigrationTask(name=table_name, ddl=destination_ddl, task_type=TaskType.SCHEMA_MIGRATION,
                                    project_id=self.project_id, destination=self.destination)
-        migration_tasks_status.init_task_status(self.destination, task)
         return task
 
+    def batch_tasks(self, schema_migration_tasks):
+        if not self.destination.supports_multi_statement():
+            return schema_migration_tasks
+        batches = []
+        for i in range(0, len(schema_migration_tasks), SCHEMA_BATCH_SIZE):
+            batches.append(SchemaMigrationBatchTask(name=f"schema_batch_{i // SCHEMA_BATCH_SIZE}",
+                                                    task_type=TaskType.SCHEMA_MIGRATION,
+                                                    tasks=schema_migration_tasks[i:i + SCHEMA_BATCH_SIZE],
+                                                    destination=self.destination, project_id=self.project_id))
+        logger.info(f"Batched {len(schema_migration_tasks)} schema migration tasks into {len(batches)} scripts")
+        return batches
+
     def schedule_migration_tasks(self):
         logger.info("Start to schedule schema migration tasks")
         migration_tasks = self.get_migration_tasks()
-        if migration_tasks:
-            if len(migration_tasks) < self.transform_concurrency:
-                schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                scheduler = Scheduler(schedule_config)
-                self.schedules_tasks_map[scheduler] = migration_tasks
-            else:
-                for i in range(self.transform_concurrency):
-                    schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
-                    scheduler = Scheduler(schedule_config)
-                    self.schedules_tasks_map[scheduler] = migration_tasks[i::self.transform_concurrency]
+        self.schedule_tasks(self.batch_tasks(migration_tasks))
@@ -15,18 +15,26 @@ class Task:
         self.end_time = ""
         self.retry_times = 1
         self.status_id = None
+        self.estimated_size = 0
+        # set when the task only moves one partition of the table
+        self.partition = None
 
     def init_task(self, *args, **kwargs):
         pass
 
+    @property
+    def qualified_name(self):
+        """Name of the task in the status table, tasks of single partitions get the partition appended."""
+        return self.name if self.partition is None else f"{self.name}/{self.partition}"
+
     def _gen_task_id(self):
         return f"{self.name}_{self.task_type.value}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
 
     def __str__(self):
-        return self.name + '-' + self.task_type.value
+        return self.qualified_name + '-' + self.task_type.value
 
     def __repr__(self):
-        return f"<Task: {self.name}, Type:{self.task_type}>"
+        return f"<Task: {self.qualified_name}, Type:{self.task_type}>"
 
     def run(self):
         raise NotImplementedError
@@ -1,4 +1,6 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from migration.base.status import TaskType, TaskStatus
@@ -9,6 +11,8 @@ from migration.util import migration_tasks_status
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LOAD_CONCURRENCY = 2
+
 
 class DataMigrationTask(Task):
 
@@ -19,24 +23,93 @@ class DataMigrationTask(Task):
         self.source = source
         self.transform_partitions = transform_partitions
         self.dest_table = dest_table
+        self.file_format = None
+        self.compression = None
+        self.unload_seconds = 0
+        self.load_seconds = 0
+        # partitions loaded by the run being resumed, the source does not unload them again
+        self.completed_partitions = set()
+        # file path -> partition, for the paths the source unloaded a single partition to
+        self.partition_paths = {}
+        self.truncate_before_load = False
+        # predicate of the rows of self.partition, they are deleted from the destination before loading
+        self.partition_predicate = None
+        # set for tables migrated incrementally, their rows are merged into the destination on primary_keys
+        self.incremental_range = None
+        self.primary_keys = None
+        self.watermark_store = None
 
     def run(self) -> Task:
         try:
             self.status = TaskStatus.RUNNING
-            file_paths = self.source.unload_data(self)
-            for file_path in file_paths:
-                self.destination.load_external_data(file_path=file_path, schema_name=self.name.split(".")[0] if not self.dest_table else self.dest_table.split(".")[0],
-                                                    table_name=self.name.split(".")[1] if not self.dest_table else self.dest_table.split(".")[1])
+            self.unload_and_load()
+            if self.incremental_range is not None:
+                self.watermark_store.save(self.name, self.incremental_range)
             self.status = TaskStatus.COMPLETED
         except BaseException as e:
             self.status = TaskStatus.FAILED
             self.end_time = datetime.now()
             migration_tasks_status.update_task_status(self.destination, self)
             logger.error(
-                f"DataMigrationTask {self.name} failed to run, error: {e}, "
+                f"DataMigrationTask {self.qualified_name} failed to run, error: {e}, "
                 f"try times: {self.retry_times}")
             return self
         self.end_time = datetime.now()
         migration_tasks_status.update_task_status(self.destination, self)
-        logger.info(f"DataMigrationTask {self.name} finished running, status: {self.status.value}")
+        logger.info(f"DataMigrationTask {self.qualified_name} finished running, status: {self.status.value}, "
+                    f"unload seconds: {self.unload_seconds:.1f}, load seconds: {self.load_seconds:.1f}")
         return self
+
+    def unload_and_load(self):
+        """
+        Load every path as soon as the source yields it, on up to load_concurrency loaders, while the
+        source keeps unloading the rest. unload_seconds is the wall time until the source is drained,
+        load_seconds the summed time spent in load_external_data.
+        """
+        schema_name, table_name = (self.dest_table or self.name).split(".")
+        load_concurrency = int(self.destination.config.get('load_concurrency') or DEFAULT_LOAD_CONCURRENCY)
+        self.unload_seconds = 0
+        self.load_seconds = 0
+        if self.incremental_range is not None and self.incremental_range.is_empty():
+            logger.info(f"DataMigrationTask {self.qualified_name} has no change since {self.incremental_range.low}")
+            return
+        if self.partition_predicate:
+            logger.info(f"DataMigrationTask {self.qualified_name} replaces the rows of the partition "
+                        f"in {schema_name}.{table_name}")
+            self.destination.delete_rows(schema_name, table_name, self.partition_predicate)
+        if self.truncate_before_load:
+            logger.info(f"DataMigrationTask {self.name} truncates {schema_name}.{table_name} before loading again")
+            self.destination.truncate_table(schema_name, table_name)
+        load_futures = []
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=load_concurrency) as executor:
+            file_paths = iter(self.source.unload_data(self))
+            try:
+                for file_path in file_paths:
+                    failed = next((future for future in load_futures if future.done() and future.exception()), None)
+                    if failed is not None:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        raise failed.exception()
+                    logger.info(f"DataMigrationTask {self.qualified_name} unloaded {file_path}, "
+                                f"{time.perf_counter() - start_time:.1f}s since start")
+                    load_futures.append(executor.submit(self.load, file_path, schema_name, table_name))
+            finally:
+                if hasattr(file_paths, 'close'):
+                    file_paths.close()
+            self.unload_seconds = time.perf_counter() - start_time
+        for future in load_futures:
+            self.load_seconds += future.result()
+
+    def load(self, file_path, schema_name, table_name):
+        start_time = time.perf_counter()
+        if self.incremental_range is not None:
+            self.destination.merge_external_data(file_path=file_path, schema_name=schema_name,
+                                                 table_name=table_name, primary_keys=self.primary_keys,
+                                                 file_format=self.file_format)
+        else:
+            self.destination.load_external_data(file_path=file_path, schema_name=schema_name,
+                                                table_name=table_name, file_format=self.file_format)
+        partition = self.partition_paths.get(file_path)
+        if partition is not None:
+            migration_tasks_status.record_loaded_partition(self, partition)
+        return time.perf_counter() - start_time
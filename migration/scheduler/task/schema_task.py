@@ -32,3 +32,36 @@ class SchemaMigrationTask(Task):
         logger.info(f"SchemaMigrationTask {self.name} finished running, status: {self.status.value}")
 
         return self
+
+
+class SchemaMigrationBatchTask(Task):
+    """
+    Creates the tables of several schema tasks with one multi-statement script. When the script fails,
+    each table is created on its own so the status of every table is still accurate.
+    """
+
+    def __init__(self, name: str, task_type: TaskType, tasks: list[SchemaMigrationTask], destination: Destination,
+                 *args, **kwargs):
+        super().__init__(name, task_type, *args, **kwargs)
+        self.tasks = tasks
+        self.destination = destination
+
+    def run(self) -> Task:
+        self.status = TaskStatus.RUNNING
+        pending_tasks = [task for task in self.tasks if not task.is_success()]
+        try:
+            self.destination.execute_script([task.ddl for task in pending_tasks])
+            for task in pending_tasks:
+                task.status = TaskStatus.COMPLETED
+                task.end_time = datetime.now()
+                migration_tasks_status.update_task_status(self.destination, task)
+        except BaseException as e:
+            logger.warning(f"SchemaMigrationBatchTask {self.name} failed to run as one script, "
+                           f"fall back to per table, error: {e}")
+            for task in pending_tasks:
+                task.run()
+        self.status = TaskStatus.COMPLETED if all(task.is_success() for task in self.tasks) else TaskStatus.FAILED
+        self.end_time = datetime.now()
+        logger.info(f"SchemaMigrationBatchTask {self.name} with {len(self.tasks)} tables finished running, "
+                    f"status: {self.status.value}")
+        return self
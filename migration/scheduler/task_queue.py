@@ -0,0 +1,102 @@
+import bisect
+import itertools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ByteBudget:
+    """
+    Caps the estimated bytes of the tasks running against one connector at the same time.
+    A limit of 0 or None means unlimited.
+    """
+
+    def __init__(self, name, limit=None):
+        self.name = name
+        self.limit = limit or 0
+        self.in_flight = 0
+
+    def available(self):
+        if not self.limit:
+            return float('inf')
+        return self.limit - self.in_flight
+
+    def acquire(self, size):
+        self.in_flight += size
+
+    def release(self, size):
+        self.in_flight -= size
+
+    def __repr__(self):
+        return f"<ByteBudget {self.name} {self.in_flight}/{self.limit or 'unlimited'}>"
+
+
+class TaskQueue:
+    """
+    Priority queue shared by all schedulers of a transformer. Tasks are handed out largest
+    estimated size first (LPT), tasks of equal size in the order they were added.
+
+    When byte budgets are given, a task is only handed out while its estimated size fits into
+    every budget, the largest task that fits is picked and get() blocks until running tasks are
+    done otherwise. A task larger than a budget is still run, but only when nothing else is in flight.
+    """
+
+    def __init__(self, budgets=None):
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.budgets = budgets or []
+        self.in_flight_tasks = 0
+        # both lists are sorted ascending by (estimated_size, -sequence), the next task is at the end
+        self.keys = []
+        self.tasks = []
+
+    def put(self, task):
+        key = (task.estimated_size or 0, -next(self.sequence))
+        with self.condition:
+            index = bisect.bisect(self.keys, key)
+            self.keys.insert(index, key)
+            self.tasks.insert(index, task)
+            self.condition.notify_all()
+
+    def get(self):
+        """Return the next task to run, or None when the queue is drained."""
+        with self.condition:
+            while self.tasks:
+                index = self.admissible_index()
+                if index is not None:
+                    self.keys.pop(index)
+                    task = self.tasks.pop(index)
+                    size = task.estimated_size or 0
+                    for budget in self.budgets:
+                        budget.acquire(size)
+                    self.in_flight_tasks += 1
+                    return task
+                logger.debug(f"No task fits into {self.budgets}, waiting for running tasks to finish")
+                self.condition.wait()
+            return None
+
+    def admissible_index(self):
+        if not self.budgets:
+            return len(self.tasks) - 1
+        allowed = max(0, min(budget.available() for budget in self.budgets))
+        index = bisect.bisect(self.keys, (allowed, float('inf'))) - 1
+        if index >= 0:
+            return index
+        if self.in_flight_tasks == 0:
+            logger.warning(f"Task:{self.tasks[-1]} exceeds {self.budgets}, running it alone")
+            return len(self.tasks) - 1
+        return None
+
+    def task_done(self, task):
+        """Release the budget held by a task handed out by get()."""
+        size = task.estimated_size or 0
+        with self.condition:
+            for budget in self.budgets:
+                budget.release(size)
+            self.in_flight_tasks -= 1
+            self.condition.notify_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.tasks)
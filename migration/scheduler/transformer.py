@@ -3,16 +3,22 @@ from concurrent.futures import ThreadPoolExecutor
 from migration.base.exceptions import SchedulerRuntimeError, ProfileConfigError
 from migration.connector.source.base import Source
 from migration.connector.destination.base import Destination
-from migration.scheduler.scheduler import logger
-from migration.util import migration_tasks_status
+from migration.scheduler.scheduler import logger, SchedulerConfig, Scheduler
+from migration.scheduler.task_queue import TaskQueue, ByteBudget
+from migration.util import migration_tasks_status, checkpoint
+from migration.util.checkpoint import ResumeState
+from migration.util.size_util import parse_size
 
 
 class Transformer:
+    # task types the transformer runs, recorded in the checkpoint of the run
+    task_types = []
 
     def __init__(self, source: Source, destination: Destination, project_name: str, db_list=None,
                  config_table_list=None,
                  external_table_list=None,
-                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, dest_table_list=None):
+                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, dest_table_list=None,
+                 project_id=None, resume_state: ResumeState = None):
         self.source = source
         self.destination = destination
         self.pool = ThreadPoolExecutor(10)
@@ -21,29 +27,38 @@ class Transformer:
         self.config_table_list = config_table_list
         self.external_table_list = external_table_list
         self.transform_concurrency = scheduler_concurrency
-        self.schedules = None
         self.quit_if_fail = quit_if_fail
-        self.schedules_tasks_map = {}
+        self.task_queue = TaskQueue([
+            ByteBudget(f"source {source.name}", parse_size(source.config.get('max_bytes_in_flight'))),
+            ByteBudget(f"destination {destination.name}", parse_size(destination.config.get('max_bytes_in_flight')))])
+        self.schedulers = []
         self.thread_concurrency = thread_concurrency
-        self.project_id = migration_tasks_status.init_status_table(self.destination, project_name)
+        self.resume_state = resume_state
+        if project_id is None and resume_state is not None:
+            project_id = resume_state.project_id
+            migration_tasks_status.STATUS_ID_ALLOCATOR.advance(resume_state.next_status_id)
+        if project_id is None:
+            project_id = migration_tasks_status.init_status_table(self.destination, project_name)
+            checkpoint.open_checkpoint(project_id).record_task_types(self.task_types)
+        else:
+            checkpoint.open_checkpoint(project_id)
+        self.project_id = project_id
         self.dest_table_list = dest_table_list
 
     def transform(self):
         self.schedule_migration_tasks()
-        for schedule, tasks in self.schedules_tasks_map.items():
-            self.pool.submit(self.run_concurrent, schedule, tasks)
+        for scheduler in self.schedulers:
+            self.pool.submit(self.run_concurrent, scheduler)
         self.pool.shutdown(wait=True)
+        migration_tasks_status.flush_task_status(self.destination)
         self.source.close()
         self.destination.close()
         logger.info("All tasks are finished")
 
-    def run_concurrent(self, scheduler, tasks):
+    def run_concurrent(self, scheduler):
         try:
-            scheduler.tasks_num = len(tasks)
             scheduler.run()
-            for task in tasks:
-                scheduler.add_task(task)
-            scheduler.finish()
+            scheduler.consume(self.task_queue)
         except Exception as e:
             logger.error(f"Scheduler {scheduler} failed to when transforming task, error: {e}")
             raise SchedulerRuntimeError(f"Scheduler {scheduler} failed when transforming task, error: {e}")
@@ -72,5 +87,29 @@ class Transformer:
     def get_migration_tasks(self):
         raise NotImplementedError
 
+    def load_metadata(self, tables):
+        for db in sorted({table.split('.')[0] for table in tables}):
+            try:
+                self.source.load_database_metadata(db)
+            except Exception as e:
+                logger.warning(f"Failed to load metadata of database {db} in bulk, fall back to per table, error: {e}")
+
+    def pending_tables(self, tables, task_type):
+        """Leave out the tables whose task of the given type completed in the run being resumed."""
+        if self.resume_state is None:
+            return tables
+        pending = [table for table in tables if not self.resume_state.is_completed(table, task_type)]
+        logger.info(f"Resuming {len(pending)} of {len(tables)} {task_type.value} tasks")
+        return pending
+
     def schedule_migration_tasks(self):
         raise NotImplementedError
+
+    def schedule_tasks(self, migration_tasks):
+        if not migration_tasks:
+            return
+        for task in migration_tasks:
+            self.task_queue.put(task)
+        for i in range(min(len(migration_tasks), self.transform_concurrency)):
+            schedule_config = SchedulerConfig(quit_if_failed=self.quit_if_fail, max_workers=self.thread_concurrency)
+            self.schedulers.append(Scheduler(schedule_config))
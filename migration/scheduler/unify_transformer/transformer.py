@@ -1,9 +1,9 @@
 import logging
 
 from migration.base import ProfileConfigError
+from migration.base.status import TaskType
 from migration.connector.destination.base import Destination
 from migration.connector.source import Source
-from migration.scheduler.scheduler import SchedulerConfig, Scheduler
 from migration.scheduler.transformer import Transformer
 from migration.scheduler.data_transformer.transformer import DataTransformer
 from migration.scheduler.data_validation.validation import Validation
@@ -16,19 +16,23 @@ LEFT_BRACKET = '('
 
 
 class UnifyTransformer(Transformer):
+    task_types = [TaskType.SCHEMA_MIGRATION, TaskType.DATA_MIGRATION, TaskType.DATA_VALIDATION]
+
     def __init__(self, source: Source, destination: Destination, project_name: str, db_list=None,
                  config_table_list=None,
                  external_table_list=None,
-                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, transform_partitions=None):
+                 scheduler_concurrency=1, quit_if_fail=False, thread_concurrency=1, transform_partitions=None,
+                 resume_state=None, incremental_tables=None):
         super().__init__(source, destination, project_name, db_list, config_table_list, external_table_list,
-                         scheduler_concurrency, quit_if_fail, thread_concurrency)
+                         scheduler_concurrency, quit_if_fail, thread_concurrency, resume_state=resume_state)
         self.schema_transformer = SchemaTransformer(source=self.source, destination=self.destination,
                                                     project_name=self.project_name, db_list=self.db_list,
                                                     config_table_list=self.config_table_list,
                                                     external_table_list=self.external_table_list,
                                                     scheduler_concurrency=self.transform_concurrency,
                                                     quit_if_fail=self.quit_if_fail,
-                                                    thread_concurrency=self.thread_concurrency)
+                                                    thread_concurrency=self.thread_concurrency,
+                                                    project_id=self.project_id, resume_state=resume_state)
         self.data_transformer = DataTransformer(source=self.source, destination=self.destination,
                                                 project_name=self.project_name, db_list=self.db_list,
                                                 config_table_list=self.config_table_list,
@@ -36,16 +40,23 @@ class UnifyTransformer(Transformer):
                                                 scheduler_concurrency=self.transform_concurrency,
                                                 quit_if_fail=self.quit_if_fail,
                                                 thread_concurrency=self.thread_concurrency,
-                                                transform_partitions=transform_partitions)
+                                                transform_partitions=transform_partitions,
+                                                project_id=self.project_id, resume_state=resume_state,
+                                                incremental_tables=incremental_tables)
         self.validate_transformer = Validation(source=self.source, destination=self.destination,
                                                project_name=self.project_name, db_list=self.db_list,
                                                config_table_list=self.config_table_list,
                                                external_table_list=self.external_table_list,
                                                scheduler_concurrency=self.transform_concurrency,
                                                quit_if_fail=self.quit_if_fail,
-                                               thread_concurrency=self.thread_concurrency)
+                                               thread_concurrency=self.thread_concurrency,
+                                               project_id=self.project_id, resume_state=resume_state)
 
     def schedule_migration_tasks(self):
-        self.schema_transformer.transform()
-        self.data_transformer.transform()
-        self.validate_transformer.transform()
+        task_types = self.resume_state.get_task_types() if self.resume_state is not None else self.task_types
+        if TaskType.SCHEMA_MIGRATION in task_types:
+            self.schema_transformer.transform()
+        if TaskType.DATA_MIGRATION in task_types:
+            self.data_transformer.transform()
+        if TaskType.DATA_VALIDATION in task_types:
+            self.validate_transformer.transform()
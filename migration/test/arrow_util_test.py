@@ -0,0 +1,27 @@
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pyarrow
+
+from migration.util import arrow_util
+
+
+class TestArrowUtil(unittest.TestCase):
+    def test_read_table(self):
+        rows = [(1, None, Decimal('1.50')), (2, 'b', Decimal('2.25')), (3, 'c', None)]
+        table = arrow_util.read_table(arrow_util.iter_batches(rows, 1))
+        self.assertEqual(str(table.schema.field(1).type), 'string')
+        self.assertEqual([tuple(row.values()) for row in table.to_pylist()], rows)
+        self.assertEqual(arrow_util.read_table([]).num_rows, 0)
+
+    def test_normalize_columns(self):
+        self.assertEqual(arrow_util.normalize_datetime(pyarrow.array([
+            datetime(2024, 1, 1, 8, tzinfo=timezone.utc), datetime(2024, 1, 2, 0, 0, 1, 500000, tzinfo=timezone.utc),
+            None])).to_pylist(), ['2024-01-01 08:00:00', '2024-01-02 00:00:01.5', None])
+        self.assertEqual(arrow_util.normalize_datetime(pyarrow.array(['2024-01-01 08:00:00.000'])).to_pylist(),
+                         ['2024-01-01 08:00:00'])
+        self.assertEqual(arrow_util.normalize_number(pyarrow.array([Decimal('1.500'), Decimal('2.000')])).to_pylist(),
+                         ['1.5', '2'])
+        self.assertEqual(arrow_util.normalize_number(pyarrow.array([1.5, 2.0, 100])).to_pylist(), ['1.5', '2', '100'])
+        self.assertEqual(arrow_util.normalize_string(pyarrow.array([True, False])).to_pylist(), ['1', '0'])
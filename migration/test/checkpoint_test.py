@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from migration.base.status import TaskStatus, TaskType
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.scheduler.task.data_task import DataMigrationTask
+from migration.util import checkpoint, migration_tasks_status
+
+
+class PartitionedSource(Source):
+    def __init__(self, partitions):
+        super().__init__('Partitioned', {})
+        self.partitions = partitions
+
+    def unload_data(self, task):
+        for partition in self.partitions:
+            if partition in task.completed_partitions:
+                continue
+            file_path = f"{task.id}/{partition}/"
+            task.partition_paths[file_path] = partition
+            yield file_path
+
+
+class StatusDestination(Destination):
+    def __init__(self, rows=(), fail_path=None):
+        super().__init__('Doris', {})
+        self.rows = list(rows)
+        self.fail_path = fail_path
+        self.loaded = []
+
+    def execute_sql(self, sql, bind_params=None):
+        if sql.startswith("show tables"):
+            return [(f"project_{i}",) for i in range(3)] if self.rows else []
+        if sql.startswith("select id, task_name"):
+            return self.rows
+        return []
+
+    def load_external_data(self, file_path, schema_name, table_name, file_format=None):
+        if file_path.endswith(self.fail_path or '\0'):
+            raise RuntimeError(f"failed to load {file_path}")
+        self.loaded.append(file_path)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(checkpoint.set_checkpoint_dir, checkpoint.CHECKPOINT_DIR)
+        checkpoint.set_checkpoint_dir(os.path.join(directory.name, 'checkpoints'))
+        self.addCleanup(checkpoint.CHECKPOINTS.clear)
+
+    def run_task(self, destination, resume_state=None):
+        task = DataMigrationTask("db.t", TaskType.DATA_MIGRATION, destination=destination,
+                                 source=PartitionedSource(['p1', 'p2', 'p3']), project_id='project_2')
+        if resume_state is not None:
+            task.completed_partitions = resume_state.completed_partitions(task.name)
+        return task.run()
+
+    def test_resume_from_checkpoint(self):
+        task_checkpoint = checkpoint.open_checkpoint('project_2')
+        task_checkpoint.record_task_types([TaskType.DATA_MIGRATION, TaskType.DATA_VALIDATION])
+        self.assertTrue(self.run_task(StatusDestination(fail_path='p2/')).is_failed())
+        self.assertTrue(task_checkpoint.path.startswith(checkpoint.CHECKPOINT_DIR))
+        with open(task_checkpoint.path, 'a') as f:
+            f.write('{"task": "db.t", "parti')
+
+        # no status table, the latest local checkpoint is resumed
+        state = migration_tasks_status.get_resume_state(StatusDestination(), 'project')
+        self.assertEqual(state.project_id, 'project_2')
+        self.assertEqual(state.get_task_types(), [TaskType.DATA_MIGRATION, TaskType.DATA_VALIDATION])
+        self.assertTrue(state.has_run('db.t', TaskType.DATA_MIGRATION))
+        self.assertFalse(state.is_completed('db.t', TaskType.DATA_MIGRATION))
+        completed_partitions = state.completed_partitions('db.t')
+        self.assertIn('p1', completed_partitions)
+        self.assertNotIn('p2', completed_partitions)
+
+        destination = StatusDestination()
+        self.assertTrue(self.run_task(destination, state).is_success())
+        self.assertEqual(sorted(path.split('/')[1] for path in destination.loaded),
+                         sorted({'p1', 'p2', 'p3'} - completed_partitions))
+
+    def test_resume_from_status_table(self):
+        rows = [(0, 'db.t1', 'COMPLETED', 'DATA_MIGRATION'), (1, 'db.t2', 'FAILED', 'DATA_MIGRATION'),
+                (2, 'db.t2', 'COMPLETED', 'SCHEMA_MIGRATION'), (7, 'db.t3', 'INIT', 'DATA_MIGRATION')]
+        state = migration_tasks_status.get_resume_state(StatusDestination(rows), 'project')
+        self.assertEqual(state.project_id, 'project_2')
+        self.assertEqual(state.next_status_id, 8)
+        self.assertEqual(state.get_task_types(), [TaskType.SCHEMA_MIGRATION, TaskType.DATA_MIGRATION])
+        self.assertTrue(state.is_completed('db.t1', TaskType.DATA_MIGRATION))
+        self.assertFalse(state.is_completed('db.t2', TaskType.DATA_MIGRATION))
+        self.assertEqual(state.task_status[('db.t3', TaskType.DATA_MIGRATION)], TaskStatus.INIT)
@@ -0,0 +1,122 @@
+import hashlib
+import sqlite3
+import threading
+import unittest
+from unittest import mock
+
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column
+from migration.util import checksum_diff
+
+COLUMNS = [Column('id', 'BIGINT', False, None), Column('name', 'VARCHAR(20)', True, None),
+           Column('amount', 'DECIMAL(10,2)', True, None)]
+
+
+def sqlite_table(rows):
+    """A table behind the MySQL functions the checksums use."""
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    connection.create_function('md5', 1, lambda text: hashlib.md5(text.encode()).hexdigest())
+    connection.create_function('conv', 3, lambda number, from_base, to_base: str(int(number, from_base)))
+    connection.create_function('concat_ws', -1, lambda separator, *texts: separator.join(texts))
+    connection.execute("CREATE TABLE t (id INTEGER, name TEXT, amount TEXT)")
+    connection.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+    return connection
+
+
+class SqliteConnector:
+    def __init__(self, rows, columns=COLUMNS):
+        self.connection = sqlite_table(rows)
+        self.columns = columns
+        self.lock = threading.Lock()
+        self.queries = []
+
+    def execute_sql(self, sql, bind_params=None):
+        with self.lock:
+            self.queries.append(sql)
+            return self.connection.execute(sql).fetchall()
+
+
+class SqliteSource(SqliteConnector, Source):
+    def __init__(self, rows, columns=COLUMNS):
+        Source.__init__(self, 'MySQL', {})
+        SqliteConnector.__init__(self, rows, columns)
+
+    def get_table_columns(self, database_name, table_name):
+        return self.columns
+
+    def get_table_pk_columns(self, database_name, table_name):
+        return [self.columns[0].name]
+
+
+class SqliteDestination(SqliteConnector, Destination):
+    def __init__(self, rows, columns=COLUMNS):
+        Destination.__init__(self, 'MySQL', {})
+        SqliteConnector.__init__(self, rows, columns)
+
+
+class TestChecksumDiff(unittest.TestCase):
+    def diff(self, source, destination):
+        return checksum_diff.diff_tables(source, destination, 'main.t', 'main.t', segments=4, leaf_rows=50)
+
+    def test_diff_tables(self):
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(1, 2001)]
+        source = SqliteSource(rows)
+        result = self.diff(source, SqliteDestination(list(reversed(rows))))
+        self.assertEqual((result['source_rows'], result['destination_rows']), (2000, 2000))
+        self.assertEqual((result['added'], result['removed'], result['changed']), (0, 0, 0))
+        # equal checksums end the diff after one query per side
+        self.assertEqual(len(source.queries), 1)
+
+        destination_rows = rows[1:]
+        destination_rows[1000] = (1002, 'renamed', '1002.50')
+        destination_rows.append((5000, None, None))
+        source = SqliteSource(rows)
+        result = self.diff(source, SqliteDestination(destination_rows))
+        self.assertEqual((result['added'], result['removed'], result['changed']), (1, 1, 1))
+        self.assertEqual(result['added_rows'], [['5000', None, None]])
+        self.assertEqual(result['removed_rows'], [['1', 'name_1', '1.5']])
+        self.assertEqual(result['changed_rows'], [(['1002', 'name_1002', '1002.5'], ['1002', 'renamed', '1002.5'])])
+        # only the segments around the three differences are fetched
+        fetched = [sql for sql in source.queries if sql.startswith('select `id`')]
+        self.assertEqual(len(fetched), 3)
+
+    def test_diff_tables_on_key_hash(self):
+        columns = [Column('id', 'VARCHAR(20)', False, None)] + COLUMNS[1:]
+        rows = [(f"id_{i}", f"name_{i}", f"{i}.50") for i in range(1000)]
+        destination_rows = rows[:500] + [('id_500', 'renamed', '500.50')] + rows[501:]
+        result = self.diff(SqliteSource(rows, columns), SqliteDestination(destination_rows, columns))
+        self.assertEqual((result['added'], result['removed'], result['changed']), (0, 0, 1))
+        self.assertEqual(result['changed_rows'], [(['id_500', 'name_500', '500.5'], ['id_500', 'renamed', '500.5'])])
+
+    def test_report_every_difference(self):
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(1, 2001)]
+        destination = SqliteDestination([(i, 'renamed', amount) if i % 10 == 0 else (i, name, amount)
+                                         for i, name, amount in rows])
+        # leaves are fetched a window at a time, every difference is listed by default
+        result = checksum_diff.diff_tables(SqliteSource(rows), destination, 'main.t', 'main.t', segments=4,
+                                           leaf_rows=50, parallelism=2, max_reported_rows=None)
+        self.assertEqual((result['changed'], len(result['changed_rows'])), (200, 200))
+        result = checksum_diff.diff_tables(SqliteSource(rows), destination, 'main.t', 'main.t', segments=4,
+                                           leaf_rows=50, parallelism=2, max_reported_rows=5)
+        self.assertEqual((result['changed'], len(result['changed_rows'])), (200, 5))
+
+    def test_boundary_key(self):
+        # the last key of a child segment is counted in that child, where its rows are fetched from
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(0, 400001, 1000)] + [(99999, 'edge', '1.50')]
+        destination_rows = rows[:-1] + [(99999, 'renamed', '1.50')]
+        segment = checksum_diff.KeyRange('id', 0, 400001)
+        side = checksum_diff.Side(SqliteSource(rows), 'main.t', COLUMNS, ['id'])
+        buckets = side.checksums(segment, 4)
+        self.assertEqual(segment.child(0, 4).upper, 100001)
+        self.assertEqual(buckets[0][0], 102)
+        result = self.diff(SqliteSource(rows), SqliteDestination(destination_rows))
+        self.assertEqual(result['changed_rows'], [(['99999', 'edge', '1.5'], ['99999', 'renamed', '1.5'])])
+
+    def test_fall_back_without_differing_segment(self):
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(1, 2001)]
+        destination_rows = rows[:-1] + [(2000, 'renamed', '2000.50')]
+        # segments that look equal leave the difference of the checksums unexplained
+        with mock.patch.object(checksum_diff.Side, 'checksums', lambda side, segment, segments: {0: (1, 1)}):
+            result = self.diff(SqliteSource(rows), SqliteDestination(destination_rows))
+        self.assertEqual(result['changed'], 1)
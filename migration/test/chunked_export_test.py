@@ -0,0 +1,87 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pyarrow.fs
+import pyarrow.parquet
+
+from migration.base.status import TaskType
+from migration.connector.source import chunked_export
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column
+from migration.scheduler.task.data_task import DataMigrationTask
+
+
+class SqliteSource(Source):
+    def __init__(self, rows, config):
+        super().__init__('Sqlite', config)
+        self.database = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+        connection = sqlite3.connect(self.database)
+        connection.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, amount REAL)")
+        connection.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+        connection.commit()
+        connection.close()
+
+    def execute_sql(self, sql, bind_params=None):
+        with sqlite3.connect(self.database) as connection:
+            return connection.execute(sql.replace('%s', '?'), bind_params or ()).fetchall()
+
+    def quote_character(self):
+        return "\""
+
+    def get_table_columns(self, database_name, table_name):
+        return [Column('id', 'BIGINT', False, None), Column('name', 'VARCHAR(20)', True, None),
+                Column('amount', 'DECIMAL(10,2)', True, None)]
+
+    def get_table_pk_columns(self, database_name, table_name):
+        return ('id',)
+
+    def get_table_size(self, database_name, table_name):
+        return 10000
+
+    def sample_pk_values(self, database_name, table_name, pk_column, sample_rows):
+        return [row[0] for row in self.execute_sql(f"SELECT {pk_column} FROM {table_name}")]
+
+    @contextmanager
+    def open_stream_cursor(self, sql, bind_params=None):
+        connection = sqlite3.connect(self.database)
+        try:
+            yield connection.execute(sql.replace('%s', '?'), bind_params or ())
+        finally:
+            connection.close()
+
+
+class TestChunkedExport(unittest.TestCase):
+    def export(self, source, export_dir, partition_predicate=None):
+        task = DataMigrationTask('main.t', TaskType.DATA_MIGRATION, None, source, project_id='project')
+        task.partition_predicate = partition_predicate
+        location = chunked_export.ExportLocation(pyarrow.fs.LocalFileSystem(), export_dir)
+        return [pyarrow.parquet.read_table(os.path.join(export_dir, path, 'part-00000.parquet'))
+                for path in chunked_export.unload_chunks(source, task, location)]
+
+    def test_unload_chunks(self):
+        rows = [(i, f"name_{i}", i / 4) for i in range(1, 1001)]
+        with tempfile.TemporaryDirectory() as export_dir:
+            source = SqliteSource(rows, {'export_chunk_size': 2000, 'export_parallelism': 2})
+            chunks = self.export(source, export_dir)
+            self.assertEqual(len(chunks), 5)
+            exported = sorted(row for chunk in chunks for row in zip(*chunk.to_pydict().values()))
+            self.assertEqual(exported, [(i, name, Decimal(str(amount))) for i, name, amount in rows])
+
+            chunks = self.export(source, export_dir, "amount < 100")
+            self.assertEqual(sum(chunk.num_rows for chunk in chunks), 399)
+
+            # string keys order by collation in the database, the table is exported in one chunk
+            source.get_table_pk_columns = lambda database_name, table_name: ('name',)
+            chunks = self.export(source, export_dir)
+            self.assertEqual([chunk.num_rows for chunk in chunks], [1000])
+            os.remove(source.database)
+
+    def test_pk_boundaries(self):
+        self.assertEqual(chunked_export.pk_boundaries(list(range(100)), 0, 99, 4), [25, 50, 75])
+        # skewed keys are split where the rows are, not evenly between min and max
+        self.assertEqual(chunked_export.pk_boundaries([1, 2, 3, 4, 5, 6, 1000], 1, 1000, 3), [4, 6])
+        self.assertEqual(chunked_export.chunk_ranges([3, 5]), [(None, 3), (3, 5), (5, None)])
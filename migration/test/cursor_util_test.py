@@ -0,0 +1,27 @@
+import sqlite3
+import unittest
+
+from migration.util.cursor_util import iter_rows
+
+
+class CountingCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.fetches = 0
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        return self.cursor.fetchmany(size)
+
+
+class TestCursorUtil(unittest.TestCase):
+    def test_iter_rows(self):
+        connection = sqlite3.connect(':memory:')
+        connection.execute("CREATE TABLE t (id INT)")
+        connection.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(25)])
+        cursor = CountingCursor(connection.execute("SELECT id FROM t ORDER BY id"))
+        rows = iter_rows(cursor, 10)
+        self.assertEqual(next(rows), (0,))
+        self.assertEqual(cursor.fetches, 1)
+        self.assertEqual([row[0] for row in rows], list(range(1, 25)))
+        self.assertEqual(cursor.fetches, 4)
@@ -0,0 +1,109 @@
+import threading
+import unittest
+
+from migration.base.status import TaskType
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.scheduler.data_transformer.transformer import DataTransformer
+from migration.scheduler.task.data_task import DataMigrationTask
+from migration.util.watermark import IncrementalRange
+
+
+class StreamingSource(Source):
+    def __init__(self, paths, first_loaded):
+        super().__init__('Streaming', {})
+        self.paths = paths
+        self.first_loaded = first_loaded
+
+    def unload_data(self, task):
+        yield self.paths[0]
+        # the rest is only unloaded once the first path has been loaded
+        assert self.first_loaded.wait(timeout=5)
+        yield from self.paths[1:]
+
+
+class RecordingDestination(Destination):
+    def __init__(self, first_loaded, fail_path=None):
+        super().__init__('Recording', {'load_concurrency': 2})
+        self.first_loaded = first_loaded
+        self.fail_path = fail_path
+        self.loaded = []
+
+    def load_external_data(self, file_path, schema_name, table_name, file_format=None):
+        if file_path == self.fail_path:
+            raise RuntimeError(f"failed to load {file_path}")
+        self.loaded.append((file_path, schema_name, table_name))
+        self.first_loaded.set()
+
+    def merge_external_data(self, file_path, schema_name, table_name, primary_keys, file_format=None):
+        self.loaded.append((file_path, schema_name, table_name, tuple(primary_keys)))
+        self.first_loaded.set()
+
+
+class KeylessSource(Source):
+    def __init__(self):
+        super().__init__('Keyless', {})
+
+    def get_primary_key(self, database_name, table_name):
+        return []
+
+
+class RecordingWatermarkStore:
+    def __init__(self):
+        self.saved = {}
+
+    def save(self, table_name, incremental_range):
+        self.saved[table_name] = incremental_range.high
+
+
+class TestDataMigrationTask(unittest.TestCase):
+    def run_task(self, paths, fail_path=None):
+        first_loaded = threading.Event()
+        source = StreamingSource(paths, first_loaded)
+        destination = RecordingDestination(first_loaded, fail_path)
+        task = DataMigrationTask("db.t", TaskType.DATA_MIGRATION, destination=destination, source=source,
+                                 project_id='test_project', dest_table="dest_db.dest_t")
+        return task.run(), destination
+
+    def test_load_while_unloading(self):
+        task, destination = self.run_task(["p1/", "p2/", "p3/"])
+        self.assertTrue(task.is_success())
+        self.assertEqual(sorted(destination.loaded),
+                         [("p1/", "dest_db", "dest_t"), ("p2/", "dest_db", "dest_t"), ("p3/", "dest_db", "dest_t")])
+        self.assertGreater(task.unload_seconds, 0)
+        self.assertGreater(task.load_seconds, 0)
+
+    def test_failed_load_fails_task(self):
+        task, destination = self.run_task(["p1/", "p2/"], fail_path="p2/")
+        self.assertTrue(task.is_failed())
+
+    def test_incremental_merge(self):
+        first_loaded = threading.Event()
+        destination = RecordingDestination(first_loaded)
+        task = DataMigrationTask("db.t", TaskType.DATA_MIGRATION, destination=destination,
+                                 source=StreamingSource(["p1/"], first_loaded), project_id='test_project')
+        task.incremental_range = IncrementalRange('update_time', '2024-01-01 00:00:00', '2024-01-02 00:00:00')
+        task.primary_keys = ['id']
+        task.watermark_store = RecordingWatermarkStore()
+        self.assertEqual(task.incremental_range.predicate(),
+                         "update_time > '2024-01-01 00:00:00' AND update_time <= '2024-01-02 00:00:00'")
+        self.assertTrue(task.run().is_success())
+        self.assertEqual(destination.loaded, [("p1/", "db", "t", ("id",))])
+        self.assertEqual(task.watermark_store.saved, {"db.t": '2024-01-02 00:00:00'})
+
+        # nothing changed since the watermark, nothing is unloaded
+        task.incremental_range = IncrementalRange('id', 10, 10)
+        destination.loaded.clear()
+        self.assertTrue(task.run().is_success())
+        self.assertEqual(destination.loaded, [])
+        self.assertEqual(IncrementalRange(None, 'p2', 'p3').partitions(['p1', 'p2', 'p3']), ['p2', 'p3'])
+
+    def test_incremental_table_without_primary_key(self):
+        transformer = DataTransformer.__new__(DataTransformer)
+        transformer.source, transformer.destination = KeylessSource(), RecordingDestination(threading.Event())
+        transformer.project_id, transformer.transform_partitions, transformer.resume_state = 'test_project', None, None
+        transformer.incremental_tables = {'db.t': 'update_time'}
+        # the table is migrated as a whole instead of failing every table
+        task = transformer.construct_data_task('db.t', None)
+        self.assertIsNone(task.incremental_range)
+        self.assertTrue(task.truncate_before_load)
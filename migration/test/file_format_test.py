@@ -0,0 +1,51 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from migration.base.exceptions import DestinationExecutionError, ProfileConfigError
+from migration.connector.destination.clickzetta import destination as clickzetta_destination
+from migration.connector.destination.clickzetta.destination import ClickZettaDestination
+from migration.connector.file_format import negotiate_file_format, ANY_COMPRESSION
+from migration.connector.source.clickzetta.source import ClickzettaSource
+
+
+class TestFileFormat(unittest.TestCase):
+    def test_cheapest_common_format(self):
+        unload_formats = {'csv': [None], 'orc': ['zlib', None], 'parquet': ['snappy', 'gzip', None]}
+        self.assertEqual(negotiate_file_format(unload_formats, {'csv': [None], 'parquet': ANY_COMPRESSION}),
+                         ('parquet', 'snappy'))
+        self.assertEqual(negotiate_file_format(unload_formats, {'csv': [None], 'orc': [None]}), ('orc', None))
+        self.assertEqual(negotiate_file_format(unload_formats, {'csv': [None]}), ('csv', None))
+
+    def test_no_common_format(self):
+        with self.assertRaises(ProfileConfigError):
+            negotiate_file_format({'parquet': [None]}, {'csv': [None]})
+
+    def test_clickzetta_to_clickzetta(self):
+        # the data files of a materialized view load with or without a volume
+        unload_formats = ClickzettaSource.unload_formats(None)
+        for config in ({}, {'volume': 'migration_volume'}):
+            destination = SimpleNamespace(config=config)
+            self.assertEqual(negotiate_file_format(unload_formats, ClickZettaDestination.load_formats(destination)),
+                             ('parquet', None))
+
+    def test_copy_into_fallback(self):
+        def failing_copy(driver_error):
+            def copy_into(*args):
+                try:
+                    raise driver_error
+                except Exception as e:
+                    raise DestinationExecutionError(f"migration Error running SQL: COPY INTO ... VOLUME, error:{e}")
+            return copy_into
+
+        destination = ClickZettaDestination({'volume': 'migration_volume'})
+        with mock.patch.object(clickzetta_destination.script_utils, 'get_meta_cmd_path',
+                               side_effect=LookupError('temp table load')):
+            # a format the instance does not support falls back to a temp table
+            destination.copy_into = failing_copy(RuntimeError('file format ORC is not supported'))
+            with self.assertRaises(LookupError):
+                destination.load_external_data('path', 'db', 't', 'orc')
+            # a copy failing on its way may have written rows already, it is not loaded again
+            destination.copy_into = failing_copy(TimeoutError('read timed out'))
+            with self.assertRaises(DestinationExecutionError):
+                destination.load_external_data('path', 'db', 't', 'orc')
@@ -0,0 +1,91 @@
+import threading
+import unittest
+
+from migration.util.job_tracker import JobTracker
+
+
+class FakeFrontend:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+        self.queries = []
+
+    def execute_sql(self, sql, bind_params=None):
+        database = sql.split()[-1]
+        with self.lock:
+            self.queries.append(database)
+            rows = []
+            for (job_database, label), state in self.states.items():
+                if job_database == database:
+                    rows.append((len(rows), label, state))
+            return rows
+
+
+class TestJobTracker(unittest.TestCase):
+    def test_batch_status_queries(self):
+        frontend = FakeFrontend()
+        tracker = JobTracker('test', "SHOW EXPORT FROM {database}", frontend.execute_sql,
+                             min_interval=0.01, max_interval=0.05)
+        futures = {}
+        for database in ('db1', 'db2'):
+            for i in range(20):
+                with frontend.lock:
+                    frontend.states[(database, f"label_{i}")] = 'EXPORTING'
+                futures[(database, f"label_{i}")] = tracker.track(database, f"label_{i}")
+        with frontend.lock:
+            frontend.states[('db1', 'label_0')] = 'CANCELLED'
+        self.assertEqual(futures[('db1', 'label_0')].result(timeout=5)[2], 'CANCELLED')
+        with frontend.lock:
+            for key in frontend.states:
+                frontend.states[key] = 'FINISHED'
+        for key, future in futures.items():
+            if key != ('db1', 'label_0'):
+                self.assertEqual(future.result(timeout=5)[2], 'FINISHED')
+        # one query per database and polling cycle, however many jobs are pending
+        self.assertLessEqual(abs(frontend.queries.count('db1') - frontend.queries.count('db2')), 1)
+        self.assertLess(len(frontend.queries), 200)
+        thread = tracker.thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self.assertEqual(tracker.pending_jobs, {})
+
+    def test_new_job_wakes_poller(self):
+        frontend = FakeFrontend()
+        tracker = JobTracker('test', "SHOW EXPORT FROM {database}", frontend.execute_sql,
+                             min_interval=30, max_interval=30)
+        frontend.states[('db1', 'slow')] = 'EXPORTING'
+        slow = tracker.track('db1', 'slow')
+        while not frontend.queries:
+            threading.Event().wait(0.01)
+        # the poller now sleeps 30s, a finished job tracked meanwhile must not wait for it
+        frontend.states[('db1', 'fast')] = 'FINISHED'
+        self.assertEqual(tracker.track('db1', 'fast').result(timeout=5)[2], 'FINISHED')
+        frontend.states[('db1', 'slow')] = 'FINISHED'
+        frontend.states[('db1', 'last')] = 'FINISHED'
+        tracker.track('db1', 'last')
+        self.assertEqual(slow.result(timeout=5)[2], 'FINISHED')
+
+    def test_timeout_unknown_label(self):
+        frontend = FakeFrontend()
+        tracker = JobTracker('test', "SHOW EXPORT FROM {database}", frontend.execute_sql,
+                             min_interval=0.01, max_interval=0.05, timeout=0.2)
+        # a label the frontend never lists must not leave its task waiting forever
+        with self.assertRaises(TimeoutError):
+            tracker.track('db1', 'missing').result(timeout=5)
+        self.assertEqual(tracker.pending_jobs, {})
+
+    def test_repeated_query_errors(self):
+        queries = []
+
+        def execute_sql(sql, bind_params=None):
+            queries.append(sql)
+            raise RuntimeError("frontend unavailable")
+
+        tracker = JobTracker('test', "SHOW LOAD FROM {database}", execute_sql,
+                             min_interval=0.01, max_interval=0.01, max_query_errors=3)
+        futures = [tracker.track('db1', f"label_{i}") for i in range(2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+        self.assertGreaterEqual(len(queries), 3)
+        self.assertEqual(tracker.pending_jobs, {})
@@ -0,0 +1,77 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column
+from migration.connector.source.metadata_cache import cached_metadata
+from migration.connector.source.mysql.source import MysqlSource
+
+
+class CountingSource(Source):
+    def __init__(self):
+        super().__init__('Counting', {})
+        self.queries = 0
+
+    @cached_metadata
+    def get_table_columns(self, database_name, table_name) -> list[Column]:
+        self.queries += 1
+        return [Column('id', 'INT', False), Column('name', 'VARCHAR(10)', True)]
+
+
+class TestMetadataCache(unittest.TestCase):
+    def test_query_once_per_table(self):
+        source = CountingSource()
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: source.get_table_columns('db', 't1'), range(50)))
+        source.get_table_columns('db', 't2')
+        self.assertEqual(source.queries, 2)
+
+    def test_returned_columns_are_copies(self):
+        source = CountingSource()
+        source.get_table_columns('db', 't1')[0].type = 'BIGINT'
+        self.assertEqual(source.get_table_columns('db', 't1')[0].type, 'INT')
+
+    def test_invalidate(self):
+        source = CountingSource()
+        source.get_table_columns('db', 't1')
+        source.get_table_columns('db', 't2')
+        source.invalidate_metadata('db', 't1')
+        source.get_table_columns('db', 't1')
+        source.get_table_columns('db', 't2')
+        self.assertEqual(source.queries, 3)
+        source.invalidate_metadata()
+        source.get_table_columns('db', 't2')
+        self.assertEqual(source.queries, 4)
+
+
+class BulkMysqlSource(MysqlSource):
+    def __init__(self, results):
+        Source.__init__(self, 'Mysql', {})
+        self.results = results
+        self.sqls = []
+
+    def execute_sql(self, sql, bind_params=None):
+        self.sqls.append(sql)
+        for keyword, rows in self.results.items():
+            if keyword in sql:
+                return rows
+        raise AssertionError(f"unexpected sql: {sql}")
+
+
+class TestBulkMetadata(unittest.TestCase):
+    def test_mysql_database_metadata(self):
+        source = BulkMysqlSource({
+            'information_schema.columns': [('t1', 'id', 'int', 'NO', None), ('t1', 'dt', 'date', 'YES', None),
+                                           ('t2', 'name', 'varchar(10)', 'YES', 'a')],
+            'information_schema.statistics': [('t1', 'id')],
+            'information_schema.partitions': [('t1', '`dt`')],
+        })
+        source.load_database_metadata('db')
+        queries = len(source.sqls)
+        self.assertEqual([column.type for column in source.get_table_columns('db', 't1')], ['INT', 'DATE'])
+        self.assertEqual(source.get_primary_key('db', 't1'), ['id'])
+        self.assertEqual(source.get_table_partition_columns('db', 't1'), ['dt'])
+        self.assertIsNone(source.get_primary_key('db', 't2'))
+        self.assertIsNone(source.get_table_partition_columns('db', 't2'))
+        self.assertEqual(source.get_table_columns('db', 't2')[0].default_value, 'a')
+        self.assertEqual(len(source.sqls), queries)
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column, ClusterInfo
+from migration.connector.source.metadata_cache import cached_metadata
+from migration.util import metadata_snapshot
+
+
+class CatalogSource(Source):
+    def __init__(self, modified_times, primary_key_error=False):
+        super().__init__('Catalog', {})
+        self.modified_times = modified_times
+        self.primary_key_error = primary_key_error
+        self.queries = []
+
+    @cached_metadata
+    def get_table_columns(self, database_name, table_name) -> list[Column]:
+        self.queries.append(('columns', table_name))
+        return [Column('id', 'INT', False), Column('name', 'VARCHAR(10)', True, 'a')]
+
+    @cached_metadata
+    def get_primary_key(self, database_name, table_name):
+        self.queries.append(('primary_key', table_name))
+        if self.primary_key_error:
+            raise ConnectionError('lost connection')
+        return ['id']
+
+    @cached_metadata
+    def get_table_cluster_info(self, database_name, table_name):
+        return ClusterInfo(8, ['id'])
+
+    @cached_metadata
+    def get_table_partition_columns(self, database_name, table_name):
+        return None
+
+    def get_ddl_sql(self, database_name, table_name):
+        return f"CREATE TABLE {database_name}.{table_name} (id INT)"
+
+    def get_table_stats(self, database_name):
+        return {table_name: (10, modified_time) for table_name, modified_time in self.modified_times.items()}
+
+
+class TestMetadataSnapshot(unittest.TestCase):
+    def test_reuse_unchanged_tables(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'meta.json.gz')
+            metadata_snapshot.write_snapshot(CatalogSource({'t1': '2024-01-01', 't2': '2024-01-01'}),
+                                             ['db.t1', 'db.t2'], path)
+            snapshot = metadata_snapshot.load_snapshot(path)
+            self.assertEqual(snapshot['tables']['db.t1']['row_count'], 10)
+
+            source = CatalogSource({'t1': '2024-01-01', 't2': '2024-02-01'})
+            ddl_tables = []
+            source.get_ddl_sql = lambda database_name, table_name: ddl_tables.append(table_name)
+            self.assertEqual(metadata_snapshot.apply_snapshot(source, snapshot), 1)
+            # the modification times tell, no DDL is fetched
+            self.assertEqual(ddl_tables, [])
+            columns = source.get_table_columns('db', 't1')
+            self.assertEqual([(column.name, column.default_value) for column in columns], [('id', None), ('name', 'a')])
+            self.assertEqual(source.get_primary_key('db', 't1'), ['id'])
+            self.assertEqual(source.get_table_cluster_info('db', 't1').bucket_num, 8)
+            self.assertEqual(source.queries, [])
+            source.get_table_columns('db', 't2')
+            self.assertEqual(source.queries, [('columns', 't2')])
+
+    def test_skip_failed_and_changed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'meta.json.gz')
+            metadata_snapshot.write_snapshot(CatalogSource({'t1': None, 't2': None}, primary_key_error=True),
+                                             ['db.t1', 'db.t2'], path)
+            snapshot = metadata_snapshot.load_snapshot(path)
+            self.assertIn('get_primary_key', snapshot['tables']['db.t1']['failed'])
+
+            # without modification times the DDL tells whether a table changed
+            source = CatalogSource({'t1': None, 't2': None})
+            source.get_ddl_sql = lambda database_name, table_name: \
+                f"CREATE TABLE {database_name}.{table_name} ({'id' if table_name == 't1' else 'code'} INT)"
+            self.assertEqual(metadata_snapshot.apply_snapshot(source, snapshot), 1)
+            source.get_table_columns('db', 't1')
+            self.assertEqual(source.queries, [])
+            # the primary key that failed to load is queried again
+            self.assertEqual(source.get_primary_key('db', 't1'), ['id'])
+            source.get_table_columns('db', 't2')
+            self.assertEqual(source.queries, [('primary_key', 't1'), ('columns', 't2')])
@@ -0,0 +1,58 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.base.status import TaskStatus, TaskType
+from migration.connector.destination.base import Destination
+from migration.scheduler.task.base_task import Task
+from migration.util import migration_tasks_status
+
+
+class RecordingDestination(Destination):
+    def __init__(self):
+        super().__init__('Doris', {})
+        self.sqls = []
+
+    def execute_sql(self, sql, bind_params=None):
+        self.sqls.append(sql)
+        return []
+
+
+class TestMigrationTasksStatus(unittest.TestCase):
+    def test_batch_status_rows(self):
+        destination = RecordingDestination()
+        sink = migration_tasks_status.StatusSink(destination, flush_interval=60, flush_rows=1000)
+        tasks = [Task(f"db.t{i}", TaskType.DATA_MIGRATION, 'project_0') for i in range(10)]
+        for index, task in enumerate(tasks):
+            task.status_id = index
+            sink.put(task)
+        for task in tasks:
+            task.status = TaskStatus.COMPLETED
+            task.end_time = task.start_time
+            sink.put(task)
+        sink.close()
+        self.assertEqual(len(destination.sqls), 1)
+        self.assertIn("INSERT INTO cz_migration.project_0", destination.sqls[0])
+        self.assertEqual(destination.sqls[0].count("'COMPLETED'"), 10)
+        self.assertNotIn("'INIT'", destination.sqls[0])
+
+    def test_flush_on_size_threshold(self):
+        destination = RecordingDestination()
+        sink = migration_tasks_status.StatusSink(destination, flush_interval=60, flush_rows=5)
+        for index in range(5):
+            task = Task(f"db.t{index}", TaskType.DATA_MIGRATION, 'project_0')
+            task.status_id = index
+            sink.put(task)
+        deadline = time.time() + 5
+        while not destination.sqls and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(destination.sqls), 1)
+        sink.close()
+
+    def test_unique_ids_across_threads(self):
+        allocator = migration_tasks_status.IdAllocator()
+        with ThreadPoolExecutor(8) as executor:
+            blocks = list(executor.map(lambda count: list(allocator.reserve(count)), [1, 5, 100] * 50))
+        ids = [status_id for block in blocks for status_id in block]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(ids), list(range(len(ids))))
@@ -0,0 +1,57 @@
+import sqlite3
+import unittest
+
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.connector.source.doris.source import partition_predicate as doris_partition_predicate
+from migration.connector.source.pg.source import partition_predicate as pg_partition_predicate
+from migration.util.partition_util import diff_partitions
+
+
+def sqlite_table(rows):
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    connection.execute("ATTACH DATABASE ':memory:' AS db")
+    connection.execute("CREATE TABLE db.t (id INT, dt TEXT)")
+    connection.executemany("INSERT INTO db.t VALUES (?, ?)", rows)
+    return connection
+
+
+class SqliteSource(Source):
+    def __init__(self, rows):
+        super().__init__('Sqlite', {})
+        self.connection = sqlite_table(rows)
+
+    def execute_sql(self, sql, bind_params=None):
+        return self.connection.execute(sql).fetchall()
+
+    def get_partition_predicates(self, database_name, table_name):
+        return {f"p{month}": f"dt >= '2024-0{month}-01' AND dt < '2024-0{month + 1}-01'" for month in (1, 2, 3)}
+
+
+class SqliteDestination(Destination):
+    def __init__(self, rows):
+        super().__init__('Sqlite', {})
+        self.connection = sqlite_table(rows)
+
+    def execute_sql(self, sql, bind_params=None):
+        return self.connection.execute(sql).fetchall()
+
+
+class TestPartitionUtil(unittest.TestCase):
+    def test_diff_partitions(self):
+        source = SqliteSource([(1, '2024-01-05'), (2, '2024-02-05'), (3, '2024-02-06'), (4, '2024-03-01')])
+        destination = SqliteDestination([(1, '2024-01-05'), (2, '2024-02-05')])
+        self.assertEqual(list(diff_partitions(source, destination, 'db.t', 'db.t')), ['p2', 'p3'])
+
+        destination.delete_rows('db', 't', source.get_partition_predicates('db', 't')['p2'])
+        self.assertEqual(destination.execute_sql("SELECT id FROM db.t"), [(1,)])
+
+    def test_partition_predicates(self):
+        self.assertEqual(doris_partition_predicate(
+            ['dt'], "[types: [DATEV2]; keys: [2024-01-01]; ..types: [DATEV2]; keys: [2024-02-01]; )"),
+            "dt >= '2024-01-01' AND dt < '2024-02-01'")
+        self.assertEqual(doris_partition_predicate(
+            ['city'], "[types: [VARCHAR]; keys: [beijing]; , types: [VARCHAR]; keys: [shanghai]; ]"),
+            "city IN ('beijing', 'shanghai')")
+        self.assertEqual(pg_partition_predicate('RANGE (id)', "FOR VALUES FROM (MINVALUE) TO (100)"), "id < 100")
+        self.assertIsNone(pg_partition_predicate('HASH (id)', "FOR VALUES WITH (modulus 4, remainder 0)"))
@@ -0,0 +1,67 @@
+import sqlite3
+import threading
+import unittest
+
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.util import pk_range_scan, validation_table_util
+
+
+class SqliteConnector:
+    def __init__(self, ids):
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self.connection.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+        self.connection.executemany("INSERT INTO t VALUES (?, ?)", [(i, f"name_{i}") for i in ids])
+        self.lock = threading.Lock()
+
+    def execute_sql(self, sql, bind_params=None):
+        with self.lock:
+            return self.connection.execute(sql).fetchall()
+
+
+class SqliteSource(SqliteConnector, Source):
+    def __init__(self, ids):
+        Source.__init__(self, 'Sqlite', {})
+        SqliteConnector.__init__(self, ids)
+
+
+class SqliteDestination(SqliteConnector, Destination):
+    def __init__(self, ids):
+        Destination.__init__(self, 'Sqlite', {})
+        SqliteConnector.__init__(self, ids)
+
+
+class TestPkRangeScan(unittest.TestCase):
+    def test_split_ids(self):
+        self.assertEqual(pk_range_scan.split_ids(1, 100, 4), [(None, 26), (26, 51), (51, 76), (76, None)])
+        self.assertEqual(pk_range_scan.split_ids(None, None, 4), [(None, None)])
+        # sampled ids place the boundaries where the ids are
+        self.assertEqual(pk_range_scan.split_ids(1, 1000, 3, [1, 2, 3, 4, 5, 6, 1000]), [(None, 4), (4, 6), (6, None)])
+
+    def test_range_query(self):
+        self.assertEqual(pk_range_scan.range_query('id', 'db.t', 'id', 10, None), "select id from db.t where id >= 10")
+        self.assertEqual(pk_range_scan.range_query('id', "db.t where p = '1'", 'id', None, 20),
+                         "select id from db.t where p = '1' and id < 20")
+        self.assertEqual(pk_range_scan.range_query('id', "db.t WHERE p = '1'", 'id', 10, None),
+                         "select id from db.t WHERE p = '1' and id >= 10")
+        self.assertEqual(pk_range_scan.range_query('id', 'db.somewhere', 'id', 10, None),
+                         "select id from db.somewhere where id >= 10")
+
+    def test_pk_id_column_validation(self):
+        source = SqliteSource(range(1, 100001))
+        destination = SqliteDestination([i for i in range(1, 100001) if i % 25000 != 0] + [100005])
+        result = validation_table_util.pk_id_column_validation('main.t', 'main.t', source, destination, 'id',
+                                                               scan_window=2)
+        self.assertEqual(result['only_in_source_list'], [25000, 50000, 75000, 100000])
+        self.assertEqual(result['only_in_dest_list'], [100005])
+        self.assertEqual((result['only_in_source'], result['only_in_dest']), (4, 1))
+
+    def test_pk_id_column_validation_with_count(self):
+        source = SqliteSource(range(1, 200001))
+        destination = SqliteDestination([i for i in range(1, 200001) if i % 10000 != 0])
+        result = validation_table_util.pk_id_column_validation_with_count('main.t', 'main.t', source, destination,
+                                                                          'id', 3, scan_window=2)
+        # the highest range is scanned first, the scan stops there as 5 of its ids are missing
+        self.assertEqual(result['check_status'], 1)
+        self.assertEqual(result['only_in_source_list'], [160000, 170000, 180000, 190000, 200000])
+        self.assertEqual(result['only_in_dest'], 0)
@@ -0,0 +1,85 @@
+import sqlite3
+import statistics
+import unittest
+from decimal import Decimal
+
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column
+from migration.util import profile_util
+
+COLUMNS = [Column('id', 'BIGINT', False, None), Column('name', 'VARCHAR(20)', True, None)]
+
+
+class Stddev:
+    function = None
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return self.function(self.values) if len(self.values) > 1 else None
+
+
+class StddevPop(Stddev):
+    function = staticmethod(statistics.pstdev)
+
+
+class StddevSamp(Stddev):
+    function = staticmethod(statistics.stdev)
+
+
+class SqliteSource(Source):
+    def __init__(self, rows):
+        super().__init__('MySQL', {})
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.create_aggregate('stddev_pop', 1, StddevPop)
+        self.connection.create_aggregate('stddev_samp', 1, StddevSamp)
+        self.connection.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+        self.connection.executemany("INSERT INTO t VALUES (?, ?)", rows)
+        self.queries = []
+
+    def execute_sql(self, sql, bind_params=None):
+        self.queries.append(sql)
+        return self.connection.execute(sql).fetchall()
+
+
+class TestProfileUtil(unittest.TestCase):
+    def test_profile_rows(self):
+        source = SqliteSource([(1, 'a'), (2, 'a'), (3, None), (4, 'b')])
+        profiles = profile_util.profile_rows(source, 't', COLUMNS, [True, False])
+        self.assertEqual(len(source.queries), 1)
+        self.assertEqual(profiles[0][:7], ['id', 'BIGINT', 4, Decimal('1.0000'), Decimal('1.0000'), 4, 1])
+        self.assertEqual(profiles[0][7:10], [1, 4, 2.5])
+        self.assertAlmostEqual(profiles[0][10], statistics.pstdev([1, 2, 3, 4]))
+        self.assertEqual(profiles[1], ['name', 'VARCHAR(20)', 4, Decimal('0.7500'), Decimal('0.5000'), 2, 0,
+                                       None, None, None, None, None])
+
+    def test_profile_query(self):
+        source = SqliteSource([])
+        self.assertEqual(profile_util.profile_query(source, 't', COLUMNS[1:], [False], approximate_distinct=True),
+                         "select count(*), count(`name`), count(distinct `name`) from t")
+        source.name = 'Doris'
+        self.assertEqual(profile_util.profile_query(source, 't', COLUMNS[1:], [False], approximate_distinct=True),
+                         "select count(*), count(`name`), ndv(`name`) from t")
+
+    def test_approximate_distinct(self):
+        source = SqliteSource([(1, 'a'), (2, 'b')])
+        source.name = 'Doris'
+        source.connection.create_function('ndv', 1, lambda value: 2)
+        self.assertIsNone(profile_util.profile_rows(source, 't', COLUMNS[1:], [False], approximate_distinct=True)[0][6])
+        # a dialect counting exactly leaves is_unique null too, so it matches an estimating side
+        exact = SqliteSource([(1, 'a'), (2, 'b')])
+        self.assertIsNone(profile_util.profile_rows(exact, 't', COLUMNS[1:], [False], approximate_distinct=True)[0][6])
+        self.assertEqual(profile_util.profile_rows(exact, 't', COLUMNS[1:], [False])[0][6], 1)
+        # estimates within the tolerance compare equal, others still differ
+        source_profiles = [['a', 'INT', 1000, None, Decimal('0.9900'), 990, None],
+                           ['b', 'INT', 1000, None, Decimal('0.5000'), 500, None]]
+        destination_profiles = [['a', 'INT', 1000, None, Decimal('1.0000'), 1000, None],
+                                ['b', 'INT', 1000, None, Decimal('0.6000'), 600, None]]
+        profile_util.align_approximate_distinct(source_profiles, destination_profiles)
+        self.assertEqual(source_profiles[0][4:6], [Decimal('1.0000'), 1000])
+        self.assertEqual(source_profiles[1][4:6], [Decimal('0.5000'), 500])
@@ -0,0 +1,78 @@
+import sqlite3
+import unittest
+from unittest import mock
+
+from migration.connector.destination.base import Destination
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column
+from migration.util import row_diff
+
+COLUMNS = [Column('id', 'INT', False, None), Column('name', 'VARCHAR(20)', True, None),
+           Column('amount', 'DECIMAL(10,2)', True, None)]
+
+
+def sqlite_table(rows):
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    connection.execute("CREATE TABLE t (id INT, name TEXT, amount TEXT)")
+    connection.executemany("INSERT INTO t VALUES (?, ?, ?)", rows)
+    return connection
+
+
+class SqliteSource(Source):
+    def __init__(self, rows):
+        super().__init__('Sqlite', {})
+        self.connection = sqlite_table(rows)
+
+    def execute_sql(self, sql, bind_params=None):
+        return self.connection.execute(sql).fetchall()
+
+
+class SqliteDestination(Destination):
+    def __init__(self, rows):
+        super().__init__('Sqlite', {})
+        self.connection = sqlite_table(rows)
+
+    def execute_sql(self, sql, bind_params=None):
+        return self.connection.execute(sql).fetchall()
+
+
+class TestRowDiff(unittest.TestCase):
+    def test_compare(self):
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(1000)]
+        source = SqliteSource(rows)
+        # the destination returns rows in another order, one changed, one missing and one added
+        destination_rows = list(reversed(rows[1:]))
+        destination_rows[0] = (999, 'renamed', '999.5')
+        destination_rows.append((1000, None, None))
+        destination = SqliteDestination(destination_rows)
+
+        with mock.patch.object(row_diff, 'DEFAULT_BUCKETS', 4):
+            result = row_diff.compare(source, destination, "SELECT * FROM t", "SELECT * FROM t", COLUMNS, ['id'])
+        self.assertEqual((result['source_rows'], result['destination_rows']), (1000, 1000))
+        self.assertEqual((result['added'], result['removed'], result['changed']), (1, 1, 1))
+        self.assertEqual(result['added_rows'], [['1000', None, None]])
+        self.assertEqual(result['removed_rows'], [['0', 'name_0', '0.5']])
+        self.assertEqual(result['changed_rows'], [(['999', 'name_999', '999.5'], ['999', 'renamed', '999.5'])])
+
+        # without a key a changed row is one removed and one added, duplicates are counted
+        destination = SqliteDestination(rows + [rows[0]])
+        result = row_diff.compare(source, destination, "SELECT * FROM t", "SELECT * FROM t", COLUMNS)
+        self.assertEqual((result['added'], result['removed'], result['changed']), (1, 0, 0))
+
+    def test_split_large_buckets(self):
+        rows = [(i, f"name_{i}", f"{i}.50") for i in range(3000)]
+        destination_rows = [(i, f"renamed_{i}" if i % 3 == 0 else name, amount) for i, name, amount in rows[100:]]
+        # a single bucket of a few KB is split by other hashes until its parts fit
+        with mock.patch.multiple(row_diff, DEFAULT_BUCKETS=1, MAX_BUCKETS=4, DEFAULT_BUCKET_SIZE='16KB'), \
+                mock.patch.object(row_diff, 'add_differences', wraps=row_diff.add_differences) as add_differences:
+            result = row_diff.compare(SqliteSource(rows), SqliteDestination(destination_rows), "SELECT * FROM t",
+                                      "SELECT * FROM t", COLUMNS, ['id'], max_reported_rows=None)
+        self.assertGreater(add_differences.call_count, 1)
+        self.assertEqual((result['added'], result['removed'], result['changed']), (0, 100, 966))
+        self.assertEqual(len(result['removed_rows']), 100)
+        self.assertEqual(len(result['changed_rows']), 966)
+
+        result = row_diff.compare(SqliteSource(rows), SqliteDestination(destination_rows), "SELECT * FROM t",
+                                  "SELECT * FROM t", COLUMNS, ['id'], max_reported_rows=10)
+        self.assertEqual((result['removed'], result['changed']), (100, 966))
+        self.assertEqual((len(result['removed_rows']), len(result['changed_rows'])), (10, 10))
@@ -0,0 +1,51 @@
+"""
+Measure the per-task overhead of the Scheduler with no-op tasks.
+
+usage:
+    python -m migration.test.scheduler_benchmark [task_count ...]
+"""
+import logging
+import sys
+import time
+
+from migration.base.status import TaskStatus, TaskType
+from migration.scheduler.scheduler import Scheduler, SchedulerConfig
+from migration.scheduler.task.base_task import Task
+
+DEFAULT_TASK_COUNTS = [1000, 10000, 100000]
+
+
+class NoopTask(Task):
+    def __init__(self, name):
+        super().__init__(name, TaskType.DATA_MIGRATION, 'benchmark')
+
+    def run(self):
+        self.status = TaskStatus.COMPLETED
+        return self
+
+
+def benchmark(task_count, max_workers=10):
+    tasks = [NoopTask(f"benchmark.table_{i}") for i in range(task_count)]
+    scheduler = Scheduler(SchedulerConfig(max_workers=max_workers))
+    start_time = time.perf_counter()
+    scheduler.tasks_num = task_count
+    scheduler.run()
+    for task in tasks:
+        scheduler.add_task(task)
+    scheduler.finish()
+    elapsed = time.perf_counter() - start_time
+    assert len(scheduler.succeed_tasks) == task_count
+    return elapsed
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    task_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_TASK_COUNTS
+    print(f"{'tasks':>10} {'total(s)':>10} {'per task(us)':>14}")
+    for task_count in task_counts:
+        elapsed = benchmark(task_count)
+        print(f"{task_count:>10} {elapsed:>10.3f} {elapsed / task_count * 1e6:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
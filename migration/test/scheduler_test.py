@@ -0,0 +1,95 @@
+import threading
+import time
+import unittest
+
+from migration.base.status import TaskStatus, TaskType
+from migration.scheduler.scheduler import Scheduler, SchedulerConfig
+from migration.scheduler.task.base_task import Task
+from migration.scheduler.task_queue import TaskQueue, ByteBudget
+
+
+class FlakyTask(Task):
+    def __init__(self, name, fail_times=0):
+        super().__init__(name, TaskType.DATA_MIGRATION, 'test_project')
+        self.fail_times = fail_times
+        self.run_times = 0
+
+    def run(self):
+        self.run_times += 1
+        if self.run_times <= self.fail_times:
+            self.status = TaskStatus.FAILED
+        else:
+            self.status = TaskStatus.COMPLETED
+        return self
+
+
+class TestScheduler(unittest.TestCase):
+    def run_tasks(self, tasks, task_retry=3):
+        scheduler = Scheduler(SchedulerConfig(max_workers=4, task_retry=task_retry))
+        scheduler.tasks_num = len(tasks)
+        scheduler.run()
+        for task in tasks:
+            scheduler.add_task(task)
+        scheduler.finish()
+        return scheduler
+
+    def test_finish_without_polling_delay(self):
+        start = time.time()
+        scheduler = self.run_tasks([FlakyTask(f"db.t{i}") for i in range(200)])
+        self.assertEqual(len(scheduler.succeed_tasks), 200)
+        self.assertLess(time.time() - start, 1)
+
+    def test_retry_failed_task(self):
+        flaky = FlakyTask("db.flaky", fail_times=1)
+        broken = FlakyTask("db.broken", fail_times=10)
+        scheduler = self.run_tasks([flaky, broken])
+        self.assertEqual(scheduler.succeed_tasks, [flaky])
+        self.assertEqual(scheduler.failed_tasks, [broken])
+        self.assertEqual(flaky.run_times, 2)
+        self.assertEqual(broken.run_times, 3)
+
+    def test_consume_shared_queue(self):
+        task_queue = TaskQueue()
+        tasks = [FlakyTask(f"db.t{i}") for i in range(50)]
+        for task in tasks:
+            task_queue.put(task)
+        schedulers = [Scheduler(SchedulerConfig(max_workers=2)) for _ in range(3)]
+        threads = [threading.Thread(target=scheduler.consume, args=(task_queue,)) for scheduler in schedulers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(len(scheduler.succeed_tasks) for scheduler in schedulers), 50)
+        self.assertEqual(len(task_queue), 0)
+
+
+class TestTaskQueue(unittest.TestCase):
+    def test_largest_task_first(self):
+        task_queue = TaskQueue()
+        for name, size in [("db.small", 1), ("db.large", 100), ("db.first", 0), ("db.medium", 10), ("db.second", 0)]:
+            task = FlakyTask(name)
+            task.estimated_size = size
+            task_queue.put(task)
+        names = []
+        while (task := task_queue.get()) is not None:
+            names.append(task.name)
+        self.assertEqual(names, ["db.large", "db.medium", "db.small", "db.first", "db.second"])
+
+    def test_byte_budget_admission(self):
+        task_queue = TaskQueue([ByteBudget("source", 100), ByteBudget("destination", 80)])
+        for name, size in [("db.huge", 500), ("db.large", 60), ("db.medium", 30), ("db.small", 10)]:
+            task = FlakyTask(name)
+            task.estimated_size = size
+            task_queue.put(task)
+        first = task_queue.get()
+        self.assertEqual(first.name, "db.large")
+        small = task_queue.get()
+        self.assertEqual(small.name, "db.small")
+        task_queue.task_done(first)
+        second = task_queue.get()
+        self.assertEqual(second.name, "db.medium")
+        task_queue.task_done(second)
+        task_queue.task_done(small)
+        # nothing else is in flight, so the oversized table is admitted on its own
+        self.assertEqual(task_queue.get().name, "db.huge")
+        self.assertIsNone(task_queue.get())
@@ -0,0 +1,51 @@
+import unittest
+
+from migration.base.status import TaskType
+from migration.connector.destination.base import Destination
+from migration.scheduler.task.schema_task import SchemaMigrationTask, SchemaMigrationBatchTask
+
+
+class ScriptDestination(Destination):
+    def __init__(self, failing_ddl=None):
+        super().__init__('Script', {})
+        self.failing_ddl = failing_ddl
+        self.scripts = []
+        self.statements = []
+
+    def supports_multi_statement(self):
+        return True
+
+    def execute_script(self, statements):
+        if self.failing_ddl in statements:
+            raise RuntimeError("script failed")
+        self.scripts.append(statements)
+
+    def execute_sql(self, sql, bind_params=None):
+        if sql == self.failing_ddl:
+            raise RuntimeError("statement failed")
+        self.statements.append(sql)
+
+
+class TestSchemaMigrationBatchTask(unittest.TestCase):
+    def run_batch(self, destination):
+        tasks = [SchemaMigrationTask(name=f"db.t{i}", ddl=f"CREATE TABLE db.t{i} (id INT)",
+                                     task_type=TaskType.SCHEMA_MIGRATION, destination=destination,
+                                     project_id='test_project') for i in range(3)]
+        batch = SchemaMigrationBatchTask(name="schema_batch_0", task_type=TaskType.SCHEMA_MIGRATION, tasks=tasks,
+                                         destination=destination, project_id='test_project')
+        return batch.run(), tasks
+
+    def test_one_script(self):
+        destination = ScriptDestination()
+        batch, tasks = self.run_batch(destination)
+        self.assertTrue(batch.is_success())
+        self.assertEqual(len(destination.scripts), 1)
+        self.assertEqual(destination.statements, [])
+        self.assertTrue(all(task.is_success() for task in tasks))
+
+    def test_fall_back_per_table(self):
+        destination = ScriptDestination(failing_ddl="CREATE TABLE db.t1 (id INT)")
+        batch, tasks = self.run_batch(destination)
+        self.assertTrue(batch.is_failed())
+        self.assertEqual([task.is_success() for task in tasks], [True, False, True])
+        self.assertEqual(len(destination.statements), 2)
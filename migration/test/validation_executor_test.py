@@ -0,0 +1,23 @@
+import threading
+import unittest
+
+from migration.util import validation_executor
+
+
+class TestValidationExecutor(unittest.TestCase):
+    def test_run_paired(self):
+        # each side waits for the other, they only both return when they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        self.assertEqual(validation_executor.run_paired(lambda: barrier.wait() is not None and 'source',
+                                                        lambda: barrier.wait() is not None and 'destination'),
+                         ('source', 'destination'))
+
+    def test_run_paired_error(self):
+        finished = threading.Event()
+
+        def fail():
+            raise ValueError('destination failed')
+
+        with self.assertRaises(ValueError):
+            validation_executor.run_paired(finished.set, fail)
+        self.assertTrue(finished.is_set())
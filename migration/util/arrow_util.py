@@ -0,0 +1,141 @@
+import json
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pyarrow
+import pyarrow.compute as pc
+
+from migration.util.cursor_util import DEFAULT_FETCH_ROWS
+
+
+def to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', errors='replace')
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return str(value)
+
+
+def to_value(arrow_type):
+    """Converter of the values a DB-API cursor returns to values pyarrow accepts for the type, None if not needed."""
+    if pyarrow.types.is_string(arrow_type):
+        return to_string
+    if pyarrow.types.is_binary(arrow_type):
+        return lambda value: bytes(value) if isinstance(value, (bytearray, memoryview)) else value
+    if pyarrow.types.is_decimal(arrow_type):
+        return lambda value: Decimal(str(value)) if isinstance(value, (int, float, str)) else value
+    if pyarrow.types.is_timestamp(arrow_type):
+        return lambda value: datetime(value.year, value.month, value.day) \
+            if isinstance(value, date) and not isinstance(value, datetime) else value
+    return None
+
+
+def to_array(values, arrow_type=None):
+    """Arrow array of a column of cursor values, of arrow_type or inferred, strings when they mix types."""
+    if arrow_type is not None:
+        converter = to_value(arrow_type)
+        if converter is not None:
+            values = [converter(value) if value is not None else None for value in values]
+        return pyarrow.array(values, type=arrow_type)
+    try:
+        return pyarrow.array(values)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError):
+        return pyarrow.array([to_string(value) for value in values], type=pyarrow.string())
+
+
+def rows_to_batch(rows, names=None, schema=None):
+    """Record batch of cursor rows, typed by schema when given, columns named _c0, _c1... without names."""
+    columns = list(zip(*rows)) if rows else []
+    if schema is not None:
+        columns = columns or [[] for _ in schema]
+        return pyarrow.RecordBatch.from_arrays([to_array(list(values), field.type)
+                                                for values, field in zip(columns, schema)], schema=schema)
+    names = names or [f"_c{index}" for index in range(len(columns))]
+    return pyarrow.RecordBatch.from_arrays([to_array(list(values)) for values in columns], names=names)
+
+
+def iter_batches(rows, batch_size=DEFAULT_FETCH_ROWS, names=None):
+    """Record batches of up to batch_size rows of a row iterator."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield rows_to_batch(batch, names)
+            batch = []
+    if batch:
+        yield rows_to_batch(batch, names)
+
+
+def iter_cursor_batches(cursor, batch_size=DEFAULT_FETCH_ROWS, schema=None):
+    """Record batches of an executed DB-API cursor, named after its columns, batch_size rows per fetch."""
+    names = [column[0] for column in cursor.description] if cursor.description else None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows_to_batch(rows, names, schema)
+
+
+def read_table(batches):
+    """
+    Arrow table of record batches. Types inferred per batch are widened to a common type, e.g. null to
+    string or int64 to double, columns still of different types are read as strings.
+    """
+    batches = list(batches)
+    if not batches:
+        return pyarrow.table({})
+    try:
+        return pyarrow.concat_tables([pyarrow.Table.from_batches([batch]) for batch in batches],
+                                     promote_options='permissive')
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        names = batches[0].schema.names
+        return pyarrow.table({name: pyarrow.chunked_array([pc.cast(batch.column(index), pyarrow.string())
+                                                           for batch in batches], type=pyarrow.string())
+                              for index, name in enumerate(names)})
+
+
+def normalize_datetime(column):
+    """
+    Datetime column as 'YYYY-MM-DD HH:MM:SS[.ffffff]' strings in its own time zone, with the trailing zeros of
+    the fraction dropped, so every value has one text form whatever the unit and type it was read as.
+    """
+    if pyarrow.types.is_string(column.type) or pyarrow.types.is_large_string(column.type):
+        try:
+            column = pc.cast(column, pyarrow.timestamp('us'))
+        except pyarrow.ArrowInvalid:
+            return column
+    if not pyarrow.types.is_timestamp(column.type):
+        return normalize_string(column)
+    if column.type.tz is not None:
+        column = pc.local_timestamp(column)
+    column = pc.strftime(pc.cast(column, pyarrow.timestamp('us')), format='%Y-%m-%d %H:%M:%S')
+    return pc.replace_substring_regex(column, r'\.?0+$', '')
+
+
+def is_numeric(arrow_type):
+    return pyarrow.types.is_integer(arrow_type) or pyarrow.types.is_floating(arrow_type) \
+        or pyarrow.types.is_decimal(arrow_type)
+
+
+def normalize_number(column):
+    """Numbers, or strings holding numbers, as strings without trailing zeros after the decimal point."""
+    column = pc.replace_substring_regex(normalize_string(column), r'(\.\d*?)0+$', r'\1')
+    return pc.replace_substring_regex(column, r'\.$', '')
+
+
+def normalize_string(column):
+    """Any column as strings, booleans as 1 and 0 like the databases without a boolean type."""
+    if pyarrow.types.is_boolean(column.type):
+        column = pc.cast(column, pyarrow.int8())
+    if not (pyarrow.types.is_binary(column.type) or pyarrow.types.is_large_binary(column.type)):
+        try:
+            return pc.cast(column, pyarrow.string())
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+            pass
+    return pyarrow.array([to_string(value) for value in column.to_pylist()], type=pyarrow.string())
+
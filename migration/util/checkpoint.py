@@ -0,0 +1,142 @@
+import glob
+import json
+import logging
+import os
+import threading
+
+from migration.base.status import TaskStatus, TaskType
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_SUFFIX = "_checkpoint.jsonl"
+
+
+class Checkpoint:
+    """
+    Local log of a migration run, one JSON object per line: the task types of the run, the final status
+    of every task and every partition loaded into the destination. Each record is written as soon as it
+    happens, so the log survives a crash of the run and `resume` can pick up from it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def record_task_types(self, task_types: list[TaskType]):
+        self.append({'task_types': [task_type.value for task_type in task_types]})
+
+    def record_task(self, task):
+        self.append({'task': task.qualified_name, 'task_type': task.task_type.value, 'status': task.status.value,
+                     'id': task.status_id})
+
+    def record_partition(self, task, partition):
+        self.append({'task': task.name, 'partition': partition})
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with self.lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # the last line is torn when the run crashed while writing it
+                        logger.warning(f"Skip broken line of checkpoint {self.path}: {line.strip()}")
+        return records
+
+
+CHECKPOINTS = {}
+CHECKPOINTS_LOCK = threading.Lock()
+# directory of the checkpoints, set from the profile before any run, the working directory by default
+CHECKPOINT_DIR = '.'
+
+
+def set_checkpoint_dir(checkpoint_dir: str):
+    global CHECKPOINT_DIR
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    CHECKPOINT_DIR = checkpoint_dir
+
+
+def checkpoint_path(project_id: str):
+    return os.path.join(CHECKPOINT_DIR, f"{project_id}{CHECKPOINT_SUFFIX}")
+
+
+def open_checkpoint(project_id: str) -> Checkpoint:
+    with CHECKPOINTS_LOCK:
+        if project_id not in CHECKPOINTS:
+            CHECKPOINTS[project_id] = Checkpoint(checkpoint_path(project_id))
+        return CHECKPOINTS[project_id]
+
+
+def get_checkpoint(project_id: str):
+    """The checkpoint of a run opened by a transformer, None outside of a run."""
+    with CHECKPOINTS_LOCK:
+        return CHECKPOINTS.get(project_id)
+
+
+def find_last_checkpoint(project_name: str):
+    """Status table name of the latest run of the project that left a local checkpoint, or None."""
+    project_ids = {}
+    pattern = f"{glob.escape(project_name)}_*{CHECKPOINT_SUFFIX}"
+    for path in glob.glob(os.path.join(glob.escape(CHECKPOINT_DIR), pattern)):
+        project_id = os.path.basename(path)[:-len(CHECKPOINT_SUFFIX)]
+        try:
+            project_ids[int(project_id.split("_")[-1])] = project_id
+        except ValueError:
+            continue
+    return project_ids[max(project_ids)] if project_ids else None
+
+
+class ResumeState:
+    """What a previous run of a project left to do, merged from its status table and its local checkpoint."""
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self.task_types = []
+        # (task_name, task_type) -> TaskStatus, COMPLETED once any attempt of the task completed
+        self.task_status = {}
+        self.loaded_partitions = {}
+        self.next_status_id = 0
+
+    def add_task_status(self, task_name, task_type: TaskType, status: TaskStatus, status_id=None):
+        key = (task_name, task_type)
+        if self.task_status.get(key) != TaskStatus.COMPLETED:
+            self.task_status[key] = status
+        if status_id is not None:
+            self.next_status_id = max(self.next_status_id, int(status_id) + 1)
+
+    def add_checkpoint(self, records):
+        for record in records:
+            if 'task_types' in record:
+                self.task_types = [TaskType(task_type) for task_type in record['task_types']]
+            elif 'partition' in record:
+                self.loaded_partitions.setdefault(record['task'], set()).add(record['partition'])
+            else:
+                self.add_task_status(record['task'], TaskType(record['task_type']), TaskStatus(record['status']),
+                                     record.get('id'))
+
+    def get_task_types(self):
+        """Task types of the run being resumed, in running order."""
+        if self.task_types:
+            return self.task_types
+        present = {task_type for _, task_type in self.task_status}
+        return [task_type for task_type in TaskType if task_type in present]
+
+    def is_completed(self, task_name, task_type: TaskType):
+        return self.task_status.get((task_name, task_type)) == TaskStatus.COMPLETED
+
+    def has_run(self, task_name, task_type: TaskType):
+        return (task_name, task_type) in self.task_status
+
+    def completed_partitions(self, task_name):
+        return set(self.loaded_partitions.get(task_name, ()))
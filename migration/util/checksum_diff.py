@@ -0,0 +1,250 @@
+import logging
+import math
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from migration.connector.destination.base import Destination
+from migration.connector.source import Source
+from migration.util import row_diff
+
+logger = logging.getLogger(__name__)
+
+# children a differing segment is split into
+DEFAULT_SEGMENTS = 32
+# segments of at most this many rows on either side are fetched and compared row by row
+DEFAULT_LEAF_ROWS = 16384
+DEFAULT_DIFF_PARALLELISM = 6
+# segments queried ahead per worker, a result is dropped once it is compared
+WINDOW_PER_WORKER = 2
+# row hashes are 32 bits, segments by hash are not split past this modulus
+MAX_HASH_MODULUS = 2 ** 32
+NULL_TEXT = '<null>'
+TEXT_SEPARATOR = '|'
+
+INTEGER_TYPES = {'TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'INTEGER', 'BIGINT', 'SERIAL', 'BIGSERIAL',
+                 'SMALLSERIAL'}
+
+TEXT_TYPE = {'mysql': 'char', 'doris': 'string', 'postgresql': 'text', 'clickzetta': 'string', 'odps': 'string'}
+INTEGER_TYPE = {'mysql': 'signed', 'doris': 'bigint', 'postgresql': 'int', 'clickzetta': 'bigint', 'odps': 'bigint'}
+# the last 8 hex digits of the md5 of a text as an unsigned 32 bit integer, the same number in every dialect,
+# so a sum of a billion of them still fits a bigint
+HASH = {
+    'mysql': "cast(conv(substring(md5({text}), 25, 8), 16, 10) as unsigned)",
+    'doris': "cast(conv(substr(md5({text}), 25, 8), 16, 10) as bigint)",
+    'postgresql': "('x' || substr(md5({text}), 25, 8))::bit(32)::bigint",
+    'clickzetta': "cast(conv(substr(md5({text}), 25, 8), 16, 10) as bigint)",
+    'odps': "cast(conv(substr(md5({text}), 25, 8), 16, 10) as bigint)",
+}
+
+
+class Side:
+    """One side of a checksum diff: a table of a connector and the dialect of its hash expressions."""
+
+    def __init__(self, connector, table, columns, key_columns):
+        self.connector = connector
+        self.table = table
+        self.dialect = connector.name.lower()
+        if self.dialect not in HASH:
+            raise Exception(f"Unsupported database type {self.dialect} in checksum diff")
+        self.quote = connector.quote_character()
+        self.columns = columns
+        self.row_hash = self.hash([self.text(column) for column in columns])
+        key_texts = [self.text(column) for column in columns if column.name in key_columns]
+        self.key_hash = self.hash(key_texts) if key_texts else self.row_hash
+
+    def column(self, name):
+        return f"{self.quote}{name}{self.quote}"
+
+    def text(self, column):
+        """Column as text in a form both sides agree on for the types that usually print differently."""
+        value = self.column(column.name)
+        declared_type = row_diff.base_type(column.type)
+        if declared_type in ('BOOL', 'BOOLEAN'):
+            value = f"cast({value} as {INTEGER_TYPE[self.dialect]})"
+        elif declared_type in ('DECIMAL', 'NUMERIC'):
+            match = re.search(r'\(\s*\d+\s*,\s*(\d+)\s*\)', column.type)
+            value = f"cast({value} as decimal(38, {match.group(1) if match else 0}))"
+        return f"coalesce(cast({value} as {TEXT_TYPE[self.dialect]}), '{NULL_TEXT}')"
+
+    def hash(self, texts):
+        return HASH[self.dialect].format(text=f"concat_ws('{TEXT_SEPARATOR}', {', '.join(texts)})")
+
+    def summary(self, key_column=None):
+        """(rows, checksum) of the whole table, and (min, max) of key_column when given."""
+        select = f"count(*), sum({self.row_hash})"
+        if key_column is not None:
+            select += f", min({self.column(key_column)}), max({self.column(key_column)})"
+        row = self.connector.execute_sql(f"select {select} from {self.table}")[0]
+        return (row[0], int(row[1] or 0)), tuple(row[2:])
+
+    def checksums(self, segment, segments):
+        """(rows, checksum) of every non-empty child of a segment, by child bucket."""
+        bucket = segment.bucket_expression(self, segments)
+        sql = f"select {bucket}, count(*), sum({self.row_hash}) from {self.table} " \
+              f"where {segment.predicate(self)} group by {bucket}"
+        return {int(bucket): (count, int(total or 0)) for bucket, count, total in self.connector.execute_sql(sql)}
+
+    def rows(self, segment, key_indices):
+        select = ", ".join(self.column(column.name) for column in self.columns)
+        batches = self.connector.iter_arrow(f"select {select} from {self.table} where {segment.predicate(self)}")
+        return row_diff.rows_table(batches, self.columns, key_indices)
+
+
+class KeyRange:
+    """Rows of an integer key from lower, inclusive, to upper, exclusive."""
+
+    def __init__(self, key_column, lower, upper):
+        self.key_column = key_column
+        self.lower = lower
+        self.upper = upper
+
+    def step(self, segments):
+        return math.ceil((self.upper - self.lower) / segments)
+
+    def predicate(self, side: Side):
+        key = side.column(self.key_column)
+        return f"{key} >= {self.lower} and {key} < {self.upper}"
+
+    def bucket_expression(self, side: Side, segments):
+        # the bounds of the children, not a division, some dialects divide integers into rounded decimals
+        key = side.column(self.key_column)
+        children = math.ceil((self.upper - self.lower) / self.step(segments))
+        cases = " ".join(f"when {key} < {self.child(bucket, segments).upper} then {bucket}"
+                         for bucket in range(children - 1))
+        return f"case {cases} else {children - 1} end" if cases else "0"
+
+    def child(self, bucket, segments):
+        step = self.step(segments)
+        return KeyRange(self.key_column, self.lower + bucket * step, min(self.upper, self.lower + (bucket + 1) * step))
+
+    def splittable(self, segments):
+        return self.upper - self.lower > 1
+
+    def __repr__(self):
+        return f"{self.key_column} in [{self.lower}, {self.upper})"
+
+
+class HashRange:
+    """Rows whose key hash is remainder modulo modulus, for keys that can not be split in ranges."""
+
+    def __init__(self, modulus, remainder):
+        self.modulus = modulus
+        self.remainder = remainder
+
+    def predicate(self, side: Side):
+        return f"{side.key_hash} % {self.modulus} = {self.remainder}" if self.modulus > 1 else "1 = 1"
+
+    def bucket_expression(self, side: Side, segments):
+        return f"{side.key_hash} % {self.modulus * segments}"
+
+    def child(self, bucket, segments):
+        return HashRange(self.modulus * segments, bucket)
+
+    def splittable(self, segments):
+        return self.modulus * segments <= MAX_HASH_MODULUS
+
+    def __repr__(self):
+        return f"key hash % {self.modulus} = {self.remainder}"
+
+
+def segment_results(executor, segments, call, window):
+    """
+    Yield (segment, source result, destination result) of every segment in order, call(side, segment) runs
+    for both sides of up to window segments at once.
+    """
+    pending = deque()
+    try:
+        for segment in segments:
+            pending.append((segment, [executor.submit(call, side, segment) for side in (0, 1)]))
+            if len(pending) >= window:
+                segment, futures = pending.popleft()
+                yield segment, futures[0].result(), futures[1].result()
+        while pending:
+            segment, futures = pending.popleft()
+            yield segment, futures[0].result(), futures[1].result()
+    finally:
+        for _, futures in pending:
+            for future in futures:
+                future.cancel()
+
+
+def diff_tables(source: Source, destination: Destination, source_table: str, destination_table: str,
+                key_columns=None, segments=DEFAULT_SEGMENTS, leaf_rows=DEFAULT_LEAF_ROWS,
+                parallelism=DEFAULT_DIFF_PARALLELISM, max_reported_rows=row_diff.MAX_REPORTED_ROWS):
+    """
+    Diff two tables by segment checksums, the count and sum of the row hashes of a segment computed by each
+    database, both sides in parallel. Segments whose checksums differ are split and checked again, only the
+    rows of the smallest differing segments are fetched and compared, so equal tables cost a scan per side.
+
+    Segments are ranges of the first key column when it is an integer, buckets of the key hash otherwise.
+    The columns and key are those of the source table, its primary key without key_columns. The result is
+    the one of row_diff.compare, listing up to max_reported_rows differences of each kind, all with None.
+    """
+    database_name, table_name = source_table.split('.')
+    columns = source.get_table_columns(database_name, table_name)
+    if key_columns is None:
+        try:
+            key_columns = source.get_table_pk_columns(database_name, table_name)
+        except NotImplementedError:
+            key_columns = ()
+    names = {column.name.lower(): column.name for column in columns}
+    key_columns = [names[key.strip().lower()] for key in key_columns if key.strip().lower() in names]
+    column_names = [column.name for column in columns]
+    key_indices = [column_names.index(key) for key in key_columns]
+    result = row_diff.new_result(column_names, key_indices)
+    sides = (Side(source, source_table, columns, key_columns),
+             Side(destination, destination_table, columns, key_columns))
+
+    key_column = key_columns[0] if key_columns else None
+    if key_column is not None and row_diff.base_type(columns[key_indices[0]].type) not in INTEGER_TYPES:
+        key_column = None
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        (source_total, source_range), (destination_total, destination_range) = \
+            [future.result() for future in [executor.submit(side.summary, key_column) for side in sides]]
+        result['source_rows'], result['destination_rows'] = source_total[0], destination_total[0]
+        if source_total == destination_total:
+            logger.info(f"Checksums of {source_table} and {destination_table} match on {source_total[0]} rows")
+            return result
+
+        bounds = [value for value in source_range + destination_range if value is not None]
+        root = KeyRange(key_column, int(min(bounds)), int(max(bounds)) + 1) if key_column and bounds \
+            else HashRange(1, 0)
+        pending = [root] if max(source_total[0], destination_total[0]) > leaf_rows else []
+        leaves = [] if pending else [root]
+        checked = 0
+        window = parallelism * WINDOW_PER_WORKER
+        while pending:
+            level, pending = pending, []
+            for segment, source_checksums, destination_checksums in segment_results(
+                    executor, level, lambda side, segment: sides[side].checksums(segment, segments), window):
+                checked += 1
+                for bucket in sorted(source_checksums.keys() | destination_checksums.keys()):
+                    source_checksum = source_checksums.get(bucket, (0, 0))
+                    destination_checksum = destination_checksums.get(bucket, (0, 0))
+                    if source_checksum == destination_checksum:
+                        continue
+                    child = segment.child(bucket, segments)
+                    if max(source_checksum[0], destination_checksum[0]) <= leaf_rows \
+                            or not child.splittable(segments):
+                        leaves.append(child)
+                    else:
+                        pending.append(child)
+
+        logger.info(f"Checksums of {source_table} and {destination_table} differ, {checked} segments checked, "
+                    f"comparing the rows of {len(leaves)} segments")
+        for _, source_rows, destination_rows in segment_results(
+                executor, leaves, lambda side, leaf: sides[side].rows(leaf, key_indices), window):
+            row_diff.add_differences(result, row_diff.diff_bucket(source_rows, destination_rows), bool(key_indices),
+                                     max_reported_rows)
+    if not (result['added'] or result['removed'] or result['changed']):
+        # the checksums of the tables differ, the segments must have missed the rows that do
+        logger.warning(f"Checksums of {source_table} and {destination_table} differ but no differing segment "
+                       f"row was found, comparing the whole tables row by row")
+        select = ", ".join(sides[0].column(column.name) for column in columns)
+        return row_diff.compare(source, destination, f"select {select} from {source_table}",
+                                f"select {select} from {destination_table}", columns, key_columns,
+                                max_reported_rows=max_reported_rows)
+    logger.info(f"Diffed {source_table} with {destination_table}, added: {result['added']}, "
+                f"removed: {result['removed']}, changed: {result['changed']}")
+    return result
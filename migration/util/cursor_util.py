@@ -0,0 +1,11 @@
+# rows fetched from the server per round trip by iter_sql
+DEFAULT_FETCH_ROWS = 10000
+
+
+def iter_rows(cursor, batch_size=DEFAULT_FETCH_ROWS):
+    """Rows of an executed cursor, fetched batch_size at a time, only one batch is held in memory."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATES = ('FINISHED', 'CANCELLED', 'FAILED')
+MIN_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 30
+# seconds a job may take from being tracked to a final state, whether it is listed or not
+DEFAULT_JOB_TIMEOUT = 24 * 3600
+# status queries of a database failing in a row before its pending jobs are failed
+MAX_QUERY_ERRORS = 10
+
+
+class JobTracker:
+    """
+    Tracks asynchronous Doris jobs (EXPORT, LOAD) for all tasks sharing a connector. A single
+    background thread runs one status query per database for all pending labels, backs off
+    exponentially while nothing changes and resolves the future of a job once it reaches a final state.
+
+    show_jobs_sql is formatted with the database name and must return rows with the label at
+    index 1 and the state at index 2, as SHOW EXPORT and SHOW LOAD do.
+
+    A job not final timeout seconds after it was tracked, e.g. a label that never shows up, fails with a
+    TimeoutError, and the jobs of a database fail with the error of its status query once max_query_errors
+    queries in a row failed, so no future is left pending forever.
+    """
+
+    def __init__(self, name, show_jobs_sql, execute_sql, min_interval=MIN_POLL_INTERVAL,
+                 max_interval=MAX_POLL_INTERVAL, timeout=DEFAULT_JOB_TIMEOUT, max_query_errors=MAX_QUERY_ERRORS):
+        self.name = name
+        self.show_jobs_sql = show_jobs_sql
+        self.execute_sql = execute_sql
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.timeout = timeout
+        self.max_query_errors = max_query_errors
+        self.condition = threading.Condition()
+        # database -> label -> future resolved with the final status row of the job
+        self.pending_jobs = {}
+        # (database, label) -> monotonic time the job was tracked at
+        self.tracked_at = {}
+        # database -> status queries failed in a row
+        self.query_errors = {}
+        self.thread = None
+
+    def track(self, database, label) -> Future:
+        future = Future()
+        with self.condition:
+            self.pending_jobs.setdefault(database, {})[label] = future
+            self.tracked_at[(database, label)] = time.monotonic()
+            self.interval = self.min_interval
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.poll, name=f"{self.name}-tracker", daemon=True)
+                self.thread.start()
+            else:
+                # wake the poller from its backoff so the new job is polled right away
+                self.condition.notify_all()
+        return future
+
+    def poll(self):
+        while True:
+            with self.condition:
+                if not self.pending_jobs:
+                    self.thread = None
+                    return
+                pending_jobs = {database: dict(jobs) for database, jobs in self.pending_jobs.items()}
+            finished = 0
+            for database, jobs in pending_jobs.items():
+                finished += self.poll_database(database, jobs)
+            finished += self.expire_jobs()
+            with self.condition:
+                if finished:
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval * 2, self.max_interval)
+                interval = self.interval
+                logger.debug(f"{self.name} tracker is waiting for {self.pending_count()} jobs, "
+                             f"next poll in {interval}s")
+                self.condition.wait(timeout=interval)
+
+    def poll_database(self, database, jobs):
+        try:
+            rows = self.execute_sql(self.show_jobs_sql.format(database=database))
+        except Exception as e:
+            errors = self.query_errors.get(database, 0) + 1
+            logger.warning(f"{self.name} tracker failed to get job states of database {database} "
+                           f"{errors} times in a row, error: {e}")
+            if errors < self.max_query_errors:
+                self.query_errors[database] = errors
+                return 0
+            self.query_errors.pop(database, None)
+            for label, future in jobs.items():
+                self.resolve(database, label, future, error=e)
+            return len(jobs)
+        self.query_errors.pop(database, None)
+        states = {row[1]: row for row in rows}
+        finished = 0
+        for label, future in jobs.items():
+            row = states.get(label)
+            if row is None or row[2] not in FINAL_STATES:
+                continue
+            self.resolve(database, label, future, row)
+            finished += 1
+        return finished
+
+    def expire_jobs(self):
+        """Fail the jobs tracked longer than the timeout ago."""
+        now = time.monotonic()
+        with self.condition:
+            expired = [(database, label, future) for database, jobs in self.pending_jobs.items()
+                       for label, future in jobs.items() if now - self.tracked_at[(database, label)] > self.timeout]
+        for database, label, future in expired:
+            self.resolve(database, label, future, error=TimeoutError(
+                f"{self.name} job {label} of database {database} is not done after {self.timeout}s"))
+        return len(expired)
+
+    def resolve(self, database, label, future, row=None, error=None):
+        with self.condition:
+            if self.pending_jobs.get(database, {}).pop(label, None) is None:
+                return
+            if not self.pending_jobs[database]:
+                del self.pending_jobs[database]
+            del self.tracked_at[(database, label)]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(row)
+
+    def pending_count(self):
+        return sum(len(jobs) for jobs in self.pending_jobs.values())
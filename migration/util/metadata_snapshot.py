@@ -0,0 +1,172 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+from migration.base.exceptions import ProfileConfigError
+from migration.connector.source.base import Source
+from migration.connector.source.enum import Column, ClusterInfo
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PARALLELISM = 8
+
+
+def safe_get(getter, database_name, table_name, failed: list):
+    """Value of a metadata getter, None with the getter added to failed when the lookup fails."""
+    try:
+        return getter(database_name, table_name)
+    except Exception as e:
+        logger.debug(f"{getter.__name__} of {database_name}.{table_name} is not available, error: {e}")
+        failed.append(getter.__name__)
+        return None
+
+
+def ddl_hash(ddl):
+    return hashlib.sha1(ddl.encode('utf-8')).hexdigest() if ddl else None
+
+
+def table_snapshot(source: Source, database_name, table_name, stats):
+    """
+    Metadata of a table. The getters that failed are listed in failed, their values are not real metadata
+    and are not applied from the snapshot.
+    """
+    failed = []
+    columns = safe_get(source.get_table_columns, database_name, table_name, failed) or []
+    cluster_info = safe_get(source.get_table_cluster_info, database_name, table_name, failed)
+    pk_columns = safe_get(source.get_table_pk_columns, database_name, table_name, failed)
+    ddl = safe_get(source.get_ddl_sql, database_name, table_name, failed)
+    row_count, modified_time = stats.get(table_name, (None, None))
+    return {
+        'columns': [[column.name, column.type, column.is_null, column.default_value] for column in columns],
+        'primary_key': safe_get(source.get_primary_key, database_name, table_name, failed),
+        'pk_columns': list(pk_columns) if pk_columns is not None else None,
+        'partition_columns': safe_get(source.get_table_partition_columns, database_name, table_name, failed),
+        'cluster_info': [cluster_info.bucket_num, cluster_info.cluster_keys] if cluster_info else None,
+        'size': safe_get(source.get_table_size, database_name, table_name, failed),
+        'row_count': row_count,
+        'modified_time': modified_time,
+        'ddl_hash': ddl_hash(ddl),
+        'failed': failed,
+    }
+
+
+def has_modified_time(table: dict, modified_time):
+    return table['modified_time'] is not None and modified_time is not None
+
+
+def is_fresh(table: dict, modified_time, current_ddl_hash=None):
+    """
+    Whether the snapshot of a table still holds. The modification time is trusted when both sides have one,
+    only without it the DDL tells, so it is fetched for those tables alone.
+    """
+    if has_modified_time(table, modified_time):
+        return table['modified_time'] == modified_time
+    return table['ddl_hash'] is not None and table['ddl_hash'] == current_ddl_hash
+
+
+def current_ddl_hash(source: Source, database_name, table_name):
+    return ddl_hash(safe_get(source.get_ddl_sql, database_name, table_name, []))
+
+
+def write_snapshot(source: Source, tables: list[str], out_path: str):
+    """Write a versioned, gzip compressed JSON snapshot of the metadata of the given tables."""
+    databases = {}
+    for table in tables:
+        database_name, table_name = table.split('.')
+        databases.setdefault(database_name, []).append(table_name)
+    snapshot_tables = {}
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_PARALLELISM) as executor:
+        for database_name, table_names in databases.items():
+            try:
+                source.load_database_metadata(database_name)
+                stats = source.get_table_stats(database_name)
+            except Exception as e:
+                logger.warning(f"Failed to load metadata of database {database_name} in bulk, error: {e}")
+                stats = {}
+            snapshots = executor.map(table_snapshot, repeat(source), repeat(database_name), table_names, repeat(stats))
+            for table_name, snapshot in zip(table_names, snapshots):
+                snapshot_tables[f"{database_name}.{table_name}"] = snapshot
+    if os.path.exists(out_path):
+        try:
+            previous_tables = load_snapshot(out_path)['tables']
+            changed = [table for table, snapshot in snapshot_tables.items()
+                       if table in previous_tables and previous_tables[table]['ddl_hash'] != snapshot['ddl_hash']]
+            logger.info(f"{len(changed)} tables changed their DDL since the previous snapshot: {changed}")
+        except Exception as e:
+            logger.warning(f"Failed to compare with the previous snapshot {out_path}, error: {e}")
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'source': source.name,
+        'created_at': datetime.now().isoformat(),
+        'databases': databases,
+        'tables': snapshot_tables,
+    }
+    with gzip.open(out_path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'), default=str)
+    logger.info(f"Wrote metadata snapshot of {len(snapshot_tables)} tables to {out_path}")
+
+
+def load_snapshot(path: str):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ProfileConfigError(f"Metadata snapshot {path} has version {snapshot.get('version')}, "
+                                 f"expected {SNAPSHOT_VERSION}, please regenerate it with `meta --snapshot`")
+    return snapshot
+
+
+def apply_snapshot(source: Source, snapshot: dict):
+    """
+    Seed the metadata cache of the source from a snapshot. Tables that changed since the snapshot was taken,
+    or that are gone, are left out and queried from the source again, as is the metadata that failed to load.
+    """
+    cache = source.metadata_cache
+    applied = 0
+    stale = []
+    with ThreadPoolExecutor(max_workers=SNAPSHOT_PARALLELISM) as executor:
+        for database_name, table_names in snapshot['databases'].items():
+            try:
+                stats = source.get_table_stats(database_name)
+            except Exception as e:
+                logger.warning(f"Failed to check modification times of database {database_name}, error: {e}")
+                stats = {}
+            if not set(stats) - set(table_names):
+                cache.put(('get_table_names', database_name), list(table_names))
+            present = [table_name for table_name in table_names if not stats or table_name in stats]
+            stale.extend(f"{database_name}.{table_name}" for table_name in table_names if table_name not in present)
+            modified_times = {table_name: stats.get(table_name, (None, None))[1] for table_name in present}
+            unknown = [table_name for table_name in present if not has_modified_time(
+                snapshot['tables'][f"{database_name}.{table_name}"], modified_times[table_name])]
+            ddl_hashes = dict(zip(unknown, executor.map(current_ddl_hash, repeat(source), repeat(database_name),
+                                                        unknown)))
+            for table_name in present:
+                table = snapshot['tables'][f"{database_name}.{table_name}"]
+                if not is_fresh(table, modified_times[table_name], ddl_hashes.get(table_name)):
+                    stale.append(f"{database_name}.{table_name}")
+                    continue
+                failed = set(table['failed'])
+                key = (database_name, table_name)
+                if 'get_table_columns' not in failed:
+                    cache.put(('get_table_columns',) + key,
+                              [Column(name, column_type, is_null, default_value)
+                               for name, column_type, is_null, default_value in table['columns']])
+                if 'get_primary_key' not in failed:
+                    cache.put(('get_primary_key',) + key, table['primary_key'])
+                if 'get_table_pk_columns' not in failed and table['pk_columns'] is not None:
+                    cache.put(('get_table_pk_columns',) + key, tuple(table['pk_columns']))
+                if 'get_table_partition_columns' not in failed:
+                    cache.put(('get_table_partition_columns',) + key, table['partition_columns'])
+                if 'get_table_cluster_info' not in failed:
+                    cache.put(('get_table_cluster_info',) + key,
+                              ClusterInfo(*table['cluster_info']) if table['cluster_info'] else None)
+                if 'get_table_size' not in failed and table['size'] is not None:
+                    cache.put(('get_table_size',) + key, table['size'])
+                applied += 1
+    logger.info(f"Applied metadata snapshot of {applied} tables, {len(stale)} tables changed since: {stale}")
+    return applied
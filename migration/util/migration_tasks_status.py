@@ -1,15 +1,43 @@
+import atexit
 import logging
+import threading
 
 import pandas
 
+from migration.base.exceptions import ProfileConfigError
 from migration.connector.destination.base import Destination
 from migration.scheduler.task.base_task import Task
-from migration.base.status import Status
+from migration.base.status import Status, TaskStatus, TaskType
+from migration.util import checkpoint
+from migration.util.checkpoint import ResumeState
 
 STATUS_SCHEMA = "cz_migration"
 logger = logging.getLogger(__name__)
 PK_TABLE_DML_HINT = {'hints': {'cz.sql.allow.insert.table.with.pk': 'true'}}
-INCREMENTAL_INDEX = 0
+
+
+class IdAllocator:
+    """Hands out unique status ids across threads, reserve() takes a whole block of ids at once."""
+
+    def __init__(self, start=0):
+        self.lock = threading.Lock()
+        self.next_id = start
+
+    def reserve(self, count) -> range:
+        with self.lock:
+            ids = range(self.next_id, self.next_id + count)
+            self.next_id += count
+        return ids
+
+    def allocate(self):
+        return self.reserve(1)[0]
+
+    def advance(self, next_id):
+        with self.lock:
+            self.next_id = max(self.next_id, next_id)
+
+
+STATUS_ID_ALLOCATOR = IdAllocator()
 
 
 def init_status_table(destination: Destination, project_name: str):
@@ -80,38 +108,159 @@ def init_status_table(destination: Destination, project_name: str):
         return f"{project_name}_{table_index}"
 
 
-def update_task_status(destination: Destination, task: Task):
+STATUS_COLUMNS = "id, task_id, task_name, prject_id, task_status, task_type, task_start_time, task_end_time"
+STATUS_FLUSH_INTERVAL = 5
+STATUS_FLUSH_ROWS = 500
+
+
+class StatusSink:
+    """
+    Buffers task status rows of a destination and writes them in batches from a background thread,
+    every flush_interval seconds or as soon as flush_rows rows are pending. Only the latest state of a
+    task is kept, so its init and following transitions usually end up as a single row.
+    """
+
+    def __init__(self, destination: Destination, flush_interval=STATUS_FLUSH_INTERVAL, flush_rows=STATUS_FLUSH_ROWS):
+        self.destination = destination
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        # (project_id, status_id) -> (task, status_value, end_time)
+        self.pending = {}
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=f"status-sink-{destination.name}", daemon=True)
+        self.thread.start()
+
+    def put(self, task: Task):
+        with self.condition:
+            self.pending[(task.project_id, task.status_id)] = (task, task.status.value, task.end_time)
+            if len(self.pending) >= self.flush_rows:
+                self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closed or len(self.pending) >= self.flush_rows,
+                                        timeout=self.flush_interval)
+                closed = self.closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        with self.flush_lock:
+            with self.condition:
+                pending, self.pending = self.pending, {}
+            if not pending:
+                return
+            projects = {}
+            for (project_id, _), row in pending.items():
+                projects.setdefault(project_id, []).append(row)
+            for project_id, rows in projects.items():
+                for i in range(0, len(rows), self.flush_rows):
+                    batch = rows[i:i + self.flush_rows]
+                    try:
+                        write_status_rows(self.destination, project_id, batch)
+                    except BaseException as e:
+                        logger.error(f"Failed to write {len(batch)} task status rows of {project_id}, error: {e}")
+                        self.requeue(batch)
+            logger.info(f"Flushed {len(pending)} task status rows")
+
+    def requeue(self, rows):
+        with self.condition:
+            for row in rows:
+                task = row[0]
+                self.pending.setdefault((task.project_id, task.status_id), row)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.flush()
+
+
+STATUS_SINKS = {}
+STATUS_SINKS_LOCK = threading.Lock()
+
+
+def get_status_sink(destination: Destination) -> StatusSink:
+    with STATUS_SINKS_LOCK:
+        if destination not in STATUS_SINKS:
+            STATUS_SINKS[destination] = StatusSink(destination)
+        return STATUS_SINKS[destination]
+
+
+def flush_task_status(destination: Destination):
+    with STATUS_SINKS_LOCK:
+        sink = STATUS_SINKS.get(destination)
+    if sink is not None:
+        sink.flush()
+
+
+@atexit.register
+def close_status_sinks():
+    with STATUS_SINKS_LOCK:
+        sinks = list(STATUS_SINKS.values())
+        STATUS_SINKS.clear()
+    for sink in sinks:
+        sink.close()
+
+
+def format_status_row(destination: Destination, row):
+    task, status_value, end_time = row
+    time_type = "timestamp" if destination.name.lower() == "clickzetta" else "datetime"
+    end_time_value = f"cast('{end_time}' as {time_type})" if end_time else "null"
+    return f"({task.status_id}, '{task.id}', '{task.qualified_name}', '{task.project_id}', '{status_value}', " \
+           f"'{task.task_type.value}', cast('{task.start_time}' as {time_type}), {end_time_value})"
+
+
+def write_status_rows(destination: Destination, project_id: str, rows):
+    values = ",\n".join(format_status_row(destination, row) for row in rows)
     if destination.name.lower() == "clickzetta":
-        destination.execute_sql(
-            f"UPDATE {STATUS_SCHEMA}.{task.project_id} SET task_status = '{task.status.value}', task_end_time = cast('{task.end_time}' as timestamp) WHERE id = '{task.status_id}'",
-            PK_TABLE_DML_HINT)
+        destination.execute_sql(f"""
+        MERGE INTO {STATUS_SCHEMA}.{project_id} AS t
+        USING (SELECT * FROM VALUES {values} AS v({STATUS_COLUMNS})) AS s
+        ON t.id = s.id
+        WHEN MATCHED THEN UPDATE SET task_status = s.task_status, task_end_time = s.task_end_time
+        WHEN NOT MATCHED THEN INSERT ({STATUS_COLUMNS}) VALUES (s.id, s.task_id, s.task_name, s.prject_id,
+            s.task_status, s.task_type, s.task_start_time, s.task_end_time)
+        """, PK_TABLE_DML_HINT)
     elif destination.name.lower() == "doris":
-        destination.execute_sql(
-            f"UPDATE {STATUS_SCHEMA}.{task.project_id} SET task_status = '{task.status.value}', task_end_time = cast('{task.end_time}' as datetime) WHERE id = '{task.status_id}'")
+        # the status table has a UNIQUE KEY on id, so a newer row replaces the previous one
+        destination.execute_sql(f"INSERT INTO {STATUS_SCHEMA}.{project_id} ({STATUS_COLUMNS}) VALUES {values}")
+
+
+def update_task_status(destination: Destination, task: Task):
+    get_status_sink(destination).put(task)
+    task_checkpoint = checkpoint.get_checkpoint(task.project_id)
+    if task_checkpoint is not None:
+        task_checkpoint.record_task(task)
     logger.info(f"Updated task {task.id} status to {task.status.value}")
 
 
 def init_task_status(destination: Destination, task: Task):
-    sql = None
-    global INCREMENTAL_INDEX
-    if destination.name.lower() == "clickzetta":
-        sql = f"""
-        INSERT INTO {STATUS_SCHEMA}.{task.project_id} (id, task_id, task_name, prject_id, task_status, task_type, task_start_time, task_end_time) 
-        values ({INCREMENTAL_INDEX},'{task.id}', '{task.name}','{task.project_id}','{task.status.value}', '{task.task_type.value}', cast('{task.start_time}' as timestamp), null)
-        """
-        destination.execute_sql(sql, PK_TABLE_DML_HINT)
-    elif destination.name.lower() == "doris":
-        sql = f"""
-        INSERT INTO {STATUS_SCHEMA}.{task.project_id} (id, task_id, task_name, prject_id, task_status, task_type, task_start_time, task_end_time) 
-        values ('{INCREMENTAL_INDEX}','{task.id}', '{task.name}','{task.project_id}','{task.status.value}', '{task.task_type.value}', cast('{task.start_time}' as datetime), null)
-        """
-        destination.execute_sql(sql)
-    task.status_id = INCREMENTAL_INDEX
-    INCREMENTAL_INDEX += 1
+    task.status_id = STATUS_ID_ALLOCATOR.allocate()
+    get_status_sink(destination).put(task)
     logger.info(f"Inited task {task.id} status")
 
 
-def get_last_migration_report(dest: Destination, project_name: str):
+def init_tasks_status(destination: Destination, tasks: list[Task]):
+    sink = get_status_sink(destination)
+    for status_id, task in zip(STATUS_ID_ALLOCATOR.reserve(len(tasks)), tasks):
+        task.status_id = status_id
+        sink.put(task)
+    logger.info(f"Inited {len(tasks)} tasks status")
+
+
+def record_loaded_partition(task: Task, partition: str):
+    task_checkpoint = checkpoint.get_checkpoint(task.project_id)
+    if task_checkpoint is not None:
+        task_checkpoint.record_partition(task, partition)
+
+
+def get_last_status_table(dest: Destination, project_name: str):
     tables_in_schema = dest.execute_sql(
         f"show tables in  {STATUS_SCHEMA} where table_name like '{project_name}_%'")
     if dest.name.lower() == "clickzetta":
@@ -126,8 +275,40 @@ def get_last_migration_report(dest: Destination, project_name: str):
             exist_status_tables_index.append(int(table.split("_")[-1]))
         except ValueError:
             raise ValueError(f"Table name {table} is not valid")
+    if not exist_status_tables_index:
+        return None
     exist_status_tables_index.sort()
-    result = dest.execute_sql(f"select * from {STATUS_SCHEMA}.{project_name}_{exist_status_tables_index[-1]}")
+    return f"{project_name}_{exist_status_tables_index[-1]}"
+
+
+def get_resume_state(dest: Destination, project_name: str) -> ResumeState:
+    """
+    Read the status table of the latest run of the project, falling back to the latest local checkpoint
+    when there is none, and merge in the partitions the checkpoint recorded as loaded.
+    """
+    project_id = get_last_status_table(dest, project_name)
+    rows = []
+    if project_id is not None:
+        rows = dest.execute_sql(f"select id, task_name, task_status, task_type from {STATUS_SCHEMA}.{project_id}")
+    else:
+        project_id = checkpoint.find_last_checkpoint(project_name)
+        if project_id is None:
+            raise ProfileConfigError(f"No status table or checkpoint of project {project_name} to resume from")
+    state = ResumeState(project_id)
+    for status_id, task_name, task_status, task_type in rows:
+        state.add_task_status(task_name, TaskType(task_type), TaskStatus(task_status), status_id)
+    state.add_checkpoint(checkpoint.open_checkpoint(project_id).read())
+    completed = sum(1 for status in state.task_status.values() if status == TaskStatus.COMPLETED)
+    logger.info(f"Resuming {project_id}: {completed} of {len(state.task_status)} tasks completed, "
+                f"{sum(len(partitions) for partitions in state.loaded_partitions.values())} partitions loaded")
+    return state
+
+
+def get_last_migration_report(dest: Destination, project_name: str):
+    status_table = get_last_status_table(dest, project_name)
+    if status_table is None:
+        raise ProfileConfigError(f"No status table of project {project_name}")
+    result = dest.execute_sql(f"select * from {STATUS_SCHEMA}.{status_table}")
     import openpyxl
     wb = openpyxl.Workbook(iso_dates=True)
     ws = wb.active
@@ -146,22 +327,10 @@ def get_last_migration_report(dest: Destination, project_name: str):
 
 
 def get_last_migration_status(dest: Destination, project_name: str):
-    tables_in_schema = dest.execute_sql(
-        f"show tables in  {STATUS_SCHEMA} where table_name like '{project_name}_%'")
-    if dest.name.lower() == "clickzetta":
-        exist_status_tables = [x[1] for x in tables_in_schema]
-    elif dest.name.lower() == "doris":
-        exist_status_tables = [x[0] for x in tables_in_schema]
-    else:
-        exist_status_tables = [x[0] for x in tables_in_schema]
-    exist_status_tables_index = []
-    for table in exist_status_tables:
-        try:
-            exist_status_tables_index.append(int(table.split("_")[-1]))
-        except ValueError:
-            raise ValueError(f"Table name {table} is not valid")
-    exist_status_tables_index.sort()
-    result = dest.execute_sql(f"select * from {STATUS_SCHEMA}.{project_name}_{exist_status_tables_index[-1]}")
+    status_table = get_last_status_table(dest, project_name)
+    if status_table is None:
+        raise ProfileConfigError(f"No status table of project {project_name}")
+    result = dest.execute_sql(f"select * from {STATUS_SCHEMA}.{status_table}")
     pandas_dict = {'id': [], 'task_id': [], 'task_name': [], 'prject_id': [], 'task_status': [], 'task_type': [],
                    'task_start_time': [], 'task_end_time': []}
     for row in result:
@@ -0,0 +1,145 @@
+import logging
+import math
+import numbers
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import numpy
+
+from migration.connector.source.chunked_export import chunk_ranges, pk_boundaries
+from migration.util import arrow_util, validation_executor
+
+logger = logging.getLogger(__name__)
+
+# ranges fetched ahead at once on each side
+DEFAULT_SCAN_WINDOW = 4
+# ids per range when only ids are compared, rows per range when whole rows are
+RANGE_IDS = 50000
+RANGE_ROWS = 10000
+MAX_SCAN_RANGES = 100000
+# sampled ids per range boundary, where the source can sample its primary key
+SAMPLES_PER_RANGE = 10
+# a table followed by a filter, whatever the case of the keyword and however the table is named
+WHERE_CLAUSE = re.compile(r'\swhere\s', re.IGNORECASE)
+
+
+def split_ids(min_id, max_id, ranges, samples=None):
+    """
+    (lower, upper) ranges of integer ids covering every id, lower inclusive and upper exclusive, None for
+    unbounded. Boundaries are the quantiles of sampled ids when given, evenly spaced from min_id to max_id else.
+    """
+    if min_id is None or max_id is None or ranges <= 1 or min_id == max_id:
+        return chunk_ranges([])
+    if samples:
+        return chunk_ranges(pk_boundaries(samples, min_id, max_id, ranges))
+    min_id, max_id = int(min_id), int(max_id)
+    step = max(1, math.ceil((max_id - min_id) / ranges))
+    return chunk_ranges(list(range(min_id + step, max_id + 1, step)))
+
+
+def range_query(select: str, table: str, pk_id: str, lower, upper, order=False):
+    """Query of the rows of a range of table, which may be a table name followed by a where clause."""
+    conditions = []
+    if lower is not None:
+        conditions.append(f"{pk_id} >= {lower}")
+    if upper is not None:
+        conditions.append(f"{pk_id} < {upper}")
+    sql = f"select {select} from {table}"
+    if conditions:
+        sql += (" and " if WHERE_CLAUSE.search(table) else " where ") + " and ".join(conditions)
+    if order:
+        sql += f" order by {pk_id}"
+    return sql
+
+
+def plan_ranges(source, destination, source_table: str, destination_table: str, pk_id: str, range_rows=RANGE_IDS):
+    """
+    Ranges of about range_rows ids each to scan two tables in, and the row count of each side. Boundaries
+    are placed by sampling the source key where the source can sample it, evenly between min and max else.
+    """
+    source_stats, destination_stats = validation_executor.execute_paired(
+        source, destination, f"select min({pk_id}), max({pk_id}), count(*) from {source_table}",
+        f"select min({pk_id}), max({pk_id}), count(*) from {destination_table}")
+    source_min, source_max, source_count = source_stats[0]
+    destination_min, destination_max, destination_count = destination_stats[0]
+    ids = [value for value in (source_min, source_max, destination_min, destination_max) if value is not None]
+    min_id, max_id = (min(ids), max(ids)) if ids else (None, None)
+    ranges = max(1, min(MAX_SCAN_RANGES, math.ceil(max(source_count, destination_count) / range_rows)))
+    if not isinstance(min_id, numbers.Number):
+        # other keys order by collation in the databases, ranges split in Python could overlap or leave gaps
+        ranges = 1
+    samples = None
+    # a table followed by a filter is scanned in even ranges
+    if ranges > 1 and ' ' not in source_table.strip():
+        database_name, table_name = source_table.split('.')
+        try:
+            samples = source.sample_pk_values(database_name, table_name, pk_id, ranges * SAMPLES_PER_RANGE)
+        except NotImplementedError:
+            pass
+    key_ranges = split_ids(min_id, max_id, ranges, samples)
+    logger.info(f"{source_table}-min_id: {min_id}, max_id: {max_id}, scan {len(key_ranges)} ranges of "
+                f"{source_count} source rows and {destination_count} destination rows")
+    return key_ranges, source_count, destination_count
+
+
+def fetch_ids(connector, table: str, pk_id: str, lower, upper):
+    """Sorted ids of a range as a NumPy array."""
+    ids = arrow_util.read_table(connector.iter_arrow(range_query(pk_id, table, pk_id, lower, upper)))
+    if ids.num_columns == 0:
+        return numpy.array([], dtype=numpy.int64)
+    return numpy.sort(ids.column(0).to_numpy())
+
+
+def diff_ids(source_ids, destination_ids):
+    """(only in source, only in destination) ids of two id arrays, sorted and without duplicates."""
+    return numpy.setdiff1d(source_ids, destination_ids), numpy.setdiff1d(destination_ids, source_ids)
+
+
+def scan_ranges(ranges, fetch_source, fetch_destination, window=DEFAULT_SCAN_WINDOW):
+    """
+    Yield (lower, upper, source result, destination result) of every range in order. Both sides of up to
+    window ranges are fetched at once, by fetch_source(lower, upper) and fetch_destination(lower, upper).
+    """
+    window = max(1, int(window))
+    with ThreadPoolExecutor(max_workers=2 * window, thread_name_prefix='pk_range_scan') as executor:
+        pending = deque()
+        try:
+            for lower, upper in ranges:
+                pending.append((lower, upper, executor.submit(fetch_source, lower, upper),
+                                executor.submit(fetch_destination, lower, upper)))
+                if len(pending) >= window:
+                    lower, upper, source_future, destination_future = pending.popleft()
+                    yield lower, upper, source_future.result(), destination_future.result()
+            while pending:
+                lower, upper, source_future, destination_future = pending.popleft()
+                yield lower, upper, source_future.result(), destination_future.result()
+        finally:
+            for _, _, source_future, destination_future in pending:
+                source_future.cancel()
+                destination_future.cancel()
+
+
+def diff_pk_ids(source, destination, source_table: str, destination_table: str, pk_id: str,
+                window=DEFAULT_SCAN_WINDOW):
+    """
+    Ids only in the source and only in the destination table, each table may be followed by a where clause.
+    The ids are compared range by range, window ranges of both sides fetched at once.
+    """
+    ranges, _, _ = plan_ranges(source, destination, source_table, destination_table, pk_id)
+    only_in_source_list = []
+    only_in_dest_list = []
+    for lower, upper, ids_source, ids_dest in scan_ranges(
+            ranges, partial(fetch_ids, source, source_table, pk_id),
+            partial(fetch_ids, destination, destination_table, pk_id), window):
+        only_in_source_ids, only_in_dest_ids = diff_ids(ids_source, ids_dest)
+        only_in_source_list.extend(only_in_source_ids.tolist())
+        only_in_dest_list.extend(only_in_dest_ids.tolist())
+        logger.debug(f'{source_table}-range [{lower}, {upper}) only_in_source count={len(only_in_source_list)}, '
+                     f'only_in_dest count={len(only_in_dest_list)} at {datetime.now()}')
+    logger.info(f'{source_table}-only_in_source count={len(only_in_source_list)}, '
+                f'{destination_table}-only_in_dest count={len(only_in_dest_list)} at {datetime.now()}')
+    return {'only_in_source': len(only_in_source_list), 'only_in_source_list': only_in_source_list,
+            'only_in_dest': len(only_in_dest_list), 'only_in_dest_list': only_in_dest_list}
@@ -0,0 +1,88 @@
+import logging
+from decimal import Decimal
+
+from migration.connector.source.enum import Column
+
+logger = logging.getLogger(__name__)
+
+STDDEV_SAMP_DBS = ['clickzetta', 'doris', 'mysql', 'postgresql', 'odps']
+# approximate distinct count aggregates (HyperLogLog), dialects without one count exactly
+APPROX_COUNT_DISTINCT = {'clickzetta': 'approx_count_distinct', 'doris': 'ndv', 'odps': 'approx_distinct'}
+# digits of the proportions, as MySQL divides
+PROPORTION_SCALE = 4
+# relative difference of approximate distinct counts still taken as equal, the estimators of two engines differ
+APPROX_DISTINCT_TOLERANCE = 0.05
+DISTINCT_PROPORTION_INDEX = 4
+DISTINCT_COUNT_INDEX = 5
+
+
+def profile_query(connector, table: str, columns: list[Column], numeric: list[bool], approximate_distinct=False):
+    """One select of the statistics of every column, so the table is scanned once however wide it is."""
+    quote = connector.quote_character()
+    dialect = connector.name.lower()
+    count_distinct = APPROX_COUNT_DISTINCT.get(dialect) if approximate_distinct else None
+    stddev_samp = 'stddev_samp' if dialect in STDDEV_SAMP_DBS else 'stddev_sample'
+    select = ["count(*)"]
+    for column, is_numeric in zip(columns, numeric):
+        name = f"{quote}{column.name}{quote}"
+        select.append(f"count({name})")
+        select.append(f"{count_distinct}({name})" if count_distinct else f"count(distinct {name})")
+        if is_numeric:
+            select.extend([f"min({name})", f"max({name})", f"avg({name})", f"stddev_pop({name})",
+                           f"{stddev_samp}({name})"])
+    return f"select {', '.join(select)} from {table}"
+
+
+def min_max_avg_query(connector, table: str, columns: list[Column]):
+    """One select of the row count and the min, max and avg of every column, in this order."""
+    quote = connector.quote_character()
+    select = ["count(*)"]
+    for column in columns:
+        name = f"{quote}{column.name}{quote}"
+        select.extend([f"min({name})", f"max({name})", f"avg({name})"])
+    return f"select {', '.join(select)} from {table}"
+
+
+def proportion(count, row_count):
+    if not row_count or count is None:
+        return None
+    return round(Decimal(count) / Decimal(row_count), PROPORTION_SCALE)
+
+
+def profile_rows(connector, table: str, columns: list[Column], numeric: list[bool], approximate_distinct=False):
+    """
+    Statistics of every column of a table, a row per column of column_name, column_type, row_count,
+    not_null_proportion, distinct_proportion, distinct_count, is_unique, min_value, max_value, avg_value,
+    stddev_pop_value and stddev_sample_value. The statistics of numeric columns only are null for the others.
+    With approximate_distinct the distinct counts are estimated where the dialect has an estimator, is_unique
+    is null then on every dialect, as an estimate can not tell and both sides of a comparison must agree.
+    """
+    row = connector.execute_sql(profile_query(connector, table, columns, numeric, approximate_distinct))[0]
+    row_count = row[0]
+    position = 1
+    profiles = []
+    for column, is_numeric in zip(columns, numeric):
+        not_null_count, distinct_count = row[position], row[position + 1]
+        position += 2
+        statistics = [None] * 5
+        if is_numeric:
+            statistics = list(row[position:position + 5])
+            position += 5
+        profiles.append([column.name, column.type, row_count, proportion(not_null_count, row_count),
+                         proportion(distinct_count, row_count), distinct_count,
+                         None if approximate_distinct else int(distinct_count == row_count), *statistics])
+    return profiles
+
+
+def align_approximate_distinct(source_profiles, destination_profiles):
+    """
+    Take the distinct counts and proportions of the destination for the source where the counts are within
+    APPROX_DISTINCT_TOLERANCE of each other, so the estimates of two engines compare equal.
+    """
+    for source_row, destination_row in zip(source_profiles, destination_profiles):
+        source_count, destination_count = source_row[DISTINCT_COUNT_INDEX], destination_row[DISTINCT_COUNT_INDEX]
+        if source_count is None or destination_count is None:
+            continue
+        if abs(source_count - destination_count) <= APPROX_DISTINCT_TOLERANCE * max(source_count, destination_count):
+            source_row[DISTINCT_PROPORTION_INDEX] = destination_row[DISTINCT_PROPORTION_INDEX]
+            source_row[DISTINCT_COUNT_INDEX] = destination_count
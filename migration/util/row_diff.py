@@ -0,0 +1,290 @@
+import logging
+import math
+import os
+import re
+import tempfile
+
+import numpy
+import pandas
+import pyarrow
+import pyarrow.compute as pc
+import pyarrow.ipc
+
+from migration.connector.destination.base import Destination
+from migration.connector.source import Source
+from migration.util import arrow_util, validation_executor
+from migration.util.size_util import parse_size
+
+logger = logging.getLogger(__name__)
+
+KEY = '__key'
+ROW = '__row'
+# joins the values of a row, nulls are written as NULL_VALUE so they differ from empty strings
+SEPARATOR = '\x1f'
+NULL_VALUE = '\x00'
+# rows of one side held in memory at a time are about a bucket
+DEFAULT_BUCKET_SIZE = "64MB"
+DEFAULT_BUCKETS = 64
+# a file is open per bucket while a side is written, buckets still over the bucket size are split again
+MAX_BUCKETS = 256
+# times a bucket is split, rows of a single key can not be split
+MAX_SPLIT_DEPTH = 3
+# differences listed in the report, all of them are counted
+MAX_REPORTED_ROWS = 100
+
+NUMBER_TYPES = {'TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'INTEGER', 'BIGINT', 'DECIMAL', 'NUMERIC', 'FLOAT',
+                'DOUBLE', 'REAL'}
+DATETIME_TYPES = {'DATETIME', 'TIMESTAMP'}
+
+
+def base_type(column_type):
+    return re.split(r'[\s(]', column_type.upper(), 1)[0]
+
+
+def hash_key(depth):
+    """Key of the hash of a split depth, each split spreads the keys of a bucket by another hash."""
+    return f"row_diff_{depth:07d}"
+
+
+class BucketFiles:
+    """Rows of one side of a comparison, hash partitioned by key into an Arrow IPC file per bucket."""
+
+    def __init__(self, directory, side, buckets, depth=0):
+        self.directory = directory
+        self.side = side
+        self.buckets = buckets
+        self.depth = depth
+        self.schema = pyarrow.schema([(KEY, pyarrow.string()), (ROW, pyarrow.string())])
+        self.writers = {}
+        self.rows = 0
+
+    def path(self, bucket):
+        return os.path.join(self.directory, f"{self.side}_{bucket:05d}.arrow")
+
+    def write(self, keys, rows):
+        # pandas hashes the keys in C with a fixed seed, the same key lands in the same bucket on both sides
+        bucket_ids = pandas.util.hash_array(keys.to_numpy(zero_copy_only=False),
+                                            hash_key=hash_key(self.depth)) % self.buckets
+        order = numpy.argsort(bucket_ids, kind='stable')
+        counts = numpy.bincount(bucket_ids, minlength=self.buckets)
+        table = pyarrow.table([keys, rows], schema=self.schema).take(order)
+        offset = 0
+        for bucket in numpy.nonzero(counts)[0]:
+            if bucket not in self.writers:
+                self.writers[bucket] = pyarrow.ipc.new_stream(self.path(bucket), self.schema)
+            self.writers[bucket].write_table(table.slice(offset, counts[bucket]))
+            offset += counts[bucket]
+        self.rows += len(keys)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+    def size(self, bucket):
+        return os.path.getsize(self.path(bucket)) if bucket in self.writers else 0
+
+    def read(self, bucket):
+        if bucket not in self.writers:
+            return self.schema.empty_table()
+        with pyarrow.ipc.open_stream(self.path(bucket)) as reader:
+            return reader.read_all()
+
+    def split(self, bucket, buckets):
+        """Rows of a bucket partitioned again into buckets by the hash of the next depth, streamed from disk."""
+        directory = os.path.join(self.directory, f"{self.side}_{bucket:05d}")
+        os.mkdir(directory)
+        parts = BucketFiles(directory, self.side, buckets, self.depth + 1)
+        if bucket in self.writers:
+            with pyarrow.ipc.open_stream(self.path(bucket)) as reader:
+                for batch in reader:
+                    parts.write(batch.column(0), batch.column(1))
+            os.remove(self.path(bucket))
+        parts.close()
+        return parts
+
+
+def canonical_batch(batch, columns):
+    """Every column of a batch as canonical strings, so the same value reads the same on both sides."""
+    canonical = []
+    for index in range(batch.num_columns):
+        column = batch.column(index)
+        declared_type = base_type(columns[index].type) if index < len(columns) else ''
+        if declared_type in DATETIME_TYPES or pyarrow.types.is_timestamp(column.type):
+            canonical.append(arrow_util.normalize_datetime(column))
+        elif declared_type in NUMBER_TYPES or arrow_util.is_numeric(column.type):
+            canonical.append(arrow_util.normalize_number(column))
+        else:
+            canonical.append(arrow_util.normalize_string(column))
+    return canonical
+
+
+def join_values(values):
+    if len(values) == 1:
+        return pc.fill_null(values[0], NULL_VALUE)
+    return pc.binary_join_element_wise(*values, SEPARATOR, null_handling='replace', null_replacement=NULL_VALUE)
+
+
+def split_row(row):
+    return [None if value == NULL_VALUE else value for value in row.split(SEPARATOR)]
+
+
+def keyed_rows(batches, columns, key_indices):
+    """(keys, rows) string arrays of every batch, the whole row is the key without key_indices."""
+    for batch in batches:
+        if batch.num_rows == 0:
+            continue
+        values = canonical_batch(batch, columns)
+        rows = join_values(values)
+        yield (join_values([values[index] for index in key_indices]) if key_indices else rows), rows
+
+
+def rows_table(batches, columns, key_indices):
+    """All the rows of a few batches as one table of KEY and ROW, as diff_bucket takes them."""
+    pairs = list(keyed_rows(batches, columns, key_indices))
+    return pyarrow.table([pyarrow.chunked_array([keys for keys, _ in pairs], pyarrow.string()),
+                          pyarrow.chunked_array([rows for _, rows in pairs], pyarrow.string())], names=[KEY, ROW])
+
+
+def partition_rows(batches, bucket_files: BucketFiles, columns, key_indices):
+    for keys, rows in keyed_rows(batches, columns, key_indices):
+        bucket_files.write(keys, rows)
+    bucket_files.close()
+
+
+def count_rows(table):
+    return table.group_by([KEY, ROW]).aggregate([([], 'count_all')])
+
+
+def diff_bucket(source_rows, destination_rows):
+    """
+    Rows of a bucket whose number differs between the sides, as a table of KEY, ROW and difference, the
+    destination count minus the source count of the row.
+    """
+    counts = count_rows(source_rows).join(count_rows(destination_rows), keys=[KEY, ROW], join_type='full outer',
+                                          left_suffix='_source', right_suffix='_destination')
+    difference = pc.subtract(pc.fill_null(counts['count_all_destination'], 0),
+                             pc.fill_null(counts['count_all_source'], 0))
+    counts = counts.append_column('difference', difference).filter(pc.not_equal(difference, 0))
+    return counts.select([KEY, ROW, 'difference'])
+
+
+def new_result(column_names, key_indices):
+    return {'columns': column_names, 'key_columns': [column_names[index] for index in key_indices],
+            'added': 0, 'removed': 0, 'changed': 0, 'added_rows': [], 'removed_rows': [], 'changed_rows': []}
+
+
+def room(reported, max_reported_rows):
+    return None if max_reported_rows is None else max(0, max_reported_rows - len(reported))
+
+
+def add_differences(result, differences, keyed, max_reported_rows=MAX_REPORTED_ROWS):
+    """
+    Count the differences of diff_bucket into a comparison result with Arrow kernels, and list the rows of up
+    to max_reported_rows of each kind, every one with None. Only the listed rows are turned into Python rows.
+    """
+    if differences.num_rows == 0:
+        return
+    added = pc.max_element_wise(differences['difference'], 0)
+    removed = pc.max_element_wise(pc.negate(differences['difference']), 0)
+    if not keyed:
+        for name, counts in (('added', added), ('removed', removed)):
+            result[name] += pc.sum(counts).as_py() or 0
+            reported = result[f"{name}_rows"]
+            rows = differences.filter(pc.greater(counts, 0))
+            limit = room(reported, max_reported_rows)
+            for row, count in zip(rows[ROW].to_pylist()[:limit], pc.abs(rows['difference']).to_pylist()):
+                reported.extend([split_row(row)] * (count if limit is None else min(count, room(reported, max_reported_rows))))
+        return
+    # a key removed and added again is a changed row
+    per_key = pyarrow.table({KEY: differences[KEY], 'added': added, 'removed': removed}) \
+        .group_by(KEY).aggregate([('added', 'sum'), ('removed', 'sum')])
+    changed = pc.min_element_wise(per_key['added_sum'], per_key['removed_sum'])
+    changed_count = pc.sum(changed).as_py() or 0
+    result['changed'] += changed_count
+    result['added'] += (pc.sum(per_key['added_sum']).as_py() or 0) - changed_count
+    result['removed'] += (pc.sum(per_key['removed_sum']).as_py() or 0) - changed_count
+    # only the rows of as many keys of each kind as can still be listed are paired
+    report_keys = []
+    for name, mask in (('changed', pc.greater(changed, 0)),
+                       ('added', pc.greater(per_key['added_sum'], changed)),
+                       ('removed', pc.greater(per_key['removed_sum'], changed))):
+        limit = room(result[f"{name}_rows"], max_reported_rows)
+        report_keys.extend(per_key[KEY].filter(mask).to_pylist()[:limit])
+    if not report_keys:
+        return
+    rows = differences.filter(pc.is_in(differences[KEY], pyarrow.array(report_keys, pyarrow.string())))
+    added_by_key, removed_by_key = {}, {}
+    for key, row, count in zip(rows[KEY].to_pylist(), rows[ROW].to_pylist(), rows['difference'].to_pylist()):
+        (added_by_key if count > 0 else removed_by_key).setdefault(key, []).extend([row] * abs(count))
+    for key in dict.fromkeys(report_keys):
+        added_rows, removed_rows = added_by_key.get(key, []), removed_by_key.get(key, [])
+        pairs = min(len(added_rows), len(removed_rows))
+        for name, key_rows in (('changed', list(zip(removed_rows[:pairs], added_rows[:pairs]))),
+                               ('added', added_rows[pairs:]), ('removed', removed_rows[pairs:])):
+            reported = result[f"{name}_rows"]
+            for row in key_rows[:room(reported, max_reported_rows)]:
+                reported.append((split_row(row[0]), split_row(row[1])) if name == 'changed' else split_row(row))
+
+
+def diff_buckets(result, source_files: BucketFiles, destination_files: BucketFiles, bucket, bucket_size, keyed,
+                 max_reported_rows=MAX_REPORTED_ROWS):
+    """
+    Compare a bucket of both sides. A bucket over the bucket size is split by another hash and its parts are
+    compared one by one, so memory stays about a bucket however large the table is.
+    """
+    size = source_files.size(bucket) + destination_files.size(bucket)
+    if size > bucket_size and source_files.depth < MAX_SPLIT_DEPTH:
+        buckets = max(2, min(MAX_BUCKETS, math.ceil(size / bucket_size)))
+        source_parts, destination_parts = source_files.split(bucket, buckets), destination_files.split(bucket, buckets)
+        for part in range(buckets):
+            diff_buckets(result, source_parts, destination_parts, part, bucket_size, keyed, max_reported_rows)
+        return
+    add_differences(result, diff_bucket(source_files.read(bucket), destination_files.read(bucket)), keyed,
+                    max_reported_rows)
+
+
+def compare(source: Source, destination: Destination, source_sql: str, destination_sql: str, columns,
+            key_columns=None, estimated_bytes=0, bucket_dir=None, max_reported_rows=MAX_REPORTED_ROWS):
+    """
+    Compare the rows of two queries whatever order they come in, with memory bounded by the bucket size and the
+    fetch size of connectors streaming their results, ClickZetta holds a whole result file of the server instead.
+
+    Both results are streamed into buckets on disk by the hash of their key, the primary key columns or the
+    whole row without key_columns, then compared bucket by bucket. Rows only the destination has are added,
+    rows only the source has are removed, and rows whose key is on both sides with other values are changed.
+    All of them are counted, up to max_reported_rows of each are listed, every one with None.
+    """
+    column_names = [column.name for column in columns]
+    key_indices = [column_names.index(key) for key in key_columns or [] if key in column_names]
+    bucket_size = parse_size(DEFAULT_BUCKET_SIZE)
+    buckets = max(DEFAULT_BUCKETS, min(MAX_BUCKETS, math.ceil(estimated_bytes / bucket_size)))
+    result = new_result(column_names, key_indices)
+    with tempfile.TemporaryDirectory(prefix='migration_row_diff_', dir=bucket_dir) as directory:
+        source_files = BucketFiles(directory, 'source', buckets)
+        destination_files = BucketFiles(directory, 'destination', buckets)
+        # both sides are read at the same time, each into its own bucket files
+        validation_executor.run_paired(
+            lambda: partition_rows(source.iter_arrow(source_sql), source_files, columns, key_indices),
+            lambda: partition_rows(destination.iter_arrow(destination_sql), destination_files, columns, key_indices))
+        result['source_rows'], result['destination_rows'] = source_files.rows, destination_files.rows
+        for bucket in range(buckets):
+            diff_buckets(result, source_files, destination_files, bucket, bucket_size, bool(key_indices),
+                         max_reported_rows)
+    logger.info(f"Compared {result['source_rows']} source rows with {result['destination_rows']} destination rows "
+                f"in {buckets} buckets, added: {result['added']}, removed: {result['removed']}, "
+                f"changed: {result['changed']}")
+    return result
+
+
+def compare_tables(source: Source, destination: Destination, source_table: str, destination_table: str):
+    """Compare two tables row by row on the primary key of the source table, or on whole rows without one."""
+    database_name, table_name = source_table.split('.')
+    columns = source.get_table_columns(database_name, table_name)
+    try:
+        key_columns = source.get_table_pk_columns(database_name, table_name)
+    except NotImplementedError:
+        key_columns = None
+    estimated_bytes = source.get_table_size(database_name, table_name)
+    select = ", ".join(column.name for column in columns)
+    return compare(source, destination, f"select {select} from {source_table}",
+                   f"select {select} from {destination_table}", columns, key_columns, estimated_bytes)
@@ -0,0 +1,27 @@
+import re
+
+SIZE_UNITS = {
+    'B': 1,
+    'K': 1024,
+    'M': 1024 ** 2,
+    'G': 1024 ** 3,
+    'T': 1024 ** 4,
+    'P': 1024 ** 5,
+}
+
+
+def parse_size(size):
+    """
+    Parse a byte count such as 1024, "1.5 GB", "300MB" or "2T" into bytes, returns 0 for empty values.
+    """
+    if size is None:
+        return 0
+    if isinstance(size, (int, float)):
+        return int(size)
+    text = str(size).strip()
+    if not text:
+        return 0
+    match_result = re.match(r'^([\d.]+)\s*([BKMGTP]?)I?B?$', text.upper())
+    if not match_result:
+        raise ValueError(f"Invalid size: {size}")
+    return int(float(match_result.group(1)) * SIZE_UNITS[match_result.group(2) or 'B'])
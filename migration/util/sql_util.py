@@ -0,0 +1,5 @@
+def sql_literal(value):
+    """Render a value as a SQL literal, numbers as they are and everything else as a quoted string."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
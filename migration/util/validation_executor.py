@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# source sides of paired calls running at once over every validation, the destination side runs on the caller
+MAX_PAIRED_CALLS = 16
+
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PAIRED_CALLS, thread_name_prefix='validation')
+
+
+def run_paired(source_call, destination_call):
+    """
+    Run the source and the destination side of a validation at the same time and return both results, so it
+    takes as long as the slower side. The source call runs on a validation thread, the destination call on
+    the calling thread, an error of either side is raised once both are done.
+    """
+    future = EXECUTOR.submit(source_call)
+    try:
+        destination_result = destination_call()
+    finally:
+        # the source side is waited for whatever happened to the destination side, it holds a connection
+        source_result = future.result()
+    return source_result, destination_result
+
+
+def execute_paired(source, destination, source_sql: str, destination_sql: str):
+    """Results of a source and a destination query executed at the same time."""
+    return run_paired(lambda: source.execute_sql(source_sql), lambda: destination.execute_sql(destination_sql))
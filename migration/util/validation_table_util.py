@@ -2,10 +2,9 @@ import decimal
 import logging
 import uuid
 from datetime import datetime
+from functools import partial
 from urllib.parse import quote, unquote
 
-import data_diff
-import pandas
 import sqlparse
 import re
 
@@ -14,16 +13,13 @@ from migration.connector.source.enum import Column
 from migration.connector.destination.base import Destination
 
 from migration.connector.source import Source
-
-from data_diff import connect, TableSegment, connect_to_table, diff_tables, Algorithm
+from migration.util import profile_util, row_diff, validation_executor, checksum_diff, pk_range_scan
 
 logger = logging.getLogger(__name__)
 
 NUMBER_TYPE = ['BIGINT', 'DECIMAL', 'DOUBLE', 'FLOAT', 'INT', 'SMALLINT', 'TINYINT']
 LEFT_BRACKET = '('
 
-STDDEV_SAMP_DBS = ['clickzetta', 'doris', 'mysql', 'postgresql', 'odps']
-
 
 def is_number_type(column: Column, type_mapping: dict) -> bool:
     if LEFT_BRACKET in column.type:
@@ -79,10 +75,9 @@ def count_validation(source_table: str, destination_table: str, source: Source,
     try:
         src_count_sql = f"select count(*) from {source_table}"
         dest_count_sql = f"select count(*) from {destination_table}"
-        source_count_res = source.execute_sql(src_count_sql)[0]
-        result = {'source_count': source_count_res[0]}
-        destination_count_res = destination.execute_sql(dest_count_sql)[0]
-        result['destination_count'] = destination_count_res[0]
+        source_count_res, destination_count_res = validation_executor.execute_paired(source, destination, src_count_sql,
+                                                                                    dest_count_sql)
+        result = {'source_count': source_count_res[0][0], 'destination_count': destination_count_res[0][0]}
         return result
     except Exception as e:
         raise Exception(e)
@@ -92,33 +87,25 @@ def count_validation(source_table: str, destination_table: str, source: Source,
 
 def basic_validation(source: Source, destination: Destination, source_table: str, destination_table: str):
     try:
-        src_count_sql = f"select count(*) from {source_table}"
-        dest_count_sql = f"select count(*) from {destination_table}"
-        source_count_res = source.execute_sql(src_count_sql)[0]
-        result = {'source_count': source_count_res[0]}
-        destination_count_res = destination.execute_sql(dest_count_sql)[0]
-        result['destination_count'] = destination_count_res[0]
         type_mapping = source.type_mapping()
         table_columns = source.get_table_columns(source_table.split('.')[0], source_table.split('.')[1])
-        source_quote = source.quote_character()
-        destination_quote = destination.quote_character()
-        for column in table_columns:
-            if is_number_type(column, type_mapping):
-                source_sql = (
-                    f"select min({source_quote}{column.name}{source_quote}), max({source_quote}{column.name}{source_quote}),"
-                    f" avg({source_quote}{column.name}{source_quote}) from {source_table}")
-                destination_sql = (
-                    f"select min({destination_quote}{column.name}{destination_quote}), max({destination_quote}{column.name}{destination_quote}),"
-                    f" avg({destination_quote}{column.name}{destination_quote}) from {destination_table}")
-                source_result = source.execute_sql(source_sql)[0]
-                destination_result = destination.execute_sql(destination_sql)[0]
-                processed_source_data, processed_dest_data = alignment_decimal(source_result, destination_result)
-                result[f'{column.name}_source_min'] = processed_source_data[0]
-                result[f'{column.name}_source_max'] = processed_source_data[1]
-                result[f'{column.name}_source_avg'] = processed_source_data[2]
-                result[f'{column.name}_destination_min'] = processed_dest_data[0]
-                result[f'{column.name}_destination_max'] = processed_dest_data[1]
-                result[f'{column.name}_destination_avg'] = processed_dest_data[2]
+        number_columns = [column for column in table_columns if is_number_type(column, type_mapping)]
+        # the count and every min, max and avg in one query per side, both sides at once
+        source_result, destination_result = validation_executor.execute_paired(
+            source, destination, profile_util.min_max_avg_query(source, source_table, number_columns),
+            profile_util.min_max_avg_query(destination, destination_table, number_columns))
+        source_result, destination_result = source_result[0], destination_result[0]
+        result = {'source_count': source_result[0], 'destination_count': destination_result[0]}
+        for index, column in enumerate(number_columns):
+            values = slice(1 + index * 3, 4 + index * 3)
+            processed_source_data, processed_dest_data = alignment_decimal(source_result[values],
+                                                                           destination_result[values])
+            result[f'{column.name}_source_min'] = processed_source_data[0]
+            result[f'{column.name}_source_max'] = processed_source_data[1]
+            result[f'{column.name}_source_avg'] = processed_source_data[2]
+            result[f'{column.name}_destination_min'] = processed_dest_data[0]
+            result[f'{column.name}_destination_max'] = processed_dest_data[1]
+            result[f'{column.name}_destination_avg'] = processed_dest_data[2]
         return result
     except Exception as e:
         raise Exception(e)
@@ -126,94 +113,19 @@ def basic_validation(source: Source, destination: Destination, source_table: str
         raise Exception(e)
 
 
-def multidimensional_validation(source_table: str, destination_table: str, source: Source, destination: Destination):
+def multidimensional_validation(source_table: str, destination_table: str, source: Source, destination: Destination,
+                                approximate_distinct=False):
     try:
         table_columns = source.get_table_columns(source_table.split('.')[0], source_table.split('.')[1])
         type_mapping = source.type_mapping()
-        source_quote = source.quote_character()
-        destination_quote = destination.quote_character()
-        source_profile_sql = f"with source_data as (select * from {source_table}), \n" \
-                             f"column_profiles  as ( \n"
-        for index, column in enumerate(table_columns):
-            source_profile_sql += f"select '{column.name}' as column_name, \n" \
-                                  f"'{column.type}' as column_type, \n" \
-                                  f"count(*) as row_count, \n" \
-                                  f"sum(case when {source_quote}{column.name}{source_quote} is null then 0 else 1 end) / count(*) as not_null_proportion,\n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) / count(*) as distinct_proportion, \n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) as distinct_count, \n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) = count(*) as is_unique, \n"
-            if is_number_type(column, type_mapping):
-                source_profile_sql += f"min({source_quote}{column.name}{source_quote}) as min_value, \n" \
-                                      f"max({source_quote}{column.name}{source_quote}) as max_value, \n" \
-                                      f"avg({source_quote}{column.name}{source_quote}) as avg_value, \n" \
-                                      f"stddev_pop({source_quote}{column.name}{source_quote}) as stddev_pop_value, \n"
-                if source.name.lower() in STDDEV_SAMP_DBS:
-                    source_profile_sql += f"stddev_samp({source_quote}{column.name}{source_quote}) as stddev_sample_value \n"
-                else:
-                    source_profile_sql += f"stddev_sample({source_quote}{column.name}{source_quote}) as stddev_sample_value \n"
-            else:
-                source_profile_sql += f"null as min_value, \n" \
-                                      f"null as max_value, \n" \
-                                      f"null as avg_value, \n" \
-                                      f"null as stddev_pop_value, \n" \
-                                      f"null as stddev_sample_value \n"
-            source_profile_sql += f"from source_data \n"
-            if index != len(table_columns) - 1:
-                source_profile_sql += f"union all \n"
-        source_profile_sql += f") \n" \
-                              f"select * from column_profiles;"
-        source_result = source.execute_sql(source_profile_sql)
-        list_source_result = []
-        for row in source_result:
-            list_source_result.append(list(row))
-        logger.info(f"mutil source_result: {source_result}")
-        des_profile_sql = f"with source_data as (select * from {destination_table}), \n" \
-                          f"column_profiles  as ( \n"
-        for index, column in enumerate(table_columns):
-            des_profile_sql += f"select '{column.name}' as column_name, \n" \
-                               f"'{column.type}' as column_type, \n" \
-                               f"count(*) as row_count, \n" \
-                               f"sum(case when {destination_quote}{column.name}{destination_quote} is null then 0 else 1 end) / count(*) as not_null_proportion,\n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) / count(*) as distinct_proportion, \n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) as distinct_count, \n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) = count(*) as is_unique, \n"
-            if is_number_type(column, type_mapping):
-                des_profile_sql += f"min({destination_quote}{column.name}{destination_quote}) as min_value, \n" \
-                                   f"max({destination_quote}{column.name}{destination_quote}) as max_value, \n" \
-                                   f"avg({destination_quote}{column.name}{destination_quote}) as avg_value, \n" \
-                                   f"stddev_pop({destination_quote}{column.name}{destination_quote}) as stddev_pop_value, \n"
-                if destination.name.lower() in STDDEV_SAMP_DBS:
-                    des_profile_sql += f"stddev_samp({destination_quote}{column.name}{destination_quote}) as stddev_sample_value \n"
-                else:
-                    des_profile_sql += f"stddev_sample({destination_quote}{column.name}{destination_quote}) as stddev_sample_value \n"
-            else:
-                des_profile_sql += f"null as min_value, \n" \
-                                   f"null as max_value, \n" \
-                                   f"null as avg_value, \n" \
-                                   f"null as stddev_pop_value, \n" \
-                                   f"null as stddev_sample_value \n"
-            des_profile_sql += f"from source_data \n"
-            if index != len(table_columns) - 1:
-                des_profile_sql += f"union all \n"
-        des_profile_sql += f") \n" \
-                           f"select * from column_profiles;"
-        destination_result = destination.execute_sql(des_profile_sql)
-        list_destination_result = []
-        for row in destination_result:
-            list_destination_result.append(list(row))
-        logger.info(f"mutil destination_result: {destination_result}")
-        if source.name.lower() == 'clickzetta':
-            for row in list_source_result:
-                if not row[6]:
-                    row[6] = 0
-                elif row[6]:
-                    row[6] = 1
-        if destination.name.lower() == 'clickzetta':
-            for row in list_destination_result:
-                if not row[6]:
-                    row[6] = 0
-                elif row[6]:
-                    row[6] = 1
+        numeric = [is_number_type(column, type_mapping) for column in table_columns]
+        list_source_result, list_destination_result = validation_executor.run_paired(
+            lambda: profile_util.profile_rows(source, source_table, table_columns, numeric, approximate_distinct),
+            lambda: profile_util.profile_rows(destination, destination_table, table_columns, numeric, approximate_distinct))
+        logger.info(f"mutil source_result: {list_source_result}")
+        logger.info(f"mutil destination_result: {list_destination_result}")
+        if approximate_distinct:
+            profile_util.align_approximate_distinct(list_source_result, list_destination_result)
 
         for index, source_row in enumerate(list_source_result):
             if source_row[10] and list_destination_result[index][10]:
@@ -237,177 +149,47 @@ def multidimensional_validation(source_table: str, destination_table: str, sourc
 
 def line_by_line_validation(source_table: str, destination_table: str, source: Source, destination: Destination):
     try:
-        source_result = source.execute_sql(f"select * from {source_table}")
-        list_source_result = []
-        for row in source_result:
-            list_source_result.append(list(row))
-        destination_result = destination.execute_sql(f"select * from {destination_table}")
-        list_destination_result = []
-        for row in destination_result:
-            list_destination_result.append(list(row))
-        logger.info(f"line by line destination_result: {destination_result}")
-        columns = source.get_table_columns(source_table.split('.')[0], source_table.split('.')[1])
-        if source.name.lower() == 'clickzetta' or source.name.lower() == 'doris' or source.name.lower() == 'mysql':
-            for row in list_source_result:
-                for index, col in enumerate(row):
-                    if columns[index].type == 'DATETIME':
-                        row[index] = str(pandas.to_datetime(row[index])).split('+')[0]
-        if destination.name.lower() == 'clickzetta' or source.name.lower() == 'doris' or source.name.lower() == 'mysql':
-            for row in list_destination_result:
-                for index, col in enumerate(row):
-                    if columns[index].type == 'DATETIME':
-                        row[index] = str(pandas.to_datetime(row[index])).split('+')[0]
-
-        processed_source_data = []
-        processed_dest_data = []
-        for index, source_row_data in enumerate(list_source_result):
-            source_data, dest_data = alignment_decimal(source_row_data, list_destination_result[index])
-            processed_source_data.append(source_data)
-            processed_dest_data.append(dest_data)
-
-        result = {'source_result': processed_source_data,
-                  'destination_result': processed_dest_data,
-                  'columns': [column.name for column in columns]}
-        return result
+        return row_diff.compare_tables(source, destination, source_table, destination_table)
     except Exception as e:
         raise Exception(e)
     except BaseException as e:
         raise Exception(e)
 
 
-def data_diff_validation(source_table: str, destination_table: str, source: Source, destination: Destination):
+def data_diff_validation(source_table: str, destination_table: str, source: Source, destination: Destination,
+                         max_reported_rows=None):
+    """Differing rows as '- (...)' and '+ (...)' lines, all of them unless max_reported_rows of each kind."""
     try:
-        source_db_type = source.name.lower()
-        destination_db_type = destination.name.lower()
-
-        if source_db_type == 'postgresql':
-            config = source.get_connection_params()
-            source_db_url = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
-        elif source_db_type == 'mysql':
-            config = source.get_connection_params()
-            source_db_url = f"mysql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{source_table.split('.')[0]}"
-        elif source_db_type == 'clickzetta':
-            config = source.get_connection_params()
-            source_db_url = f"clickzetta://{config['username']}:{config['password']}@{config['instance']}.{config['service']}/{config['workspace']}?virtualcluster={config['vcluster']}&schema={source_table.split('.')[0]}"
-        else:
-            raise Exception(f"Unsupported database type {source_db_type} in data-diff-validation")
-
-        if destination_db_type == 'postgresql':
-            config = destination.get_connection_params()
-            destination_db_url = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
-        elif destination_db_type == 'mysql':
-            config = destination.get_connection_params()
-            destination_db_url = f"mysql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{destination_table.split('.')[0]}"
-        elif destination_db_type == 'clickzetta':
-            config = destination.get_connection_params()
-            destination_db_url = f"clickzetta://{config['username']}:{config['password']}@{config['instance']}.{config['service']}/{config['workspace']}?virtualcluster={config['vcluster']}&schema={destination_table.split('.')[0]}"
-        else:
-            raise Exception(f"Unsupported database type {destination_db_type} in data-diff-validation")
-
         pk_colmns = source.get_table_pk_columns(source_table.split('.')[0], source_table.split('.')[1])
         if len(pk_colmns) == 0:
             raise Exception(f"[data-diff] Table {source_table} has no primary key")
-        source_diff_table = connect_to_table(source_db_url, source_table.split('.')[1], pk_colmns)
-        destination_diff_table = connect_to_table(destination_db_url, destination_table.split('.')[1], pk_colmns)
-        extra_columns = [column.name for column in
-                         source.get_table_columns(source_table.split('.')[0], source_table.split('.')[1]) if
-                         column.name not in pk_colmns]
-        diff_result = diff_tables(source_diff_table, destination_diff_table, algorithm=Algorithm.HASHDIFF,
-                                  key_columns=pk_colmns,
-                                  threaded=True, max_threadpool_size=6, extra_columns=tuple(extra_columns))
-        result = []
-        for sign, columns in diff_result:
-            result.append(f'{sign} {columns}')
+        diff_result = checksum_diff.diff_tables(source, destination, source_table, destination_table, pk_colmns,
+                                                max_reported_rows=max_reported_rows)
+        logger.info(f"[data-diff] {source_table} removed: {diff_result['removed']}, added: {diff_result['added']}, "
+                    f"changed: {diff_result['changed']}")
+        result = [f'- {tuple(columns)}' for columns in diff_result['removed_rows']]
+        result.extend(f'+ {tuple(columns)}' for columns in diff_result['added_rows'])
+        for source_columns, destination_columns in diff_result['changed_rows']:
+            result.extend([f'- {tuple(source_columns)}', f'+ {tuple(destination_columns)}'])
         return result
     except Exception as e:
         raise Exception('data-diff-error:', e)
 
 
 def data_diff_validation_with_pks(source_table: str, destination_table: str, source: Source, destination: Destination,
-                                  pks_str: str):
+                                  pks_str: str, max_reported_rows=None):
+    """Differences on the given primary key, the lists hold all of them unless max_reported_rows of each kind."""
     try:
-        source_db_type = source.name.lower()
-        destination_db_type = destination.name.lower()
-        source_count = source.execute_sql(f"select count(*) from {source_table}")[0][0]
-        destination_count = destination.execute_sql(f"select count(*) from {destination_table}")[0][0]
-
-        if source_db_type == 'postgresql':
-            config = source.get_connection_params()
-            pwd = config['password'] if '@' not in config['password'] else config['password'].replace('@', '%40')
-            logger.info(f"pwd: {pwd}")
-            source_db_url = f"postgresql://{config['user']}:{pwd}@{config['host']}:{config['port']}/{config['database']}"
-        elif source_db_type == 'mysql':
-            config = source.get_connection_params()
-            source_db_url = f"mysql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{source_table.split('.')[0]}"
-        elif source_db_type == 'clickzetta':
-            config = source.get_connection_params()
-            source_db_url = f"clickzetta://{config['username']}:{config['password']}@{config['instance']}.{config['service']}/{config['workspace']}?virtualcluster={config['vcluster']}&schema={source_table.split('.')[0]}"
-        else:
-            raise Exception(f"Unsupported database type {source_db_type} in data-diff-validation")
-
-        if destination_db_type == 'postgresql':
-            config = destination.get_connection_params()
-            destination_db_url = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
-        elif destination_db_type == 'mysql':
-            config = destination.get_connection_params()
-            destination_db_url = f"mysql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{destination_table.split('.')[0]}"
-        elif destination_db_type == 'clickzetta':
-            config = destination.get_connection_params()
-            destination_db_url = f"clickzetta://{config['username']}:{config['password']}@{config['instance']}.{config['service']}/{config['workspace']}?virtualcluster={config['vcluster']}&schema={destination_table.split('.')[0]}"
-        else:
-            raise Exception(f"Unsupported database type {destination_db_type} in data-diff-validation")
         pk_columns = tuple(pks_str.split(','))
         if len(pk_columns) == 0:
             raise Exception(f"[data-diff] Table {source_table} has no primary key")
-        logger.info(f"source_table name is :{source_table}")
-        if source_db_type == 'postgresql':
-            source_diff_table = connect_to_table(source_db_url, source_table, pk_columns,
-                                                 case_sensitive=False)
-        else:
-            source_diff_table = connect_to_table(source_db_url, source_table.split('.')[1], pk_columns,
-                                                 case_sensitive=False)
-        destination_diff_table = connect_to_table(destination_db_url, destination_table.split('.')[1], pk_columns,
-                                                  case_sensitive=False)
-        columns = [column.name.lower() for column in
-                   source.get_table_columns(source_table.split('.')[0], source_table.split('.')[1])]
-        pk_index = 0
-        for index, column in enumerate(columns):
-            if column == pk_columns[0]:
-                pk_index = index
-        extra_columns = [column for column in columns if column not in pk_columns]
-        diff_result = diff_tables(source_diff_table, destination_diff_table, algorithm=Algorithm.HASHDIFF,
-                                  key_columns=pk_columns,
-                                  threaded=True, max_threadpool_size=6, extra_columns=tuple(extra_columns))
-        only_in_source_result = []
-        only_in_dest_result = []
-        only_in_source_result_final = []
-        only_in_dest_result_final = []
-        only_in_source_map = {}
-        only_in_dest_map = {}
-        both_in_but_diff = []
-        for sign, columns in diff_result:
-            if sign == '-':
-                only_in_source_result.append(columns)
-            elif sign == '+':
-                only_in_dest_result.append(columns)
-        for entry in only_in_source_result:
-            only_in_source_map[entry[pk_index]] = entry
-        for entry in only_in_dest_result:
-            only_in_dest_map[entry[pk_index]] = entry
-        for key, value in only_in_source_map.items():
-            if key in only_in_dest_map:
-                if only_in_dest_map[key] != value:
-                    both_in_but_diff.append([value, only_in_dest_map[key]])
-                only_in_dest_map.pop(key)
-            else:
-                only_in_source_result_final.append(value)
-        for key, value in only_in_dest_map.items():
-            only_in_dest_result_final.append(value)
-
-
-        return {'only_in_source': len(only_in_source_result_final), 'only_in_source_list': only_in_source_result_final,
-                'only_in_dest': len(only_in_dest_result_final), 'only_in_dest_list': only_in_dest_result_final,
-                'both_in_but_diff': both_in_but_diff, 'check_count': max(source_count, destination_count)}
+        diff_result = checksum_diff.diff_tables(source, destination, source_table, destination_table, pk_columns,
+                                                max_reported_rows=max_reported_rows)
+        return {'only_in_source': diff_result['removed'], 'only_in_source_list': diff_result['removed_rows'],
+                'only_in_dest': diff_result['added'], 'only_in_dest_list': diff_result['added_rows'],
+                'both_in_but_diff': [list(rows) for rows in diff_result['changed_rows']],
+                'both_in_but_diff_count': diff_result['changed'],
+                'check_count': max(diff_result['source_rows'], diff_result['destination_rows'])}
     except Exception as e:
         raise Exception('data-diff-error:', e)
 
@@ -432,99 +214,36 @@ def schema_validation(source_table: str, destination_table: str, source: Source,
 
 
 def pk_id_column_validation(source_table: str, destination_table: str, source: Source, destination: Destination,
-                            pk_id: str):
+                            pk_id: str, scan_window=pk_range_scan.DEFAULT_SCAN_WINDOW):
     try:
-        source_max_min_id = source.execute_sql(f"select min({pk_id}), max({pk_id}) from {source_table}")[0]
-        source_min_id = source_max_min_id[0]
-        source_max_id = source_max_min_id[1]
-        dest_max_min_id = destination.execute_sql(f"select min({pk_id}), max({pk_id}) from {destination_table}")[0]
-        dest_min_id = dest_max_min_id[0]
-        dest_max_id = dest_max_min_id[1]
-        min_id = min(source_min_id, dest_min_id)
-        max_id = max(source_max_id, dest_max_id)
-        logger.info(f"{source_table}-min_id: {min_id}, max_id: {max_id}, prepare full table check.")
-        cur_id = max_id
-        cur_min_id = 0
-        only_in_source = 0
-        only_in_source_list = []
-        only_in_dest = 0
-        only_in_dest_list = []
-        while cur_id >= min_id:
-            logger.debug(f'{datetime.now()} cur_id={cur_id}, ')
-            ids_source = set()
-            source_result = source.execute_sql(
-                f'select {pk_id} from {source_table} where {pk_id} <= {cur_id} order by {pk_id} desc limit 50000;')
-            for r in source_result:
-                ids_source.add(r[0])
-                cur_min_id = r[0]
-            logger.debug(f'cur_min_id={cur_min_id}, ')
-
-            ids_dest = set()
-            dest_result = destination.execute_sql(
-                f'select {pk_id} from {destination_table} where {pk_id} >= {cur_min_id} and {pk_id} <={cur_id};')
-
-            for r in dest_result:
-                ids_dest.add(r[0])
-
-            for i in ids_source - ids_dest:
-                only_in_source += 1
-                only_in_source_list.append(i)
-            logger.info(f'{source_table}-only_in_source count={only_in_source} at {datetime.now()}')
-
-            for i in ids_dest - ids_source:
-                only_in_dest += 1
-                only_in_dest_list.append(i)
-            logger.info(f'{destination_table}-only_in_dest count={only_in_dest} as {datetime.now()}')
-            cur_id = cur_min_id - 1
-        return {'only_in_source': only_in_source, 'only_in_source_list': only_in_source_list,
-                'only_in_dest': only_in_dest, 'only_in_dest_list': only_in_dest_list}
+        return pk_range_scan.diff_pk_ids(source, destination, source_table, destination_table, pk_id, scan_window)
     except Exception as e:
         logger.error(f"pk-id validation failed, error: {e}")
         raise Exception('pk-id validation failed:', e)
 
 
+def fetch_pk_rows(connector, table: str, pk_id: str, lower, upper):
+    """Rows of a range by id, nulls and NaNs as 'Null' so both sides compare alike."""
+    rows = {}
+    for r in connector.iter_sql(pk_range_scan.range_query(f"{pk_id} as temp_id,*", table, pk_id, lower, upper)):
+        temp_r = [x if str(x) != 'None' and str(x) != 'nan' else 'Null' for x in r]
+        rows[temp_r[0]] = temp_r[1:]
+    return rows
+
+
 def pk_all_column_validation(source_table: str, destination_table: str, source: Source, destination: Destination,
-                             pk_id: str):
+                             pk_id: str, scan_window=pk_range_scan.DEFAULT_SCAN_WINDOW):
     try:
-        source_count = source.execute_sql(f"select count(*) from {source_table}")[0][0]
-        destination_count = destination.execute_sql(f"select count(*) from {destination_table}")[0][0]
-        logger.info(
-            f"{source_table}-source_count: {source_count}, destination_count: {destination_count}, prepare full table check.")
-        source_max_min_id = source.execute_sql(f"select min({pk_id}), max({pk_id}) from {source_table}")[0]
-        source_min_id = source_max_min_id[0]
-        source_max_id = source_max_min_id[1]
-        dest_max_min_id = destination.execute_sql(f"select min({pk_id}), max({pk_id}) from {destination_table}")[0]
-        dest_min_id = dest_max_min_id[0]
-        dest_max_id = dest_max_min_id[1]
-        min_id = min(source_min_id, dest_min_id)
-        max_id = max(source_max_id, dest_max_id)
-        logger.info(f"{source_table}-min_id: {min_id}, max_id: {max_id}, prepare full table check.")
-        cur_id = max_id
-        cur_min_id = 0
+        ranges, source_count, destination_count = pk_range_scan.plan_ranges(
+            source, destination, source_table, destination_table, pk_id, pk_range_scan.RANGE_ROWS)
         only_in_source = 0
         only_in_source_list = []
         only_in_dest = 0
         only_in_dest_list = []
         both_in_but_diff = []
-        while cur_id >= min_id:
-            logger.debug(f'{datetime.now()} cur_id={cur_id}, ')
-            ids_source = {}
-            source_result = source.execute_sql(
-                f'select {pk_id} as temp_id,* from {source_table} where {pk_id} <= {cur_id} order by {pk_id} desc limit 10000;')
-            for r in source_result:
-                temp_r = [x if str(x) != 'None' and str(x) != 'nan' else 'Null' for x in r]
-                ids_source[temp_r[0]] = temp_r[1:]
-                cur_min_id = temp_r[0]
-            logger.debug(f'cur_min_id={cur_min_id}, ')
-
-            ids_dest = {}
-            dest_result = destination.execute_sql(
-                f'select {pk_id} as temp_id,* from {destination_table} where {pk_id} >= {cur_min_id} and {pk_id} <={cur_id} order by {pk_id} desc;')
-
-            for r in dest_result:
-                temp_r = [x if str(x) != 'None' and str(x) != 'nan' else 'Null' for x in r]
-                ids_dest[temp_r[0]] = temp_r[1:]
-
+        for lower, upper, ids_source, ids_dest in pk_range_scan.scan_ranges(
+                ranges, partial(fetch_pk_rows, source, source_table, pk_id),
+                partial(fetch_pk_rows, destination, destination_table, pk_id), scan_window):
             for key, value in ids_source.items():
                 if key not in ids_dest:
                     only_in_source += 1
@@ -537,12 +256,12 @@ def pk_all_column_validation(source_table: str, destination_table: str, source:
             for key, value in ids_dest.items():
                 only_in_dest += 1
                 only_in_dest_list.append(value)
+            logger.debug(f'{source_table}-range [{lower}, {upper}) only_in_source count={only_in_source}, '
+                         f'only_in_dest count={only_in_dest}, both_in_but_diff count={len(both_in_but_diff)}')
 
-            logger.info(f'{source_table}-only_in_source count={only_in_source} at {datetime.now()}')
-            logger.info(f'{destination_table}-only_in_dest count={only_in_dest} as {datetime.now()}')
-            logger.info(f'{source_table}-both_in_but_diff count={len(both_in_but_diff)} as {datetime.now()}')
-
-            cur_id = cur_min_id - 1
+        logger.info(f'{source_table}-only_in_source count={only_in_source} at {datetime.now()}')
+        logger.info(f'{destination_table}-only_in_dest count={only_in_dest} as {datetime.now()}')
+        logger.info(f'{source_table}-both_in_but_diff count={len(both_in_but_diff)} as {datetime.now()}')
         return {'only_in_source': only_in_source, 'only_in_source_list': only_in_source_list,
                 'only_in_dest': only_in_dest, 'only_in_dest_list': only_in_dest_list,
                 'both_in_but_diff': both_in_but_diff, 'check_count': max(source_count, destination_count)}
@@ -552,62 +271,41 @@ def pk_all_column_validation(source_table: str, destination_table: str, source:
 
 
 def pk_id_column_validation_with_count(source_table: str, destination_table: str, source: Source,
-                                       destination: Destination, pk_id: str, expect_count: int):
+                                       destination: Destination, pk_id: str, expect_count: int,
+                                       scan_window=pk_range_scan.DEFAULT_SCAN_WINDOW):
+    """
+    Ids only in one table, scanned range by range from the highest ids down, window ranges of both sides at
+    once. Stops with check_status 1 once the two counts differ by expect_count, after max_search_times ranges else.
+    """
     try:
-        source_max_min_id = source.execute_sql(f"select min({pk_id}), max({pk_id}) from {source_table}")[0]
-        source_min_id = source_max_min_id[0]
-        source_max_id = source_max_min_id[1]
-        dest_max_min_id = destination.execute_sql(f"select min({pk_id}), max({pk_id}) from {destination_table}")[0]
-        dest_min_id = dest_max_min_id[0]
-        dest_max_id = dest_max_min_id[1]
-        min_id = min(source_min_id, dest_min_id)
-        max_id = max(source_max_id, dest_max_id)
-        logger.info(f"{source_table}-min_id: {min_id}, max_id: {max_id}, expect_check_count: {expect_count}")
-        cur_id = max_id
-        cur_min_id = 0
-        only_in_source = 0
+        ranges, _, _ = pk_range_scan.plan_ranges(source, destination, source_table, destination_table, pk_id)
+        logger.info(f"{source_table}-expect_check_count: {expect_count}")
         only_in_source_list = []
-        only_in_dest = 0
         only_in_dest_list = []
         max_search_times = 15
-        current_search_times = 0
         check_status = 0
-        while cur_id >= min_id and current_search_times < max_search_times:
-            logger.debug(f'{datetime.now()} cur_id={cur_id}, ')
-            ids_source = set()
-            source_result = source.execute_sql(
-                f'select {pk_id} from {source_table} where {pk_id} <= {cur_id} order by {pk_id} desc limit 50000;')
-            for r in source_result:
-                ids_source.add(r[0])
-                cur_min_id = r[0]
-            logger.debug(f'cur_min_id={cur_min_id}, ')
-
-            ids_dest = set()
-            dest_result = destination.execute_sql(
-                f'select {pk_id} from {destination_table} where {pk_id} >= {cur_min_id} and {pk_id} <={cur_id};')
-
-            for r in dest_result:
-                ids_dest.add(r[0])
-
-            for i in ids_source - ids_dest:
-                only_in_source += 1
-                only_in_source_list.append(i)
-            logger.info(f'{source_table}-only_in_source count={only_in_source} at {datetime.now()}')
-
-            for i in ids_dest - ids_source:
-                only_in_dest += 1
-                only_in_dest_list.append(i)
-            logger.info(f'{destination_table}-only_in_dest count={only_in_dest} as {datetime.now()}')
-            if abs(only_in_source - only_in_dest) >= expect_count:
-                check_status = 1
-                break
-            cur_id = cur_min_id - 1
-            current_search_times += 1
-            if current_search_times == max_search_times:
-                logger.error(
-                    f"max_search_times reached, {source_table}-only_in_source: {only_in_source}, {destination_table}-only_in_dest: {only_in_dest}")
-        return {'only_in_source': only_in_source, 'only_in_source_list': only_in_source_list,
-                'only_in_dest': only_in_dest, 'only_in_dest_list': only_in_dest_list, 'check_status': check_status}
+        scan = pk_range_scan.scan_ranges(
+            list(reversed(ranges))[:max_search_times], partial(pk_range_scan.fetch_ids, source, source_table, pk_id),
+            partial(pk_range_scan.fetch_ids, destination, destination_table, pk_id), scan_window)
+        try:
+            for lower, upper, ids_source, ids_dest in scan:
+                only_in_source_ids, only_in_dest_ids = pk_range_scan.diff_ids(ids_source, ids_dest)
+                only_in_source_list.extend(only_in_source_ids.tolist())
+                only_in_dest_list.extend(only_in_dest_ids.tolist())
+                logger.info(f'{source_table}-range [{lower}, {upper}) only_in_source count={len(only_in_source_list)}, '
+                            f'{destination_table}-only_in_dest count={len(only_in_dest_list)} at {datetime.now()}')
+                if abs(len(only_in_source_list) - len(only_in_dest_list)) >= expect_count:
+                    check_status = 1
+                    break
+        finally:
+            # the ranges still fetched ahead are cancelled
+            scan.close()
+        if check_status == 0 and len(ranges) > max_search_times:
+            logger.error(f"max_search_times reached, {source_table}-only_in_source: {len(only_in_source_list)}, "
+                         f"{destination_table}-only_in_dest: {len(only_in_dest_list)}")
+        return {'only_in_source': len(only_in_source_list), 'only_in_source_list': only_in_source_list,
+                'only_in_dest': len(only_in_dest_list), 'only_in_dest_list': only_in_dest_list,
+                'check_status': check_status}
     except Exception as e:
         logger.error(f"pk-id-with-count validation failed, error: {e}")
         raise Exception('pk-id validation failed:', e)
@@ -3,7 +3,6 @@ import logging
 import uuid
 from datetime import datetime
 
-import pandas
 import sqlparse
 import re
 
@@ -12,14 +11,13 @@ from migration.connector.source.enum import Column
 from migration.connector.destination.base import Destination
 
 from migration.connector.source import Source
+from migration.util import profile_util, row_diff, validation_executor
 
 logger = logging.getLogger(__name__)
 
 NUMBER_TYPE = ['BIGINT', 'DECIMAL', 'DOUBLE', 'FLOAT', 'INT', 'SMALLINT', 'TINYINT']
 LEFT_BRACKET = '('
 
-STDDEV_SAMP_DBS = ['clickzetta', 'doris', 'mysql', 'postgresql', 'odps']
-
 
 def is_number_type(column: Column, type_mapping: dict) -> bool:
     if LEFT_BRACKET in column.type:
@@ -29,56 +27,38 @@ def is_number_type(column: Column, type_mapping: dict) -> bool:
     return type_mapping.get(column.type, column.type) in NUMBER_TYPE
 
 
+def create_result_table(connector, query: str, temp_table: str):
+    """Materialize a query as temp_table in the temp database of the connector, return its full name."""
+    if connector.name.lower() == 'odps':
+        temp_db = connector.get_connection_params()['project']
+    else:
+        temp_db = f"validation_query_result_db"
+    if connector.name.lower() == 'clickzetta' or connector.name.lower() == "postgresql":
+        connector.execute_sql(f"create schema if not exists {temp_db}")
+        temp_table_ddl = f"create table {temp_db}.{temp_table} as {query}"
+    elif connector.name.lower() == 'doris':
+        connector.execute_sql(f"create database if not exists {temp_db}")
+        temp_table_ddl = f"create table {temp_db}.{temp_table} PROPERTIES(\"replication_num\" = \"1\") as {query}"
+    elif connector.name.lower() == 'odps':
+        temp_table_ddl = f"create table {temp_table} as {query}"
+    else:
+        connector.execute_sql(f"create database if not exists {temp_db}")
+        temp_table_ddl = f"create table {temp_db}.{temp_table} as {query}"
+
+    if connector.name.lower() == 'odps':
+        connector.execute_sql(f"drop table if exists {temp_table}")
+    else:
+        connector.execute_sql(f"drop table if exists {temp_db}.{temp_table}")
+    connector.execute_sql(temp_table_ddl)
+    return f"{temp_db}.{temp_table}"
+
+
 def create_query_result_table(source: Source, destination: Destination, source_query: str,
                               destination_query: str):
     try:
-        if source.name.lower() == 'odps':
-            project = source.connection_params['project']
-            source_temp_db = project
-        else:
-            source_temp_db = f"validation_query_result_db"
         temp_table = f"validation_query_result_table_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-        if source.name.lower() == 'clickzetta' or source.name.lower() == "postgresql":
-            source.execute_sql(f"create schema if not exists {source_temp_db}")
-            temp_table_ddl = f"create table {source_temp_db}.{temp_table} as {source_query}"
-        elif source.name.lower() == 'doris':
-            source.execute_sql(f"create database if not exists {source_temp_db}")
-            temp_table_ddl = f"create table {source_temp_db}.{temp_table} PROPERTIES(\"replication_num\" = \"1\") as {source_query}"
-        elif source.name.lower() == 'odps':
-            temp_table_ddl = f"create table {temp_table} as {source_query}"
-        else:
-            source.execute_sql(f"create database if not exists {source_temp_db}")
-            temp_table_ddl = f"create table {source_temp_db}.{temp_table} as {source_query}"
-
-        if source.name.lower() == 'odps':
-            source.execute_sql(f"drop table if exists {temp_table}")
-        else:
-            source.execute_sql(f"drop table if exists {source_temp_db}.{temp_table}")
-        source.execute_sql(temp_table_ddl)
-
-        if destination.name.lower() == 'odps':
-            project = destination.get_connection_params()['project']
-            dest_temp_db = project
-        else:
-            dest_temp_db = f"validation_query_result_db"
-        if destination.name.lower() == 'clickzetta' or destination.name.lower() == "postgresql":
-            destination.execute_sql(f"create schema if not exists {dest_temp_db}")
-            temp_table_ddl = f"create table {dest_temp_db}.{temp_table} as {destination_query}"
-        elif destination.name.lower() == 'doris':
-            destination.execute_sql(f"create database if not exists {dest_temp_db}")
-            temp_table_ddl = f"create table {dest_temp_db}.{temp_table} PROPERTIES(\"replication_num\" = \"1\") as {destination_query}"
-        elif destination.name.lower() == 'odps':
-            temp_table_ddl = f"create table {temp_table} as {destination_query}"
-        else:
-            destination.execute_sql(f"create database if not exists {dest_temp_db}")
-            temp_table_ddl = f"create table {dest_temp_db}.{temp_table} as {destination_query}"
-
-        if destination.name.lower() == 'odps':
-            destination.execute_sql(f"drop table if exists {temp_table}")
-        else:
-            destination.execute_sql(f"drop table if exists {dest_temp_db}.{temp_table}")
-        destination.execute_sql(temp_table_ddl)
-        return f"{source_temp_db}.{temp_table}", f"{dest_temp_db}.{temp_table}"
+        return validation_executor.run_paired(lambda: create_result_table(source, source_query, temp_table),
+                                              lambda: create_result_table(destination, destination_query, temp_table))
     except Exception as e:
         raise Exception(e)
     except BaseException as e:
@@ -123,33 +103,25 @@ def alignment_decimal(source_data: list, dest_data: list):
 def basic_validation(source: Source, destination: Destination, source_query: str, destination_query: str):
     try:
         source_tbl_name, dest_tbl_name = create_query_result_table(source, destination, source_query, destination_query)
-        source_count_sql = f"select count(*) from {source_tbl_name}"
-        dest_count_sql = f"select count(*) from {dest_tbl_name}"
-        source_count_res = source.execute_sql(source_count_sql)[0]
-        result = {'source_count': source_count_res[0]}
-        destination_count_res = destination.execute_sql(dest_count_sql)[0]
-        result['destination_count'] = destination_count_res[0]
         type_mapping = source.type_mapping()
         table_columns = source.get_table_columns(source_tbl_name.split('.')[0], source_tbl_name.split('.')[1])
-        source_quote = source.quote_character()
-        destination_quote = destination.quote_character()
-        for column in table_columns:
-            if is_number_type(column, type_mapping):
-                source_sql = (
-                    f"select min({source_quote}{column.name}{source_quote}), max({source_quote}{column.name}{source_quote}),"
-                    f" avg({source_quote}{column.name}{source_quote}) from {source_tbl_name}")
-                destination_sql = (
-                    f"select min({destination_quote}{column.name}{destination_quote}), max({destination_quote}{column.name}{destination_quote}),"
-                    f" avg({destination_quote}{column.name}{destination_quote}) from {dest_tbl_name}")
-                source_result = source.execute_sql(source_sql)[0]
-                destination_result = destination.execute_sql(destination_sql)[0]
-                processed_source_data, processed_dest_data = alignment_decimal(source_result, destination_result)
-                result[f'{column.name}_source_min'] = processed_source_data[0]
-                result[f'{column.name}_source_max'] = processed_source_data[1]
-                result[f'{column.name}_source_avg'] = processed_source_data[2]
-                result[f'{column.name}_destination_min'] = processed_dest_data[0]
-                result[f'{column.name}_destination_max'] = processed_dest_data[1]
-                result[f'{column.name}_destination_avg'] = processed_dest_data[2]
+        number_columns = [column for column in table_columns if is_number_type(column, type_mapping)]
+        # the count and every min, max and avg in one query per side, both sides at once
+        source_result, destination_result = validation_executor.execute_paired(
+            source, destination, profile_util.min_max_avg_query(source, source_tbl_name, number_columns),
+            profile_util.min_max_avg_query(destination, dest_tbl_name, number_columns))
+        source_result, destination_result = source_result[0], destination_result[0]
+        result = {'source_count': source_result[0], 'destination_count': destination_result[0]}
+        for index, column in enumerate(number_columns):
+            values = slice(1 + index * 3, 4 + index * 3)
+            processed_source_data, processed_dest_data = alignment_decimal(source_result[values],
+                                                                           destination_result[values])
+            result[f'{column.name}_source_min'] = processed_source_data[0]
+            result[f'{column.name}_source_max'] = processed_source_data[1]
+            result[f'{column.name}_source_avg'] = processed_source_data[2]
+            result[f'{column.name}_destination_min'] = processed_dest_data[0]
+            result[f'{column.name}_destination_max'] = processed_dest_data[1]
+            result[f'{column.name}_destination_avg'] = processed_dest_data[2]
         return result
     except Exception as e:
         raise Exception(e)
@@ -157,95 +129,20 @@ def basic_validation(source: Source, destination: Destination, source_query: str
         raise Exception(e)
 
 
-def multidimensional_validation(source_query: str, destination_query: str, source: Source, destination: Destination):
+def multidimensional_validation(source_query: str, destination_query: str, source: Source, destination: Destination,
+                                approximate_distinct=False):
     try:
         source_tbl_name, dest_tbl_name = create_query_result_table(source, destination, source_query, destination_query)
         table_columns = source.get_table_columns(source_tbl_name.split('.')[0], source_tbl_name.split('.')[1])
         type_mapping = source.type_mapping()
-        source_quote = source.quote_character()
-        destination_quote = destination.quote_character()
-        source_profile_sql = f"with source_data as (select * from {source_tbl_name}), \n" \
-                             f"column_profiles  as ( \n"
-        for index, column in enumerate(table_columns):
-            source_profile_sql += f"select '{column.name}' as column_name, \n" \
-                                  f"'{column.type}' as column_type, \n" \
-                                  f"count(*) as row_count, \n" \
-                                  f"sum(case when {source_quote}{column.name}{source_quote} is null then 0 else 1 end) / count(*) as not_null_proportion,\n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) / count(*) as distinct_proportion, \n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) as distinct_count, \n" \
-                                  f"count(distinct {source_quote}{column.name}{source_quote}) = count(*) as is_unique, \n"
-            if is_number_type(column, type_mapping):
-                source_profile_sql += f"min({source_quote}{column.name}{source_quote}) as min_value, \n" \
-                                      f"max({source_quote}{column.name}{source_quote}) as max_value, \n" \
-                                      f"avg({source_quote}{column.name}{source_quote}) as avg_value, \n" \
-                                      f"stddev_pop({source_quote}{column.name}{source_quote}) as stddev_pop_value, \n"
-                if source.name.lower() in STDDEV_SAMP_DBS:
-                    source_profile_sql += f"stddev_samp({source_quote}{column.name}{source_quote}) as stddev_sample_value \n"
-                else:
-                    source_profile_sql += f"stddev_sample({source_quote}{column.name}{source_quote}) as stddev_sample_value \n"
-            else:
-                source_profile_sql += f"null as min_value, \n" \
-                                      f"null as max_value, \n" \
-                                      f"null as avg_value, \n" \
-                                      f"null as stddev_pop_value, \n" \
-                                      f"null as stddev_sample_value \n"
-            source_profile_sql += f"from source_data \n"
-            if index != len(table_columns) - 1:
-                source_profile_sql += f"union all \n"
-        source_profile_sql += f") \n" \
-                              f"select * from column_profiles;"
-        source_result = source.execute_sql(source_profile_sql)
-        list_source_result = []
-        for row in source_result:
-            list_source_result.append(list(row))
-        logger.info(f"mutil source_result: {source_result}")
-        des_profile_sql = f"with source_data as (select * from {dest_tbl_name}), \n" \
-                          f"column_profiles  as ( \n"
-        for index, column in enumerate(table_columns):
-            des_profile_sql += f"select '{column.name}' as column_name, \n" \
-                               f"'{column.type}' as column_type, \n" \
-                               f"count(*) as row_count, \n" \
-                               f"sum(case when {destination_quote}{column.name}{destination_quote} is null then 0 else 1 end) / count(*) as not_null_proportion,\n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) / count(*) as distinct_proportion, \n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) as distinct_count, \n" \
-                               f"count(distinct {destination_quote}{column.name}{destination_quote}) = count(*) as is_unique, \n"
-            if is_number_type(column, type_mapping):
-                des_profile_sql += f"min({destination_quote}{column.name}{destination_quote}) as min_value, \n" \
-                                   f"max({destination_quote}{column.name}{destination_quote}) as max_value, \n" \
-                                   f"avg({destination_quote}{column.name}{destination_quote}) as avg_value, \n" \
-                                   f"stddev_pop({destination_quote}{column.name}{destination_quote}) as stddev_pop_value, \n"
-                if destination.name.lower() in STDDEV_SAMP_DBS:
-                    des_profile_sql += f"stddev_samp({destination_quote}{column.name}{destination_quote}) as stddev_sample_value \n"
-                else:
-                    des_profile_sql += f"stddev_sample({destination_quote}{column.name}{destination_quote}) as stddev_sample_value \n"
-            else:
-                des_profile_sql += f"null as min_value, \n" \
-                                   f"null as max_value, \n" \
-                                   f"null as avg_value, \n" \
-                                   f"null as stddev_pop_value, \n" \
-                                   f"null as stddev_sample_value \n"
-            des_profile_sql += f"from source_data \n"
-            if index != len(table_columns) - 1:
-                des_profile_sql += f"union all \n"
-        des_profile_sql += f") \n" \
-                           f"select * from column_profiles;"
-        destination_result = destination.execute_sql(des_profile_sql)
-        list_destination_result = []
-        for row in destination_result:
-            list_destination_result.append(list(row))
-        logger.info(f"mutil destination_result: {destination_result}")
-        if source.name.lower() == 'clickzetta':
-            for row in list_source_result:
-                if not row[6]:
-                    row[6] = 0
-                elif row[6]:
-                    row[6] = 1
-        if destination.name.lower() == 'clickzetta':
-            for row in list_destination_result:
-                if not row[6]:
-                    row[6] = 0
-                elif row[6]:
-                    row[6] = 1
+        numeric = [is_number_type(column, type_mapping) for column in table_columns]
+        list_source_result, list_destination_result = validation_executor.run_paired(
+            lambda: profile_util.profile_rows(source, source_tbl_name, table_columns, numeric, approximate_distinct),
+            lambda: profile_util.profile_rows(destination, dest_tbl_name, table_columns, numeric, approximate_distinct))
+        logger.info(f"mutil source_result: {list_source_result}")
+        logger.info(f"mutil destination_result: {list_destination_result}")
+        if approximate_distinct:
+            profile_util.align_approximate_distinct(list_source_result, list_destination_result)
 
         for index, source_row in enumerate(list_source_result):
             if source_row[10] and list_destination_result[index][10]:
@@ -268,41 +165,18 @@ def multidimensional_validation(source_query: str, destination_query: str, sourc
 
 
 def line_by_line_validation(source_query: str, destination_query: str, source: Source, destination: Destination):
+    """
+    Rows only one query returns, as a row_diff.compare result. It lists the differing rows under added_rows
+    and removed_rows with their counts instead of every row under source_result and destination_result.
+    """
     try:
         source_tbl_name, dest_tbl_name = create_query_result_table(source, destination, source_query, destination_query)
-        source_result = source.execute_sql(source_query)
-        list_source_result = []
-        for row in source_result:
-            list_source_result.append(list(row))
-
-        destination_result = destination.execute_sql(destination_query)
-        list_destination_result = []
-        for row in destination_result:
-            list_destination_result.append(list(row))
-
         columns = source.get_table_columns(source_tbl_name.split('.')[0], source_tbl_name.split('.')[1])
-        if source.name.lower() == 'clickzetta' or source.name.lower() == 'doris' or source.name.lower() == 'mysql':
-            for row in list_source_result:
-                for index, col in enumerate(row):
-                    if columns[index].type == 'DATETIME':
-                        row[index] = str(pandas.to_datetime(row[index])).split('+')[0]
-        if destination.name.lower() == 'clickzetta' or source.name.lower() == 'doris' or source.name.lower() == 'mysql':
-            for row in list_destination_result:
-                for index, col in enumerate(row):
-                    if columns[index].type == 'DATETIME':
-                        row[index] = str(pandas.to_datetime(row[index])).split('+')[0]
-
-        processed_source_data = []
-        processed_dest_data = []
-        for index, source_row_data in enumerate(list_source_result):
-            source_data, dest_data = alignment_decimal(source_row_data, list_destination_result[index])
-            processed_source_data.append(source_data)
-            processed_dest_data.append(dest_data)
-
-        result = {'source_result': processed_source_data,
-                  'destination_result': processed_dest_data,
-                  'columns': [column.name for column in columns]}
-        return result
+        select = ", ".join(column.name for column in columns)
+        # the results are read back from the tables holding them instead of running the queries again,
+        # they have no key so whole rows are compared
+        return row_diff.compare(source, destination, f"select {select} from {source_tbl_name}",
+                                f"select {select} from {dest_tbl_name}", columns)
     except Exception as e:
         raise Exception(e)
     except BaseException as e:
@@ -310,15 +184,9 @@ def line_by_line_validation(source_query: str, destination_query: str, source: S
 
 def line_by_line_without_ddl_validation(source_query: str, destination_query: str, source: Source, destination: Destination):
     try:
-        source_result = source.execute_sql(source_query)
-        list_source_result = []
-        for row in source_result:
-            list_source_result.append(list(row))
-
-        destination_result = destination.execute_sql(destination_query)
-        list_destination_result = []
-        for row in destination_result:
-            list_destination_result.append(list(row))
+        list_source_result, list_destination_result = validation_executor.run_paired(
+            lambda: [list(row) for row in source.iter_sql(source_query)],
+            lambda: [list(row) for row in destination.iter_sql(destination_query)])
 
         result = {'source_result': list_source_result,
                   'destination_result': list_destination_result,
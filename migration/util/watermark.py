@@ -0,0 +1,124 @@
+import json
+import logging
+import threading
+from datetime import datetime
+
+from migration.connector.destination.base import Destination
+from migration.util.migration_tasks_status import STATUS_SCHEMA, PK_TABLE_DML_HINT
+from migration.util.sql_util import sql_literal
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalRange:
+    """
+    What an incremental run of a table migrates: the rows whose watermark column is in (low, high], or,
+    when column is None, the partitions from the last one migrated (low) up to the latest one (high).
+    The last migrated partition is exported again, rows may have been added to it since.
+    """
+
+    def __init__(self, column, low, high):
+        self.column = column
+        self.low = low
+        self.high = high
+
+    def is_empty(self):
+        return self.high is None or (self.column is not None and self.high == self.low)
+
+    def predicate(self):
+        predicate = f"{self.column} <= {sql_literal(self.high)}"
+        if self.low is not None:
+            predicate = f"{self.column} > {sql_literal(self.low)} AND {predicate}"
+        return predicate
+
+    def partitions(self, partitions: list[str]):
+        if self.low in partitions:
+            return partitions[partitions.index(self.low):]
+        return list(partitions)
+
+    def __repr__(self):
+        return f"<IncrementalRange {self.column or 'partition'}: ({self.low}, {self.high}]>"
+
+
+class WatermarkStore:
+    """High-water marks of the tables migrated incrementally, kept in the status schema of the destination."""
+
+    def __init__(self, destination: Destination, project_name: str):
+        self.destination = destination
+        self.table_name = f"{STATUS_SCHEMA}.watermark_{project_name}"
+        self.lock = threading.Lock()
+        self.watermarks = None
+        self.init_table()
+
+    def init_table(self):
+        if self.destination.name.lower() == "clickzetta":
+            self.destination.execute_sql(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                table_name STRING NOT NULL,
+                watermark_column STRING,
+                watermark STRING NOT NULL,
+                update_time TIMESTAMP NOT NULL,
+                PRIMARY KEY (table_name)
+            )
+            """)
+        elif self.destination.name.lower() == "doris":
+            self.destination.execute_sql(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                table_name VARCHAR(512) NOT NULL,
+                watermark_column STRING,
+                watermark STRING NOT NULL,
+                update_time DATETIME NOT NULL
+            )
+            UNIQUE KEY (table_name)
+            DISTRIBUTED BY HASH(table_name) BUCKETS 1
+            PROPERTIES (
+                "replication_num" = "1"
+            );
+            """)
+
+    def load(self):
+        """Read every watermark of the project with one query, {table_name: (column, watermark)}."""
+        with self.lock:
+            if self.watermarks is None:
+                rows = self.destination.execute_sql(
+                    f"SELECT table_name, watermark_column, watermark FROM {self.table_name}")
+                self.watermarks = {row[0]: (row[1] or None, json.loads(row[2])) for row in rows}
+                logger.info(f"Loaded {len(self.watermarks)} watermarks from {self.table_name}")
+            return dict(self.watermarks)
+
+    def get(self, table_name, column):
+        """Watermark of a table, None when it was never migrated incrementally on this column."""
+        stored_column, watermark = self.load().get(table_name, (None, None))
+        if watermark is not None and stored_column != column:
+            logger.warning(f"Watermark of {table_name} was recorded on {stored_column or 'partition'}, "
+                           f"not {column or 'partition'}, migrate the whole table again")
+            return None
+        return watermark
+
+    def save(self, table_name, incremental_range: IncrementalRange):
+        if incremental_range.high is None:
+            return
+        column = incremental_range.column or ''
+        watermark = json.dumps(incremental_range.high, default=str)
+        time_type = "timestamp" if self.destination.name.lower() == "clickzetta" else "datetime"
+        values = f"({sql_literal(table_name)}, {sql_literal(column)}, {sql_literal(watermark)}, " \
+                 f"cast('{datetime.now()}' as {time_type}))"
+        if self.destination.name.lower() == "clickzetta":
+            self.destination.execute_sql(f"""
+            MERGE INTO {self.table_name} AS t
+            USING (SELECT * FROM VALUES {values} AS v(table_name, watermark_column, watermark, update_time)) AS s
+            ON t.table_name = s.table_name
+            WHEN MATCHED THEN UPDATE SET watermark_column = s.watermark_column, watermark = s.watermark,
+                update_time = s.update_time
+            WHEN NOT MATCHED THEN INSERT (table_name, watermark_column, watermark, update_time)
+                VALUES (s.table_name, s.watermark_column, s.watermark, s.update_time)
+            """, PK_TABLE_DML_HINT)
+        elif self.destination.name.lower() == "doris":
+            # the watermark table has a UNIQUE KEY on table_name, so the new watermark replaces the old one
+            self.destination.execute_sql(
+                f"INSERT INTO {self.table_name} (table_name, watermark_column, watermark, update_time) "
+                f"VALUES {values}")
+        with self.lock:
+            if self.watermarks is not None:
+                self.watermarks[table_name] = (incremental_range.column, incremental_range.high)
+        logger.info(f"Saved watermark of {table_name}: {incremental_range.high}")
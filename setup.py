@@ -15,7 +15,6 @@ description = "Move data and provide data comparison through object storage"
 # 'Development Status :: 5 - Production/Stable'
 release_status = "Development Status :: 3 - Alpha"
 dependencies = [
-    'schedule >= 1.1.0',
     'clickzetta-connector >= 0.8.60',
     'docopt >= 0.6.2',
     'pyyaml >= 6.0',
@@ -25,9 +24,10 @@ dependencies = [
     'sqlparse >= 0.4.1',
     'pymysql-pool >= 0.4.3',
     'psycopg2 >= 2.9.3',
-    "cz-data-diff >= 0.0.2",
-    "cz-data-diff[mysql,clickzetta,postgresql] >= 0.0.2",
     "pyodps >= 0.11.4.post0",
+    'pyarrow >= 15',
+    'numpy >= 1.21',
+    'pandas >= 1.3',
 ]
 extras = {
 